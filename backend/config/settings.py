@@ -124,8 +124,64 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
+# Uploaded CSVs (uploads/) and generated files (report_cache/) live under here
+MEDIA_ROOT = BASE_DIR
+
 CORS_ALLOW_ALL_ORIGINS = True
 
+# CSV ingest: rows read per parser chunk (None reads the whole file at once)
+# and rows written per INSERT round-trip
+INGEST_CHUNK_ROWS = 50000
+INGEST_BATCH_SIZE = 5000
+
+# CSV parser: 'pyarrow' (multithreaded, needs pyarrow), 'c' (pandas' C parser)
+# or 'auto' for pyarrow when it is installed
+CSV_PARSER_ENGINE = 'auto'
+
+# Threads ingesting uploads made with ?mode=async (0 runs them inline)
+INGEST_JOB_WORKERS = 2
+
+# Live progress of those jobs goes through the 'ingest_progress' cache (the job
+# row is locked by the ingest transaction until it commits). REQUIRED: it must
+# be shared by every worker process answering /api/jobs/<id>/. The file cache
+# is shared on one host; running on several hosts needs Redis or Memcached here
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'ingest_progress': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'job_progress',
+    },
+}
+
+# Bulk uploads (upload/bulk/): worker processes parsing files in parallel
+# (0 parses them inline, one at a time) and the most CSVs per request
+BULK_UPLOAD_WORKERS = 2
+BULK_UPLOAD_MAX_FILES = 100
+# ZIP archives are refused if a CSV in them, or all of them together, would
+# unpack to more than this (in bytes)
+BULK_UPLOAD_MAX_MEMBER_BYTES = 1024 ** 3
+BULK_UPLOAD_MAX_UNZIPPED_BYTES = 4 * 1024 ** 3
+
+# Resumable uploads (upload/sessions/) not touched for this many hours are discarded
+UPLOAD_SESSION_TTL_HOURS = 24
+
+# Retention: batches outside any of these limits are deleted (None turns a rule off).
+# A background sweeper applies them after uploads and every RETENTION_SWEEP_INTERVAL
+# seconds; set RETENTION_SWEEPER = False to prune inline instead, or run
+# `manage.py prune_history` from cron
+RETENTION_MAX_BATCHES = 5
+RETENTION_MAX_AGE_DAYS = None
+RETENTION_MAX_TOTAL_ROWS = None
+RETENTION_MAX_TOTAL_BYTES = None
+RETENTION_DELETE_CHUNK_ROWS = 10000
+RETENTION_SWEEPER = True
+RETENTION_SWEEP_INTERVAL = 300
+
+# Rendered PDF reports kept on disk; least recently used are evicted past this size
+REPORT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.BasicAuthentication',
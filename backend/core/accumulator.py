@@ -0,0 +1,192 @@
+"""
+Mergeable statistics accumulator for equipment uploads.
+
+StatsAccumulator is fed one chunk of columns at a time (see
+parsing.to_columns) and keeps, overall and per equipment type:
+
+    count, mean and variance (Welford / Chan et al. pairwise update),
+    min / max, and a t-digest of every parameter.
+
+Two accumulators -- from different chunks, worker processes or whole
+batches -- merge into the one you would have got from a single pass over
+all the data (the digests within their usual error bound). The state
+round-trips through to_dict/from_dict so it can be stored with a batch.
+Like parsing.py this module has no Django dependency.
+"""
+import numpy as np
+
+from .distributions import DEFAULT_COMPRESSION, HISTOGRAM_BINS, TDigest, histogram_edges, summarize
+from .parsing import PARAMETERS
+
+
+class Moments:
+    """Count, mean and sum of squared deviations (M2) of one parameter, plus its digest."""
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.digest = TDigest(compression)
+
+    def _combine(self, count, mean, m2):
+        if not count:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def update(self, values, mean=None, m2=None):
+        """Fold in ``values``; the chunk's mean and M2 can be passed in if already known."""
+        if not len(values):
+            return
+        if mean is None:
+            mean = float(values.mean())
+            m2 = float(((values - mean) ** 2).sum())
+        self._combine(len(values), mean, m2)
+        self.digest.update(values)
+
+    def merge(self, other):
+        self._combine(other.count, other.mean, other.m2)
+        self.digest.merge(other.digest)
+
+    @property
+    def std(self):
+        # Population std-dev, like the DB-side StdDev in analytics.type_breakdown
+        return (self.m2 / self.count) ** 0.5 if self.count else 0.0
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "digest": self.digest.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        moments = cls()
+        moments.count, moments.mean, moments.m2 = data["count"], data["mean"], data["m2"]
+        moments.digest = TDigest.from_dict(data["digest"])
+        return moments
+
+
+class StatsAccumulator:
+    """Upload statistics folded in one chunk at a time, mergeable across chunks and batches."""
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.overall = {field: Moments(compression) for field in PARAMETERS}
+        # type -> {field: Moments}
+        self.per_type = {}
+
+    @property
+    def count(self):
+        return self.overall[PARAMETERS[0]].count
+
+    def _type_entry(self, eq_type):
+        entry = self.per_type.get(eq_type)
+        if entry is None:
+            entry = self.per_type[eq_type] = {field: Moments(self.compression) for field in PARAMETERS}
+        return entry
+
+    def update(self, columns):
+        types, inverse = np.unique(columns['equipment_type'].astype(str), return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(types))
+        # Group rows by type once; every type is then a contiguous slice
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+
+        for field in PARAMETERS:
+            values = np.asarray(columns[field], dtype=np.float64)
+            self.overall[field].update(values)
+
+            means = np.bincount(inverse, weights=values, minlength=len(types)) / counts
+            deviations = values - means[inverse]
+            m2s = np.bincount(inverse, weights=deviations * deviations, minlength=len(types))
+            grouped = values[order]
+            for i, eq_type in enumerate(types.tolist()):
+                self._type_entry(eq_type)[field].update(
+                    grouped[bounds[i]:bounds[i + 1]], float(means[i]), float(m2s[i])
+                )
+        return self
+
+    def merge(self, other):
+        for field in PARAMETERS:
+            self.overall[field].merge(other.overall[field])
+        for eq_type, entry in other.per_type.items():
+            mine = self._type_entry(eq_type)
+            for field in PARAMETERS:
+                mine[field].merge(entry[field])
+        return self
+
+    def mean(self, field):
+        return self.overall[field].mean
+
+    def type_counts(self):
+        # Most common type first, like DataFrame.value_counts()
+        counts = {eq_type: entry[PARAMETERS[0]].count for eq_type, entry in self.per_type.items()}
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    def type_statistics(self):
+        result = {}
+        for eq_type, count in self.type_counts().items():
+            stats = {"count": count}
+            for field in PARAMETERS:
+                moments = self.per_type[eq_type][field]
+                stats[field] = {
+                    "mean": round(moments.mean, 2),
+                    "min": round(moments.digest.min, 2),
+                    "max": round(moments.digest.max, 2),
+                    "stddev": round(moments.std, 2),
+                }
+            result[eq_type] = stats
+        return result
+
+    def distributions(self, bins=HISTOGRAM_BINS):
+        """
+        Percentiles, std-dev, min/max and a histogram of every parameter,
+        overall and per type. Per-type histograms share the overall bin
+        edges so they can be drawn on the same axes.
+        """
+        result = {"bins": bins, "overall": {}, "by_type": {eq_type: {} for eq_type in self.type_counts()}}
+        for field in PARAMETERS:
+            overall = self.overall[field]
+            if not overall.count:
+                continue
+            edges = histogram_edges(overall.digest.min, overall.digest.max, bins)
+            result["overall"][field] = summarize(overall.count, overall.mean, overall.std, overall.digest, edges)
+            result["overall"][field]["edges"] = [round(float(e), 4) for e in edges]
+            for eq_type in result["by_type"]:
+                moments = self.per_type[eq_type][field]
+                result["by_type"][eq_type][field] = summarize(
+                    moments.count, moments.mean, moments.std, moments.digest, edges
+                )
+        return result
+
+    def as_dict(self):
+        return {
+            "total_count": self.count,
+            "average_flowrate": round(self.mean('flowrate'), 2),
+            "average_pressure": round(self.mean('pressure'), 2),
+            "average_temperature": round(self.mean('temperature'), 2),
+            "type_distribution": self.type_counts(),
+            "type_statistics": self.type_statistics(),
+            "distributions": self.distributions(),
+        }
+
+    def to_dict(self):
+        return {
+            "compression": self.compression,
+            "overall": {field: moments.to_dict() for field, moments in self.overall.items()},
+            "per_type": {
+                eq_type: {field: moments.to_dict() for field, moments in entry.items()}
+                for eq_type, entry in self.per_type.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        acc = cls(data["compression"])
+        acc.overall = {field: Moments.from_dict(state) for field, state in data["overall"].items()}
+        acc.per_type = {
+            eq_type: {field: Moments.from_dict(state) for field, state in entry.items()}
+            for eq_type, entry in data["per_type"].items()
+        }
+        return acc
@@ -0,0 +1,206 @@
+"""
+Batch statistics: read the copy stored at ingest, or rebuild it from the
+columnar sidecar (or, failing that, the equipment rows) for batches that
+predate stored statistics.
+"""
+from itertools import islice
+
+import numpy as np
+from django.db.models import Avg, Count, Max, Min, StdDev
+
+from .accumulator import StatsAccumulator
+from .columnar import open_sidecar
+from .models import ChemicalEquipment
+from .parsing import PARAMETERS
+
+# Rows per slice when folding a sidecar or the equipment table into a StatsAccumulator
+SIDECAR_CHUNK_ROWS = 1_000_000
+DB_CHUNK_ROWS = 50000
+
+# Part of the statistics' ETag: bump it when their shape changes, so clients
+# holding cached copies fetch the new one
+STATISTICS_VERSION = 1
+
+
+def _parameter_aggregates():
+    aggregates = {'count': Count('id')}
+    for field in PARAMETERS:
+        aggregates[f'{field}__mean'] = Avg(field)
+        aggregates[f'{field}__min'] = Min(field)
+        aggregates[f'{field}__max'] = Max(field)
+        aggregates[f'{field}__stddev'] = StdDev(field)
+    return aggregates
+
+
+def _breakdown_entry(row):
+    entry = {"count": row['count']}
+    for field in PARAMETERS:
+        entry[field] = {
+            stat: round(row[f'{field}__{stat}'] or 0, 2)
+            for stat in ('mean', 'min', 'max', 'stddev')
+        }
+    return entry
+
+
+def type_breakdown(equipments):
+    """
+    Per-type count plus mean/min/max/stddev of each parameter.
+
+    Runs as one GROUP BY in the database (backed by the (batch,
+    equipment_type) index), so no equipment rows are pulled into Python.
+    Types are ordered most common first.
+    """
+    rows = (
+        equipments.order_by()
+        .values('equipment_type')
+        .annotate(**_parameter_aggregates())
+        .order_by('-count', 'equipment_type')
+    )
+    return {row['equipment_type']: _breakdown_entry(row) for row in rows}
+
+
+def batches_breakdown(batch_ids):
+    """
+    type_breakdown of many batches at once: a single GROUP BY (batch,
+    equipment_type) query. Returns {batch_id: breakdown}.
+    """
+    rows = (
+        ChemicalEquipment.objects.filter(batch_id__in=batch_ids)
+        .values('batch_id', 'equipment_type')
+        .annotate(**_parameter_aggregates())
+        .order_by('batch_id', '-count', 'equipment_type')
+    )
+    result = {batch_id: {} for batch_id in batch_ids}
+    for row in rows:
+        result[row['batch_id']][row['equipment_type']] = _breakdown_entry(row)
+    return result
+
+
+def statistics_from_breakdown(breakdown):
+    """Batch statistics (without distributions) rebuilt from a type breakdown."""
+    total = sum(entry["count"] for entry in breakdown.values())
+    statistics = {"total_count": total}
+    for field in PARAMETERS:
+        weighted = sum(entry[field]["mean"] * entry["count"] for entry in breakdown.values())
+        statistics[f"average_{field}"] = round(weighted / total, 2) if total else 0
+    statistics["type_distribution"] = {eq_type: entry["count"] for eq_type, entry in breakdown.items()}
+    statistics["type_statistics"] = breakdown
+    return statistics
+
+
+def batch_statistics_many(batches):
+    """
+    Statistics of several batches without a query per batch: stored
+    statistics are used as they are, and any batches without them are
+    aggregated together in one grouped query. Returns {batch_id: statistics}.
+    """
+    missing = [batch.id for batch in batches if batch.statistics is None]
+    computed = batches_breakdown(missing) if missing else {}
+    return {
+        batch.id: batch.statistics if batch.statistics is not None else statistics_from_breakdown(computed[batch.id])
+        for batch in batches
+    }
+
+
+def parameter_summary(statistics, field, eq_type=None):
+    """
+    Summary of one parameter of a batch, overall or for one type: count,
+    mean, std, min, max and p50/p95/p99. Percentiles are None for batches
+    whose statistics predate distributions. Returns None if the batch has
+    no rows of ``eq_type``.
+    """
+    distributions = statistics.get("distributions")
+    if distributions:
+        source = distributions["by_type"].get(eq_type) if eq_type else distributions["overall"]
+        if not source or field not in source:
+            return None
+        return {key: value for key, value in source[field].items() if key not in ("histogram", "edges")}
+
+    if eq_type:
+        entry = statistics["type_statistics"].get(eq_type)
+        if entry is None:
+            return None
+        count, stats = entry["count"], entry[field]
+        mean, low, high, std = stats["mean"], stats["min"], stats["max"], stats["stddev"]
+    else:
+        count, mean, std = statistics["total_count"], statistics[f"average_{field}"], None
+        entries = statistics["type_statistics"].values()
+        low = min((entry[field]["min"] for entry in entries), default=None)
+        high = max((entry[field]["max"] for entry in entries), default=None)
+    return {"count": count, "mean": mean, "std": std, "min": low, "max": high, "p50": None, "p95": None, "p99": None}
+
+
+def _row_chunks(batch):
+    # Batches without a sidecar: stream just the columns the statistics need
+    rows = (
+        batch.equipments.order_by('id')
+        .values_list('equipment_type', *PARAMETERS)
+        .iterator(chunk_size=DB_CHUNK_ROWS)
+    )
+    while True:
+        chunk = list(islice(rows, DB_CHUNK_ROWS))
+        if not chunk:
+            return
+        types, *values = zip(*chunk)
+        columns = {'equipment_type': np.array(types, dtype=object)}
+        for field, column in zip(PARAMETERS, values):
+            columns[field] = np.array(column, dtype=np.float64)
+        yield columns
+
+
+def build_accumulator(batch):
+    """
+    Fold every row of ``batch`` into a fresh StatsAccumulator.
+
+    Reads the memory-mapped sidecar when the batch has one, otherwise the
+    equipment rows in chunks; either way it is a single pass.
+    """
+    running = StatsAccumulator()
+    sidecar = open_sidecar(batch.id)
+    chunks = sidecar.iter_columns(SIDECAR_CHUNK_ROWS, names=False) if sidecar is not None else _row_chunks(batch)
+    for columns in chunks:
+        running.update(columns)
+    return running
+
+
+def compute_statistics(batch):
+    """Recompute the summary statistics of ``batch``."""
+    return build_accumulator(batch).as_dict()
+
+
+def _store(batch, running):
+    batch.statistics = running.as_dict()
+    batch.stats_state = running.to_dict()
+    batch.save(update_fields=['statistics', 'stats_state'])
+
+
+def get_batch_statistics(batch):
+    """
+    Return the stored statistics of ``batch``.
+
+    Older batches have none stored (or were stored before distributions
+    were added), so they are computed once here and saved back; every
+    later request is then a plain row lookup.
+    """
+    if batch.statistics is None or "distributions" not in batch.statistics:
+        _store(batch, build_accumulator(batch))
+    return batch.statistics
+
+
+def statistics_etag(batch):
+    # A batch's statistics never change once it is ingested
+    return f'"stats-{batch.id}-{int(batch.uploaded_at.timestamp())}-v{STATISTICS_VERSION}"'
+
+
+def get_batch_accumulator(batch):
+    """
+    Return the StatsAccumulator of ``batch``, ready to merge with others.
+
+    Loaded from the stored state; built and saved once for batches that
+    predate it.
+    """
+    if batch.stats_state is None:
+        running = build_accumulator(batch)
+        _store(batch, running)
+        return running
+    return StatsAccumulator.from_dict(batch.stats_state)
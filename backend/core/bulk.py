@@ -0,0 +1,253 @@
+"""
+Bulk uploads: many CSVs (or ZIP archives of CSVs) in one request.
+Any of them may be compressed (.csv.gz, .csv.zst) and are stored that way.
+
+Every CSV is first copied to a staging directory (hashing it on the way
+for de-duplication), then parsed into a staged sidecar by a pool of
+worker processes (staging.stage_file). As each file finishes parsing the
+main process inserts it into its own UploadBatch from the memory-mapped
+sidecar, so parsing of the remaining files overlaps with the inserts and
+at most BULK_UPLOAD_WORKERS files are in flight at once.
+"""
+import hashlib
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+
+from .ingest import get_chunk_rows, get_parser_engine, ingest_staged
+from .models import UploadBatch
+from .parsing import COMPRESSIONS, check_compression, compression_of
+from .staging import stage_file
+from .uploads import content_digest, store_file
+
+COPY_CHUNK_BYTES = 1024 * 1024
+# Archive members that are picked up; anything else in a ZIP is ignored
+CSV_SUFFIXES = ('.csv',) + tuple(f'.csv{suffix}' for suffix in COMPRESSIONS)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_workers():
+    return getattr(settings, 'BULK_UPLOAD_WORKERS', 2)
+
+
+def get_max_files():
+    return getattr(settings, 'BULK_UPLOAD_MAX_FILES', 100)
+
+
+def get_max_member_bytes():
+    return getattr(settings, 'BULK_UPLOAD_MAX_MEMBER_BYTES', 1024 ** 3)
+
+
+def get_max_unzipped_bytes():
+    return getattr(settings, 'BULK_UPLOAD_MAX_UNZIPPED_BYTES', 4 * 1024 ** 3)
+
+
+def _get_pool():
+    # Spawned rather than forked: the server process has threads of its own
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=get_workers(), mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    # A worker died (OOM kill, crash in the parser): the pool takes no more
+    # work, so the next caller gets a fresh one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def staging_root():
+    return Path(settings.MEDIA_ROOT) / 'staging'
+
+
+def _copy_and_hash(src, dest):
+    sha = hashlib.sha256()
+    with open(dest, 'wb') as out:
+        while True:
+            data = src.read(COPY_CHUNK_BYTES)
+            if not data:
+                break
+            sha.update(data)
+            out.write(data)
+    return sha.hexdigest()
+
+
+def collect_sources(uploaded_files, directory):
+    """
+    Copy every CSV out of ``uploaded_files`` into ``directory``, unpacking
+    ZIP archives member by member. Returns a list of
+    {"filename", "path", "sha256"}; raises ValueError if there are more
+    than BULK_UPLOAD_MAX_FILES, one is compressed with an unavailable codec,
+    or a ZIP would unpack past the BULK_UPLOAD_MAX_*_BYTES limits.
+    """
+    sources = []
+    unzipped = 0
+
+    def add(filename, fileobj):
+        if len(sources) >= get_max_files():
+            raise ValueError(f"At most {get_max_files()} files can be uploaded at once")
+        check_compression(filename)
+        # Keep a compressed file's suffix so the parser knows to decompress it
+        suffix = Path(filename).suffix.lower() if compression_of(filename) else ''
+        path = directory / f"{len(sources)}.csv{suffix}"
+        digest = _copy_and_hash(fileobj, path)
+        if suffix:
+            # De-duplicated by the CSV inside, like single uploads
+            with open(path, 'rb') as fh:
+                digest = content_digest(fh, filename)
+        sources.append({"filename": filename, "path": path, "sha256": digest})
+
+    for uploaded in uploaded_files:
+        if uploaded.name.lower().endswith('.zip') or zipfile.is_zipfile(uploaded):
+            uploaded.seek(0)
+            with zipfile.ZipFile(uploaded) as archive:
+                for member in archive.infolist():
+                    if member.is_dir() or not member.filename.lower().endswith(CSV_SUFFIXES):
+                        continue
+                    # Checked before anything is unpacked, against zip bombs. The declared
+                    # size is binding: zipfile never reads a member past it
+                    if member.file_size > get_max_member_bytes():
+                        raise ValueError(
+                            f"{member.filename} unpacks to {member.file_size} bytes, "
+                            f"more than the limit of {get_max_member_bytes()}"
+                        )
+                    unzipped += member.file_size
+                    if unzipped > get_max_unzipped_bytes():
+                        raise ValueError(f"The archives unpack to more than {get_max_unzipped_bytes()} bytes")
+                    with archive.open(member) as fileobj:
+                        add(os.path.basename(member.filename), fileobj)
+        else:
+            uploaded.seek(0)
+            add(uploaded.name, uploaded)
+    return sources
+
+
+def _ingest(source, staged):
+    """Insert one parsed file into a new batch and describe the outcome."""
+    result = {
+        "filename": source["filename"],
+        "sha256": source["sha256"],
+        "parse_seconds": round(staged["seconds"], 3),
+    }
+    if staged["error"]:
+        return {**result, "status": "error", "error": staged["error"]}
+
+    started = time.perf_counter()
+    name = store_file(source["path"], source["filename"])
+    try:
+        with transaction.atomic():
+            batch = UploadBatch.objects.create(file=name, content_hash=source["sha256"])
+    except IntegrityError:
+        # An identical file was uploaded by someone else while this one was parsing
+        default_storage.delete(name)
+        batch = UploadBatch.objects.defer('stats_state').get(content_hash=source["sha256"])
+        return {**result, "status": "duplicate", "batch_id": batch.id, "statistics": batch.statistics}
+    try:
+        running, write_method = ingest_staged(batch, source["sidecar"], staged["state"])
+    except Exception as e:
+        batch.file.delete(save=False)
+        batch.delete()
+        return {**result, "status": "error", "error": str(e)}
+    insert_seconds = time.perf_counter() - started
+    total = staged["seconds"] + insert_seconds
+    return {
+        **result,
+        "status": "created",
+        "batch_id": batch.id,
+        "rows": running.count,
+        "insert_seconds": round(insert_seconds, 3),
+        "rows_per_sec": round(running.count / total) if total > 0 else None,
+        "method": write_method,
+        "statistics": batch.statistics,
+    }
+
+
+def bulk_ingest(uploaded_files):
+    """
+    Ingest every CSV in ``uploaded_files`` (plain files and/or ZIPs), each
+    into its own batch. Returns one result dict per CSV, in upload order.
+    """
+    directory = staging_root() / uuid.uuid4().hex
+    directory.mkdir(parents=True)
+    try:
+        sources = collect_sources(uploaded_files, directory)
+        results = [None] * len(sources)
+
+        # De-duplicate first: against earlier uploads and within this request
+        existing = dict(
+            UploadBatch.objects.filter(content_hash__in=[s["sha256"] for s in sources])
+            .values_list('content_hash', 'id')
+        )
+        seen = {}
+        to_parse = []
+        for i, source in enumerate(sources):
+            batch_id = existing.get(source["sha256"])
+            if batch_id is None and source["sha256"] in seen:
+                results[i] = {"filename": source["filename"], "sha256": source["sha256"], "status": "duplicate",
+                              "duplicate_of": sources[seen[source["sha256"]]]["filename"]}
+                continue
+            if batch_id is not None:
+                batch = UploadBatch.objects.defer('stats_state').get(id=batch_id)
+                results[i] = {"filename": source["filename"], "sha256": source["sha256"], "status": "duplicate",
+                              "batch_id": batch_id, "statistics": batch.statistics}
+                continue
+            seen[source["sha256"]] = i
+            source["sidecar"] = directory / f"{i}.columnar"
+            to_parse.append(i)
+
+        chunk_rows, engine = get_chunk_rows(), get_parser_engine()
+        if get_workers() == 0:
+            # Inline mode (tests): parse and insert one file at a time
+            for i in to_parse:
+                staged = stage_file(str(sources[i]["path"]), str(sources[i]["sidecar"]), chunk_rows, engine)
+                results[i] = _ingest(sources[i], staged)
+        else:
+            def submit(pool):
+                return {
+                    pool.submit(stage_file, str(sources[i]["path"]), str(sources[i]["sidecar"]), chunk_rows, engine): i
+                    for i in to_parse
+                }
+
+            pool = _get_pool()
+            try:
+                futures = submit(pool)
+            except BrokenProcessPool:
+                # Broke after the last bulk upload finished
+                _discard_pool(pool)
+                pool = _get_pool()
+                futures = submit(pool)
+            # Insert each file as soon as it is parsed, while the others still parse
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    staged = future.result()
+                except BrokenProcessPool:
+                    _discard_pool(pool)
+                    staged = {"rows": 0, "state": None, "seconds": 0.0,
+                              "error": "The parser process stopped while reading this file"}
+                except Exception as e:
+                    staged = {"rows": 0, "state": None, "seconds": 0.0, "error": str(e)}
+                results[i] = _ingest(sources[i], staged)
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
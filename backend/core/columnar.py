@@ -0,0 +1,200 @@
+"""
+Columnar sidecar of a batch's equipment rows.
+
+At ingest every batch also gets a small directory of plain NumPy files
+under MEDIA_ROOT/columnar/<batch_id>/:
+
+    flowrate.npy, pressure.npy, temperature.npy   float64, one value per row
+    type_codes.npy                                int32 index into types.json
+    types.json                                    the distinct type names
+    name_offsets.npy, names.bin                   utf-8 names, Arrow-style
+
+Rows are in upload order, which is also primary key order. Readers open
+the arrays with np.load(mmap_mode='r'), so re-analysing or exporting a
+batch touches neither the ORM nor more memory than the pages it reads.
+
+SidecarWriter itself does not need Django and can run in worker processes.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from .parsing import PARAMETERS
+
+FLOAT_DTYPE = np.dtype('<f8')
+CODE_DTYPE = np.dtype('<i4')
+OFFSET_DTYPE = np.dtype('<i8')
+PARTS = PARAMETERS + ['type_codes', 'name_offsets', 'names']
+
+
+def sidecar_root():
+    from django.conf import settings
+    return Path(settings.MEDIA_ROOT) / 'columnar'
+
+
+def sidecar_dir(batch_id):
+    return sidecar_root() / str(batch_id)
+
+
+class SidecarWriter:
+    """
+    Append column chunks (see parsing.to_columns) to a sidecar directory.
+
+    Each array is streamed to a raw ``.part`` file as chunks arrive and only
+    turned into a ``.npy`` file by ``finalize``, so nothing is held in
+    memory beyond the current chunk.
+
+    A writer can be closed part way and picked up again later, even by
+    another process: ``close`` returns its state and ``SidecarWriter(directory,
+    state)`` carries on appending from there.
+    """
+
+    def __init__(self, directory, state=None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._parts = {}
+        if state is None:
+            self.count = 0
+            self.types = {}
+            self._name_bytes = 0
+            for name in PARTS:
+                self._parts[name] = open(self.directory / f'{name}.part', 'wb')
+            self._parts['name_offsets'].write(np.zeros(1, OFFSET_DTYPE).tobytes())
+            return
+
+        self.count = state['count']
+        self.types = {name: code for code, name in enumerate(state['types'])}
+        self._name_bytes = state['name_bytes']
+        # Cut every part back to what the state covers, dropping anything a
+        # failed append wrote after the state was taken
+        for name, size in self._part_sizes().items():
+            handle = open(self.directory / f'{name}.part', 'r+b')
+            handle.truncate(size)
+            handle.seek(size)
+            self._parts[name] = handle
+
+    def _part_sizes(self):
+        sizes = {field: self.count * FLOAT_DTYPE.itemsize for field in PARAMETERS}
+        sizes['type_codes'] = self.count * CODE_DTYPE.itemsize
+        sizes['name_offsets'] = (self.count + 1) * OFFSET_DTYPE.itemsize
+        sizes['names'] = self._name_bytes
+        return sizes
+
+    def state(self):
+        return {
+            'count': self.count,
+            'types': sorted(self.types, key=self.types.get),
+            'name_bytes': self._name_bytes,
+        }
+
+    def close(self):
+        """Flush and close the parts without finalizing; returns the state to resume from."""
+        for handle in self._parts.values():
+            handle.close()
+        return self.state()
+
+    def append(self, columns):
+        for field in PARAMETERS:
+            self._parts[field].write(np.ascontiguousarray(columns[field], FLOAT_DTYPE).tobytes())
+
+        # Dictionary-encode the types against every type seen so far
+        uniques, inverse = np.unique(columns['equipment_type'].astype(str), return_inverse=True)
+        mapping = np.array([self.types.setdefault(t, len(self.types)) for t in uniques.tolist()], CODE_DTYPE)
+        self._parts['type_codes'].write(mapping[inverse].astype(CODE_DTYPE).tobytes())
+
+        encoded = [str(name).encode() for name in columns['equipment_name'].tolist()]
+        lengths = np.fromiter(map(len, encoded), OFFSET_DTYPE, len(encoded))
+        self._parts['name_offsets'].write((self._name_bytes + np.cumsum(lengths)).astype(OFFSET_DTYPE).tobytes())
+        self._parts['names'].write(b''.join(encoded))
+        self._name_bytes += int(lengths.sum())
+        self.count += len(encoded)
+
+    def _finalize_array(self, name, dtype, length):
+        part = self.directory / f'{name}.part'
+        with open(self.directory / f'{name}.npy', 'wb') as out, open(part, 'rb') as raw:
+            np.lib.format.write_array_header_1_0(out, {
+                'descr': np.lib.format.dtype_to_descr(dtype),
+                'fortran_order': False,
+                'shape': (length,),
+            })
+            shutil.copyfileobj(raw, out)
+        part.unlink()
+
+    def finalize(self):
+        for handle in self._parts.values():
+            handle.close()
+        for field in PARAMETERS:
+            self._finalize_array(field, FLOAT_DTYPE, self.count)
+        self._finalize_array('type_codes', CODE_DTYPE, self.count)
+        self._finalize_array('name_offsets', OFFSET_DTYPE, self.count + 1)
+        os.replace(self.directory / 'names.part', self.directory / 'names.bin')
+        # types.json goes last; its presence marks a complete sidecar
+        types = sorted(self.types, key=self.types.get)
+        (self.directory / 'types.json').write_text(json.dumps(types))
+
+    def abort(self):
+        for handle in self._parts.values():
+            handle.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class Sidecar:
+    """Read-only, memory-mapped view of a finished sidecar directory."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.types = json.loads((self.directory / 'types.json').read_text())
+        self.arrays = {
+            field: np.load(self.directory / f'{field}.npy', mmap_mode='r')
+            for field in PARAMETERS
+        }
+        self.type_codes = np.load(self.directory / 'type_codes.npy', mmap_mode='r')
+        self.name_offsets = np.load(self.directory / 'name_offsets.npy', mmap_mode='r')
+        self._names_path = self.directory / 'names.bin'
+
+    def __len__(self):
+        return len(self.type_codes)
+
+    def __getitem__(self, field):
+        return self.arrays[field]
+
+    def equipment_types(self, start=0, stop=None):
+        return np.array(self.types, dtype=object)[self.type_codes[start:stop]]
+
+    def equipment_names(self, start=0, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        offsets = np.asarray(self.name_offsets[start:stop + 1])
+        if len(offsets) < 2:
+            return np.array([], dtype=object)
+        with open(self._names_path, 'rb') as fh:
+            fh.seek(int(offsets[0]))
+            blob = fh.read(int(offsets[-1] - offsets[0]))
+        relative = (offsets - offsets[0]).tolist()
+        return np.array([blob[a:b].decode() for a, b in zip(relative[:-1], relative[1:])], dtype=object)
+
+    def iter_columns(self, chunk_rows, names=True):
+        """Yield parsing.to_columns-style dicts of at most ``chunk_rows`` rows."""
+        for start in range(0, len(self), chunk_rows):
+            stop = start + chunk_rows
+            columns = {field: np.asarray(self.arrays[field][start:stop]) for field in PARAMETERS}
+            columns['equipment_type'] = self.equipment_types(start, stop)
+            if names:
+                columns['equipment_name'] = self.equipment_names(start, stop)
+            yield columns
+
+
+def open_sidecar(batch_id):
+    """Return the batch's Sidecar, or None if it has none (e.g. older batches)."""
+    directory = sidecar_dir(batch_id)
+    if not (directory / 'types.json').exists():
+        return None
+    return Sidecar(directory)
+
+
+def purge_sidecars(batch_ids):
+    """Delete the sidecars of the given batches."""
+    for batch_id in batch_ids:
+        shutil.rmtree(sidecar_dir(batch_id), ignore_errors=True)
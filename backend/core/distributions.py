@@ -0,0 +1,139 @@
+"""
+Distribution sketches: a vectorized, mergeable t-digest plus the helpers
+that turn one into the percentile / histogram summaries we report.
+
+A digest keeps a bounded number of (mean, weight) centroids, small near
+the tails and large around the median, so extreme percentiles stay
+accurate while the state stays a few KB however many values went in.
+Digests built from separate chunks, workers or batches merge into one.
+Like parsing.py this module has no Django dependency.
+"""
+import numpy as np
+
+PERCENTILES = [50, 95, 99]
+HISTOGRAM_BINS = 20
+DEFAULT_COMPRESSION = 200
+
+
+class TDigest:
+    """
+    Merging t-digest with the k1 (arcsine) scale function.
+
+    Values are folded in a whole array at a time: the incoming values and
+    the current centroids are sorted together, each point is assigned to
+    the k-scale bucket its cumulative weight falls in, and the buckets are
+    collapsed with np.add.reduceat. While the total number of points is at
+    most ``compression`` they are all kept as they are, so small batches
+    get exact percentiles.
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values):
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self._absorb(values, np.ones(len(values)))
+        return self
+
+    def merge(self, other):
+        if len(other.means):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._absorb(other.means, other.weights)
+        return self
+
+    def _absorb(self, means, weights):
+        means = np.concatenate((self.means, means))
+        weights = np.concatenate((self.weights, weights))
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+
+        if len(means) > self.compression:
+            total = weights.sum()
+            q = (np.cumsum(weights) - weights / 2) / total
+            k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+            bucket = np.floor(k - k[0]).astype(np.int64)
+            starts = np.flatnonzero(np.r_[True, np.diff(bucket) > 0])
+            merged = np.add.reduceat(weights, starts)
+            means = np.add.reduceat(means * weights, starts) / merged
+            weights = merged
+        self.means, self.weights = means, weights
+
+    def _knots(self):
+        # Centroid centres on a 0..n-1 rank scale, pinned to the exact min/max.
+        # With unit weights this is numpy's default (linear) percentile.
+        n = self.count
+        ranks = np.cumsum(self.weights) - self.weights / 2 - 0.5
+        positions = np.concatenate(([0.0], ranks, [n - 1]))
+        values = np.concatenate(([self.min], self.means, [self.max]))
+        return positions, values
+
+    def quantile(self, q):
+        if not len(self.means):
+            return np.full(np.shape(q), np.nan)
+        positions, values = self._knots()
+        return np.interp(np.asarray(q, dtype=np.float64) * (self.count - 1), positions, values)
+
+    def histogram(self, edges):
+        """
+        Counts per bin of ``edges``, binned like np.histogram (the last bin
+        includes its right edge). While every point is still held this is
+        exact; once compressed, each centroid's weight goes to the bin its
+        mean falls in.
+        """
+        edges = np.asarray(edges, dtype=np.float64)
+        # A merged mean can land a rounding error outside the extremes
+        means = np.clip(self.means, edges[0], edges[-1])
+        counts, _ = np.histogram(means, bins=edges, weights=self.weights)
+        return np.round(counts).astype(np.int64)
+
+    def to_dict(self):
+        return {
+            "compression": self.compression,
+            "means": self.means.tolist(),
+            "weights": self.weights.tolist(),
+            "min": self.min if len(self.means) else None,
+            "max": self.max if len(self.means) else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data["compression"])
+        digest.means = np.array(data["means"], dtype=np.float64)
+        digest.weights = np.array(data["weights"], dtype=np.float64)
+        if len(digest.means):
+            digest.min, digest.max = data["min"], data["max"]
+        return digest
+
+
+def histogram_edges(low, high, bins=HISTOGRAM_BINS):
+    if low == high:
+        # A constant column still gets a (one value wide) histogram
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+
+def summarize(count, mean, std, digest, edges):
+    """Summary of one parameter: moments, extremes, percentiles and histogram over ``edges``."""
+    summary = {
+        "count": int(count),
+        "mean": round(float(mean), 2),
+        "std": round(float(std), 2),
+        "min": round(float(digest.min), 2),
+        "max": round(float(digest.max), 2),
+    }
+    for p, value in zip(PERCENTILES, digest.quantile(np.array(PERCENTILES) / 100)):
+        summary[f"p{p}"] = round(float(value), 2)
+    summary["histogram"] = digest.histogram(edges).tolist()
+    return summary
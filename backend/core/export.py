@@ -0,0 +1,156 @@
+"""
+Streaming data export of a batch's equipment rows.
+
+Rows are read a chunk at a time, from the batch's memory-mapped columnar
+sidecar when it has one and from the database otherwise, and each chunk is
+encoded and handed to the HTTP response before the next one is fetched,
+so memory stays flat whatever the batch size. CSV always works; Arrow IPC
+and Parquet need pyarrow, which is optional.
+"""
+import csv
+import io
+from itertools import islice
+
+import numpy as np
+
+from .columnar import open_sidecar
+from .models import ChemicalEquipment
+from .parsing import COLUMN_MAP
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+    pq = None
+
+EXPORT_FIELDS = ['equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature']
+EXPORT_CHUNK_ROWS = 50000
+
+# format -> (content type, file extension, needs pyarrow)
+FORMATS = {
+    'csv': ('text/csv', 'csv', False),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows', True),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', True),
+}
+
+
+def available_formats():
+    return [name for name, (_, _, needs_arrow) in FORMATS.items() if pa is not None or not needs_arrow]
+
+
+def iter_column_chunks(batch, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the batch's rows as {field: array} dicts of at most ``chunk_rows`` rows."""
+    sidecar = open_sidecar(batch.id)
+    if sidecar is not None:
+        yield from sidecar.iter_columns(chunk_rows)
+        return
+
+    rows = (
+        ChemicalEquipment.objects.filter(batch=batch)
+        .order_by('id')
+        .values_list(*EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_rows)
+    )
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            return
+        names, types, *values = zip(*chunk)
+        columns = {
+            'equipment_name': np.array(names, dtype=object),
+            'equipment_type': np.array(types, dtype=object),
+        }
+        for field, column in zip(EXPORT_FIELDS[2:], values):
+            columns[field] = np.array(column, dtype=np.float64)
+        yield columns
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects what pyarrow writes until it is drained."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_schema():
+    return pa.schema([
+        ('equipment_name', pa.string()),
+        ('equipment_type', pa.dictionary(pa.int32(), pa.string())),
+        ('flowrate', pa.float64()),
+        ('pressure', pa.float64()),
+        ('temperature', pa.float64()),
+    ])
+
+
+def _record_batch(columns, schema):
+    arrays = [
+        pa.array(columns['equipment_name'].tolist(), type=pa.string()),
+        pa.array(columns['equipment_type'].tolist(), type=pa.string()).dictionary_encode(),
+    ] + [pa.array(columns[field], type=pa.float64()) for field in EXPORT_FIELDS[2:]]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def stream_csv(batch):
+    # Same headers as the upload format, so an export can be uploaded again
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(list(COLUMN_MAP))
+    yield buffer.getvalue().encode()
+    for columns in iter_column_chunks(batch):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(zip(*(columns[field].tolist() for field in EXPORT_FIELDS)))
+        yield buffer.getvalue().encode()
+
+
+def stream_arrow(batch):
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        yield sink.drain()
+        for columns in iter_column_chunks(batch):
+            writer.write_batch(_record_batch(columns, schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_parquet(batch):
+    # One row group per chunk; the footer goes out when the writer closes
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for columns in iter_column_chunks(batch):
+            writer.write_batch(_record_batch(columns, schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'arrow': stream_arrow,
+    'parquet': stream_parquet,
+}
+
+
+def stream_batch(batch, fmt):
+    """Return a generator of encoded byte chunks of ``batch`` in format ``fmt``."""
+    return (chunk for chunk in STREAMERS[fmt](batch) if chunk)
@@ -0,0 +1,160 @@
+"""
+Database side of the CSV ingest.
+
+Rows arrive as column arrays (see parsing.to_columns) and are written in
+fixed-size chunks, using the fastest bulk path the database backend offers.
+"""
+import os
+import shutil
+from itertools import repeat
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .accumulator import StatsAccumulator
+from .columnar import Sidecar, SidecarWriter, sidecar_dir
+from .models import ChemicalEquipment
+from .parsing import read_chunks, to_columns
+
+FIELDS = ['batch', 'equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature']
+
+
+def get_batch_size():
+    return getattr(settings, 'INGEST_BATCH_SIZE', 5000)
+
+
+def get_chunk_rows():
+    return getattr(settings, 'INGEST_CHUNK_ROWS', 50000)
+
+
+def get_parser_engine():
+    return getattr(settings, 'CSV_PARSER_ENGINE', 'auto')
+
+
+def _iter_rows(batch_id, columns, start, stop):
+    # .tolist() hands back plain Python floats in one go, which every DB driver accepts
+    return zip(
+        repeat(batch_id),
+        columns['equipment_name'][start:stop].tolist(),
+        columns['equipment_type'][start:stop].tolist(),
+        columns['flowrate'][start:stop].tolist(),
+        columns['pressure'][start:stop].tolist(),
+        columns['temperature'][start:stop].tolist(),
+    )
+
+
+def _quoted_table():
+    meta = ChemicalEquipment._meta
+    quote = connection.ops.quote_name
+    cols = ', '.join(quote(meta.get_field(name).column) for name in FIELDS)
+    return quote(meta.db_table), cols
+
+
+def insert_equipment(batch, columns, batch_size=None):
+    """
+    Insert every row in ``columns`` for ``batch``.
+
+    Call this inside a transaction. Returns the name of the write path used
+    so it can be reported back with the upload.
+    """
+    batch_size = batch_size or get_batch_size()
+    total = len(columns['flowrate'])
+    table, cols = _quoted_table()
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            # psycopg 3 exposes COPY directly; psycopg2 does not, so it falls through
+            if hasattr(raw, 'copy'):
+                with raw.copy(f"COPY {table} ({cols}) FROM STDIN") as copy:
+                    for start in range(0, total, batch_size):
+                        for row in _iter_rows(batch.id, columns, start, start + batch_size):
+                            copy.write_row(row)
+                return 'copy'
+
+    if connection.vendor in ('postgresql', 'sqlite'):
+        placeholders = ', '.join(['%s'] * len(FIELDS))
+        sql = f"INSERT INTO {table} ({cols}) VALUES ({placeholders})"
+        with connection.cursor() as cursor:
+            for start in range(0, total, batch_size):
+                cursor.executemany(sql, list(_iter_rows(batch.id, columns, start, start + batch_size)))
+        return 'executemany'
+
+    # Anything else goes through the ORM, still one chunk at a time
+    for start in range(0, total, batch_size):
+        ChemicalEquipment.objects.bulk_create([
+            ChemicalEquipment(
+                batch_id=batch_id,
+                equipment_name=name,
+                equipment_type=eq_type,
+                flowrate=flow,
+                pressure=pressure,
+                temperature=temp,
+            )
+            for batch_id, name, eq_type, flow, pressure, temp
+            in _iter_rows(batch.id, columns, start, start + batch_size)
+        ])
+    return 'bulk_create'
+
+
+def ingest_file(batch, path, progress=None):
+    """
+    Stream the CSV at ``path`` into ``batch``.
+
+    Each chunk is coerced, inserted, appended to the batch's columnar
+    sidecar and folded into a StatsAccumulator before the next one is
+    read, so the file is only ever read once. The final statistics and the
+    accumulator state are stored on the batch in the same transaction as
+    the rows. The header is expected to have been validated
+    already. ``progress``, if given, is called with the number of rows
+    written so far after every chunk.
+    Returns (accumulator, write_method).
+    """
+    running = StatsAccumulator()
+    write_method = None
+    sidecar = SidecarWriter(sidecar_dir(batch.id))
+    try:
+        with transaction.atomic():
+            for chunk in read_chunks(path, get_chunk_rows(), get_parser_engine()):
+                columns = to_columns(chunk)
+                write_method = insert_equipment(batch, columns)
+                sidecar.append(columns)
+                running.update(columns)
+                if progress:
+                    progress(running.count)
+            sidecar.finalize()
+            batch.statistics = running.as_dict()
+            batch.stats_state = running.to_dict()
+            batch.row_count = running.count
+            batch.file_size = os.path.getsize(path)
+            batch.save(update_fields=['statistics', 'stats_state', 'row_count', 'file_size'])
+    except BaseException:
+        sidecar.abort()
+        raise
+    return running, write_method
+
+
+def ingest_staged(batch, directory, state):
+    """
+    Insert the rows of a sidecar staged by staging.stage_file into ``batch``.
+
+    The rows are read back from the sidecar's memory-mapped arrays a chunk
+    at a time, and ``state`` (the staged StatsAccumulator) becomes the
+    batch's statistics, so nothing is parsed or aggregated twice. The
+    staged directory then becomes the batch's sidecar.
+    Returns (accumulator, write_method).
+    """
+    running = StatsAccumulator.from_dict(state)
+    write_method = None
+    target = sidecar_dir(batch.id)
+    with transaction.atomic():
+        for columns in Sidecar(directory).iter_columns(get_chunk_rows() or running.count or 1):
+            write_method = insert_equipment(batch, columns)
+        batch.statistics = running.as_dict()
+        batch.stats_state = state
+        batch.row_count = running.count
+        batch.file_size = batch.file.size
+        batch.save(update_fields=['statistics', 'stats_state', 'row_count', 'file_size'])
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(directory), str(target))
+    return running, write_method
@@ -0,0 +1,133 @@
+"""
+Background ingest jobs.
+
+Uploads made in job mode are handed to a small in-process thread pool, so
+the request returns straight away and no external broker is needed.
+Progress is published through the 'ingest_progress' cache while a job runs
+(the ingest itself is one open transaction, so the job row can't be updated
+from inside it) and the final state is written to the IngestJob row. That
+cache must be shared by all worker processes; see CACHES in settings.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .ingest import ingest_file
+from .models import IngestJob, UploadBatch
+from .retention import request_sweep
+
+PROGRESS_CACHE = 'ingest_progress'
+PROGRESS_TIMEOUT = 60 * 60
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_workers():
+    return getattr(settings, 'INGEST_JOB_WORKERS', 2)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=get_workers(), thread_name_prefix='ingest')
+        return _executor
+
+
+def _progress_key(job_id):
+    return f'core:ingest-job:{job_id}:rows'
+
+
+def submit(job):
+    """
+    Queue ``job`` for ingest once the current transaction commits.
+    With INGEST_JOB_WORKERS = 0 the job runs inline instead (handy in tests).
+    """
+    if get_workers() == 0:
+        run_job(job.pk)
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_run_in_worker, job.pk))
+
+
+def _run_in_worker(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # Each pool thread has its own connection; don't leave it dangling
+        connection.close()
+
+
+def run_job(job_id):
+    job = IngestJob.objects.get(pk=job_id)
+    job.state = IngestJob.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['state', 'started_at'])
+
+    key = _progress_key(job.pk)
+    cache = caches[PROGRESS_CACHE]
+    try:
+        try:
+            # The batch only becomes visible once every row is in
+            with transaction.atomic():
+                batch = UploadBatch.objects.create(file=job.file.name, content_hash=job.content_hash or None)
+                running, _ = ingest_file(
+                    batch, batch.file.path,
+                    progress=lambda rows: cache.set(key, rows, PROGRESS_TIMEOUT)
+                )
+        except IntegrityError:
+            # An identical upload was ingested while this job sat in the queue
+            batch = UploadBatch.objects.filter(content_hash=job.content_hash).first() if job.content_hash else None
+            if batch is None:
+                raise
+            running = None
+            # The earlier batch has its own copy of the file
+            job.file.delete(save=False)
+    except Exception as e:
+        # The batch was rolled back, so nothing refers to the stored file any more
+        job.file.delete(save=False)
+        job.state = IngestJob.FAILED
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['state', 'error', 'finished_at', 'file'])
+    else:
+        job.state = IngestJob.SUCCEEDED
+        job.batch = batch
+        job.rows_processed = running.count if running else batch.row_count
+        job.finished_at = timezone.now()
+        job.save(update_fields=['state', 'batch', 'rows_processed', 'finished_at', 'file'])
+        request_sweep()
+    finally:
+        cache.delete(key)
+
+
+def job_status(job):
+    """The job as reported by /api/jobs/<id>/, including live progress."""
+    rows = job.rows_processed
+    if job.state == IngestJob.RUNNING:
+        rows = caches[PROGRESS_CACHE].get(_progress_key(job.pk), rows)
+
+    rows_per_sec = None
+    if job.started_at:
+        elapsed = ((job.finished_at or timezone.now()) - job.started_at).total_seconds()
+        if elapsed > 0:
+            rows_per_sec = round(rows / elapsed)
+
+    # batch is null again once the batch has been pruned from history
+    batch = job.batch if job.state == IngestJob.SUCCEEDED else None
+    return {
+        "job_id": str(job.id),
+        "state": job.state,
+        "rows_processed": rows,
+        "rows_per_sec": rows_per_sec,
+        "batch_id": job.batch_id,
+        "statistics": batch.statistics if batch else None,
+        "error": job.error or None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
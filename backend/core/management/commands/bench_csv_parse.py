@@ -0,0 +1,97 @@
+import gzip
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from core.ingest import get_chunk_rows
+from core.parsing import REQUIRED_COLUMNS, available_engines, read_chunks, to_columns
+
+from .bench_type_distribution import synthetic_columns
+
+
+def legacy_chunks(path, chunk_rows):
+    # What ingest used to do: every column read, every dtype inferred
+    with pd.read_csv(path, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield chunk[REQUIRED_COLUMNS]
+
+
+def write_csv(path, rows, rng):
+    columns = synthetic_columns(rows, rng)
+    pd.DataFrame({
+        'Equipment Name': columns['equipment_name'],
+        'Type': columns['equipment_type'],
+        'Flowrate': columns['flowrate'].round(3),
+        'Pressure': columns['pressure'].round(3),
+        'Temperature': columns['temperature'].round(2),
+        # An extra column nobody asked for, like real plant exports have
+        'Notes': np.where(rng.random(rows) < 0.1, 'inspected', ''),
+    }).to_csv(path, index=False)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time CSV parsing of generated files with each parser engine: pandas' "
+        "C parser with inferred dtypes (the old path), the C parser with "
+        "explicit dtypes and usecols, and the pyarrow engine if installed. "
+        "Reports parse-only and parse + to_columns throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000000])
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--chunk-rows', type=int, default=None,
+                            help="Rows per chunk (default: INGEST_CHUNK_ROWS; 0 reads whole files)")
+        parser.add_argument('--gzip', action='store_true', help="Also time .csv.gz copies of the files")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        chunk_rows = options['chunk_rows'] if options['chunk_rows'] is not None else get_chunk_rows()
+        readers = {'c, inferred': lambda path: legacy_chunks(path, chunk_rows or None)}
+        for engine in reversed(available_engines()):
+            readers[engine] = lambda path, engine=engine: read_chunks(path, chunk_rows or None, engine)
+
+        def timed(fn):
+            samples = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - start)
+            return statistics.median(samples)
+
+        workdir = Path(tempfile.mkdtemp(prefix='bench_csv_parse-'))
+        try:
+            files = []
+            for rows in options['rows']:
+                path = workdir / f'{rows}.csv'
+                write_csv(path, rows, rng)
+                files.append((rows, path))
+                if options['gzip']:
+                    gz_path = workdir / f'{rows}.csv.gz'
+                    with open(path, 'rb') as src, gzip.open(gz_path, 'wb', compresslevel=6) as out:
+                        shutil.copyfileobj(src, out)
+                    files.append((rows, gz_path))
+
+            self.stdout.write(
+                f"chunk rows: {chunk_rows or 'whole file'}, median of {options['repeat']} runs"
+            )
+            self.stdout.write(
+                f"{'file':>18}{'MB':>8}{'engine':>14}{'parse s':>10}{'rows/s':>12}{'MB/s':>8}{'+columns s':>12}"
+            )
+            for rows, path in files:
+                megabytes = path.stat().st_size / 1e6
+                for name, reader in readers.items():
+                    parse = timed(lambda: sum(len(chunk) for chunk in reader(path)))
+                    full = timed(lambda: [to_columns(chunk) for chunk in reader(path)])
+                    self.stdout.write(
+                        f"{path.name:>18}{megabytes:>8.1f}{name:>14}{parse:>10.3f}"
+                        f"{rows / parse:>12,.0f}{megabytes / parse:>8.1f}{full:>12.3f}"
+                    )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
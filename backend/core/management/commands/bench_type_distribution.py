@@ -0,0 +1,87 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.analytics import type_breakdown
+from core.ingest import insert_equipment
+from core.models import UploadBatch
+
+TYPES = ['Pump', 'Valve', 'Compressor', 'HeatExchanger', 'Reactor', 'Condenser']
+INDEX_NAME = 'core_equip_batch_type_idx'
+
+
+def legacy_type_counts(batch):
+    # What BatchAnalysisView used to do: pull every row and count in Python
+    type_counts = {}
+    for e in batch.equipments.all():
+        type_counts[e.equipment_type] = type_counts.get(e.equipment_type, 0) + 1
+    return type_counts
+
+
+def synthetic_columns(rows, rng):
+    types = np.array(TYPES, dtype=object)[rng.integers(0, len(TYPES), rows)]
+    return {
+        'equipment_name': np.array([f"EQ-{i}" for i in range(rows)], dtype=object),
+        'equipment_type': types,
+        'flowrate': rng.normal(120, 30, rows),
+        'pressure': rng.normal(6, 1.5, rows),
+        'temperature': rng.normal(115, 12, rows),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the per-type distribution of a batch against batch size: the old "
+        "Python loop vs the database GROUP BY, with and without the "
+        "(batch, equipment_type) index. Everything runs in a transaction that "
+        "is rolled back, so the database is left untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--noise-rows', type=int, default=200000,
+                            help="Rows in an unrelated batch, so the index has something to skip")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        repeat = options['repeat']
+
+        def timed(fn):
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                samples.append((time.perf_counter() - start) * 1000)
+            return statistics.median(samples)
+
+        with transaction.atomic():
+            noise = UploadBatch.objects.create(file='bench/noise.csv')
+            insert_equipment(noise, synthetic_columns(options['noise_rows'], rng))
+
+            batches = []
+            for size in options['sizes']:
+                batch = UploadBatch.objects.create(file=f'bench/{size}.csv')
+                insert_equipment(batch, synthetic_columns(size, rng))
+                batches.append((size, batch))
+
+            results = {size: {} for size, _ in batches}
+            for size, batch in batches:
+                results[size]['python loop'] = timed(lambda: legacy_type_counts(batch))
+                results[size]['group by + index'] = timed(lambda: type_breakdown(batch.equipments.all()))
+
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP INDEX {connection.ops.quote_name(INDEX_NAME)}")
+            for size, batch in batches:
+                results[size]['group by, no index'] = timed(lambda: type_breakdown(batch.equipments.all()))
+
+            transaction.set_rollback(True)
+
+        columns = ['python loop', 'group by, no index', 'group by + index']
+        self.stdout.write(f"{connection.vendor}, median of {repeat} runs (ms)")
+        self.stdout.write(f"{'rows':>10}" + ''.join(f"{name:>22}" for name in columns))
+        for size in options['sizes']:
+            self.stdout.write(f"{size:>10}" + ''.join(f"{results[size][name]:>22.1f}" for name in columns))
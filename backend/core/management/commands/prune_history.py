@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from core import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the retention policy: delete every batch outside the RETENTION_* "
+        "limits, a chunk of rows at a time, together with its uploaded file, "
+        "columnar sidecar and cached reports. Options override the settings "
+        "for this run. Meant for cron, alongside or instead of the background sweeper."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-batches', type=int)
+        parser.add_argument('--max-age-days', type=int)
+        parser.add_argument('--max-total-rows', type=int)
+        parser.add_argument('--max-total-bytes', type=int)
+        parser.add_argument('--dry-run', action='store_true', help="Only list what would be deleted")
+        parser.add_argument('--orphans', action='store_true',
+                            help="Also delete files in uploads/ that no batch or pending job refers to")
+
+    def handle(self, *args, **options):
+        policy = retention.get_policy(
+            max_batches=options['max_batches'],
+            max_age_days=options['max_age_days'],
+            max_total_rows=options['max_total_rows'],
+            max_total_bytes=options['max_total_bytes'],
+        )
+        self.stdout.write(f"Policy: {policy}")
+
+        result = retention.sweep(policy, dry_run=options['dry_run'])
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(f"{verb} {len(result['batches'])} batches {result['batches']} ({result['rows']} rows)")
+
+        if options['orphans']:
+            orphans = retention.orphan_files()
+            for path in orphans:
+                self.stdout.write(f"{verb} orphan {path}")
+                if not options['dry_run']:
+                    path.unlink(missing_ok=True)
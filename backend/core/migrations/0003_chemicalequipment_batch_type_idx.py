@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_uploadbatch_statistics'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chemicalequipment',
+            index=models.Index(fields=['batch', 'equipment_type'], name='core_equip_batch_type_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_row_count(apps, schema_editor):
+    UploadBatch = apps.get_model('core', 'UploadBatch')
+    ChemicalEquipment = apps.get_model('core', 'ChemicalEquipment')
+    counts = (
+        ChemicalEquipment.objects.filter(batch=OuterRef('pk'))
+        .order_by().values('batch').annotate(n=Count('id')).values('n')
+    )
+    UploadBatch.objects.update(row_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_chemicalequipment_batch_type_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadbatch',
+            name='row_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_row_count, migrations.RunPython.noop),
+    ]
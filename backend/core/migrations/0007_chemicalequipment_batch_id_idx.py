@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chemicalequipment',
+            index=models.Index(fields=['batch', 'id'], name='core_equip_batch_id_idx'),
+        ),
+    ]
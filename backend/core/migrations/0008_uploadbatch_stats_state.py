@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_chemicalequipment_batch_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadbatch',
+            name='stats_state',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
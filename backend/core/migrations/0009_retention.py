@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+def backfill_file_size(apps, schema_editor):
+    UploadBatch = apps.get_model('core', 'UploadBatch')
+    for batch in UploadBatch.objects.only('id', 'file').iterator():
+        try:
+            size = batch.file.size
+        except (OSError, ValueError):
+            # File already gone from uploads/
+            continue
+        UploadBatch.objects.filter(id=batch.id).update(file_size=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_uploadbatch_stats_state'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadbatch',
+            name='uploaded_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='uploadbatch',
+            name='file_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_file_size, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 
 class UploadBatch(models.Model):
@@ -6,7 +8,21 @@ class UploadBatch(models.Model):
     This helps us implement 'History Management' later.
     """
     file = models.FileField(upload_to='uploads/')
-    uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Indexed: retention and the history list both walk batches newest first
+    uploaded_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Summary stats computed once at ingest (same shape as the API's "statistics").
+    # Null for batches uploaded before stats were stored; see analytics.get_batch_statistics
+    statistics = models.JSONField(null=True, blank=True)
+    # StatsAccumulator.to_dict() of the batch (moments + t-digests), so batches can be
+    # merged without touching their rows. Several KB: defer it unless you need it
+    stats_state = models.JSONField(null=True, blank=True, editable=False)
+    # Number of ChemicalEquipment rows, kept here so listings don't have to count them
+    row_count = models.PositiveIntegerField(default=0)
+    # Size of the uploaded file in bytes, for the RETENTION_MAX_TOTAL_BYTES rule
+    file_size = models.PositiveBigIntegerField(default=0)
+    # SHA-256 of the uploaded file; re-uploading the same bytes returns this batch.
+    # Null for batches uploaded before de-duplication
+    content_hash = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"Upload at {self.uploaded_at}"
@@ -26,5 +42,82 @@ class ChemicalEquipment(models.Model):
     pressure = models.FloatField()
     temperature = models.FloatField()
 
+    class Meta:
+        indexes = [
+            # Serves the per-type GROUP BY in analytics.type_breakdown
+            models.Index(fields=['batch', 'equipment_type'], name='core_equip_batch_type_idx'),
+            # Keyset pagination of a batch's rows (EquipmentRowsView)
+            models.Index(fields=['batch', 'id'], name='core_equip_batch_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment_name} ({self.equipment_type})"
+
+
+class IngestJob(models.Model):
+    """
+    An upload queued for background ingest (see core.jobs).
+    The batch is only created, and linked here, once the ingest succeeds.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATE_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file = models.FileField(upload_to='uploads/')
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    batch = models.ForeignKey(UploadBatch, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    state = models.CharField(max_length=16, choices=STATE_CHOICES, default=QUEUED)
+    rows_processed = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Ingest job {self.id} ({self.state})"
+
+class UploadSession(models.Model):
+    """
+    A resumable upload (see core.resumable): the client PUTs the file in
+    chunks at increasing offsets and rows are parsed as they arrive. The
+    batch is created, and linked here, when the session is finalized.
+    """
+    OPEN = 'open'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+    STATE_CHOICES = [
+        (OPEN, 'Open'),
+        (COMPLETE, 'Complete'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    # Announced by the client at init; writes past it are refused. Null if unknown
+    total_size = models.PositiveBigIntegerField(null=True, blank=True)
+    # SHA-256 the client expects, checked at finalize (and used to skip known files)
+    expected_hash = models.CharField(max_length=64, blank=True)
+    # Bytes stored so far: the offset the next chunk must start at
+    received = models.PositiveBigIntegerField(default=0)
+    # Bytes already parsed into the staged sidecar (always at a line boundary)
+    parsed = models.PositiveBigIntegerField(default=0)
+    header = models.TextField(blank=True)
+    # SidecarWriter.close() and StatsAccumulator.to_dict() of the rows parsed so far
+    sidecar_state = models.JSONField(null=True, blank=True, editable=False)
+    stats_state = models.JSONField(null=True, blank=True, editable=False)
+    batch = models.ForeignKey(UploadBatch, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    state = models.CharField(max_length=16, choices=STATE_CHOICES, default=OPEN)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return f"{self.equipment_name} ({self.equipment_type})"
\ No newline at end of file
+        return f"Upload session {self.id} ({self.state}, {self.received} bytes)"
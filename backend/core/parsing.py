@@ -0,0 +1,185 @@
+"""
+CSV parsing helpers for equipment uploads.
+
+Nothing in here touches Django, so these functions can also run in
+worker processes that never set up the ORM.
+
+Uploads may be compressed (see COMPRESSIONS). pandas picks the codec from
+the file name and decompresses as it reads, so a .csv.gz is streamed chunk
+by chunk into the parser and never inflated on disk.
+"""
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+# CSV header -> ChemicalEquipment field
+COLUMN_MAP = {
+    'Equipment Name': 'equipment_name',
+    'Type': 'equipment_type',
+    'Flowrate': 'flowrate',
+    'Pressure': 'pressure',
+    'Temperature': 'temperature',
+}
+REQUIRED_COLUMNS = list(COLUMN_MAP)
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+PARAMETERS = [COLUMN_MAP[col] for col in NUMERIC_COLUMNS]
+
+# Parser dtypes for the required columns: nothing is type-inferred, and the
+# few distinct types are read as a category rather than one string per row
+CSV_DTYPES = {
+    'Equipment Name': str,
+    'Type': 'category',
+    **{col: np.float64 for col in NUMERIC_COLUMNS},
+}
+ENGINES = ['pyarrow', 'c']
+
+# Compressed upload suffix -> codec; zstd needs the optional `zstandard` package
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def compression_of(name):
+    """The codec a file name says it is compressed with, or None for plain CSV."""
+    for suffix, codec in COMPRESSIONS.items():
+        if str(name).lower().endswith(suffix):
+            return codec
+    return None
+
+
+def decompressed(fileobj, codec):
+    """A readable binary stream of what ``fileobj`` holds, inflated with ``codec`` (see COMPRESSIONS)."""
+    if codec == 'gzip':
+        import gzip
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    import zstandard
+    return zstandard.ZstdDecompressor().stream_reader(fileobj)
+
+
+def available_compressions():
+    codecs = ['gzip']
+    if importlib.util.find_spec('zstandard') is not None:
+        codecs.append('zstd')
+    return codecs
+
+
+def check_compression(name):
+    """Raise ValueError if ``name`` is compressed with a codec this server can't read."""
+    codec = compression_of(name)
+    if codec is not None and codec not in available_compressions():
+        raise ValueError(f"{codec} uploads are not supported on this server (install zstandard)")
+
+
+def available_engines():
+    """CSV parsers usable here, fastest first."""
+    engines = ['c']
+    if importlib.util.find_spec('pyarrow') is not None:
+        engines.insert(0, 'pyarrow')
+    return engines
+
+
+def resolve_engine(engine=None):
+    """
+    The parser to use for ``engine``: 'pyarrow' (multithreaded Arrow CSV
+    reader), 'c' (pandas' C parser), or 'auto'/None for the fastest one
+    installed. Raises ValueError for an unknown or missing engine.
+    """
+    if engine in (None, 'auto'):
+        return available_engines()[0]
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown CSV engine '{engine}'. Choose from {ENGINES}")
+    if engine not in available_engines():
+        raise ValueError(f"The '{engine}' CSV engine is not installed")
+    return engine
+
+
+def read_header(path):
+    """Read just the header row of a CSV file."""
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_chunks(path, chunk_rows=None, engine=None):
+    """
+    Yield the required columns of a CSV file as DataFrames of at most
+    ``chunk_rows`` rows, so memory stays flat however big the file is.
+    With no ``chunk_rows`` the whole file comes back as one chunk.
+    ``engine`` picks the parser (see resolve_engine); either way only the
+    required columns are read, with the dtypes in CSV_DTYPES.
+    """
+    if resolve_engine(engine) == 'pyarrow':
+        yield from _read_chunks_arrow(path, chunk_rows)
+        return
+    if not chunk_rows:
+        yield pd.read_csv(path, usecols=REQUIRED_COLUMNS, dtype=CSV_DTYPES)
+        return
+    with pd.read_csv(path, usecols=REQUIRED_COLUMNS, dtype=CSV_DTYPES, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def _read_chunks_arrow(path, chunk_rows):
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    convert = pa_csv.ConvertOptions(
+        include_columns=REQUIRED_COLUMNS,
+        column_types={
+            'Equipment Name': pa.string(),
+            # Dictionary-encoded, so it arrives in pandas as a category
+            'Type': pa.dictionary(pa.int32(), pa.string()),
+            **{col: pa.float64() for col in NUMERIC_COLUMNS},
+        },
+    )
+    if not chunk_rows:
+        # Whole file at once: blocks are parsed on every core
+        yield pa_csv.read_csv(path, convert_options=convert).to_pandas()
+        return
+
+    # The streaming reader hands out record batches by byte size; re-cut
+    # them into chunk_rows rows
+    pending = None
+    with pa_csv.open_csv(path, convert_options=convert) as reader:
+        for batch in reader:
+            table = pa.Table.from_batches([batch])
+            if pending is not None:
+                table = pa.concat_tables([pending, table])
+            while table.num_rows >= chunk_rows:
+                yield table.slice(0, chunk_rows).to_pandas()
+                table = table.slice(chunk_rows)
+            pending = table
+    if pending is not None and pending.num_rows:
+        yield pending.to_pandas()
+
+
+def missing_columns(columns):
+    """Return the required CSV headers that are not in ``columns``."""
+    return [col for col in REQUIRED_COLUMNS if col not in columns]
+
+
+def _type_column(types):
+    if isinstance(types.dtype, pd.CategoricalDtype):
+        codes = types.cat.codes.to_numpy()
+        if (codes >= 0).all():
+            # Convert the handful of categories, not every row
+            return np.asarray(types.cat.categories.astype(str), dtype=object)[codes]
+    return types.astype(str).to_numpy(dtype=object)
+
+
+def to_columns(df):
+    """
+    Convert a parsed DataFrame into one NumPy array per model field.
+
+    Coercion happens column-wise, so there is no per-row Series boxing.
+    Raises ValueError if a numeric column has empty or non-numeric cells.
+    """
+    columns = {
+        'equipment_name': df['Equipment Name'].astype(str).to_numpy(dtype=object),
+        'equipment_type': _type_column(df['Type']),
+    }
+    for col in NUMERIC_COLUMNS:
+        values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+        bad = np.isnan(values)
+        if bad.any():
+            raise ValueError(f"Column '{col}' has {int(bad.sum())} empty or non-numeric values")
+        columns[COLUMN_MAP[col]] = values
+    return columns
+
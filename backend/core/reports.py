@@ -0,0 +1,277 @@
+"""
+PDF reports for upload batches, plus an on-disk cache of rendered reports.
+
+Batches never change after ingest, so a report is rendered once, kept
+under MEDIA_ROOT/report_cache and served from there afterwards. The cache
+is bounded by REPORT_CACHE_MAX_BYTES; the least recently served reports
+are evicted first.
+"""
+import os
+import uuid
+from itertools import chain
+from pathlib import Path
+
+from django.conf import settings
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.enums import TA_CENTER
+
+from .analytics import get_batch_statistics
+
+# Bump when the report layout changes so cached copies are not served
+REPORT_VERSION = 1
+
+
+EQUIPMENT_COLUMNS = ['equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature']
+# Rows per equipment table in the full export; about one letter page
+ROWS_PER_TABLE = 35
+# Rows fetched from the DB per round-trip in the full export
+EXPORT_CHUNK_SIZE = 2000
+
+EQUIPMENT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (1, -1), 'LEFT'),  # Name and Type left-aligned
+    ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),  # Numbers right-aligned
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
+])
+
+
+def _equipment_table(rows):
+    equipment_data = [['Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']]
+    for name, eq_type, flowrate, pressure, temperature in rows:
+        equipment_data.append([name, eq_type, f"{flowrate}", f"{pressure}", f"{temperature}"])
+
+    # repeatRows keeps the header on every page if the table gets split
+    equipment_table = Table(equipment_data, colWidths=[1.8*inch, 1.2*inch, 1*inch, 1*inch, 1*inch], repeatRows=1)
+    equipment_table.setStyle(EQUIPMENT_TABLE_STYLE)
+    return equipment_table
+
+
+def _equipment_tables(rows):
+    """Group ``rows`` into page-sized equipment tables, one at a time."""
+    page = []
+    for row in rows:
+        page.append(row)
+        if len(page) == ROWS_PER_TABLE:
+            yield _equipment_table(page)
+            page = []
+    if page:
+        yield _equipment_table(page)
+
+
+class _LazyFlowables(list):
+    """
+    A flowable list that refills itself from an iterator as
+    SimpleDocTemplate.build() consumes it from the front.
+
+    build() checks len() before every flowable, so only a few flowables
+    are in memory at any moment instead of the whole document.
+    """
+
+    def __init__(self, flowables, lookahead=4):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def _refill(self):
+        while self._source is not None and super().__len__() < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._refill()
+        return super().__len__()
+
+    def __getitem__(self, index):
+        self._refill()
+        return super().__getitem__(index)
+
+
+def render_report(batch, out, full=False):
+    """
+    Render the PDF report of ``batch`` into ``out`` (a path or file object).
+    The default report lists the first 100 rows; ``full`` lists every row.
+    """
+    # Create the PDF document
+    doc = SimpleDocTemplate(out, pagesize=letter,
+                            rightMargin=72, leftMargin=72,
+                            topMargin=72, bottomMargin=18)
+    
+    # Container for PDF elements
+    elements = []
+    
+    # Styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#2c3e50'),
+        spaceAfter=12,
+        alignment=TA_CENTER
+    )
+    
+    # Title
+    title = Paragraph(f"Chemical Equipment Analytics Report", title_style)
+    elements.append(title)
+    
+    subtitle = Paragraph(
+        f"<b>Batch ID:</b> {batch.id} | <b>Generated:</b> {batch.uploaded_at.strftime('%Y-%m-%d %H:%M')}",
+        styles['Normal']
+    )
+    elements.append(subtitle)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Statistics stored at ingest
+    stats = get_batch_statistics(batch)
+    total = stats["total_count"]
+    
+    # Summary Statistics Table
+    summary_data = [
+        ['Metric', 'Value'],
+        ['Total Equipment', str(total)],
+        ['Average Flowrate', f"{stats['average_flowrate']} m³/hr"],
+        ['Average Pressure', f"{stats['average_pressure']} Pa"],
+        ['Average Temperature', f"{stats['average_temperature']} °C"],
+    ]
+    
+    summary_table = Table(summary_data, colWidths=[3*inch, 3*inch])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#72e3ad')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    
+    elements.append(summary_table)
+    elements.append(Spacer(1, 0.4*inch))
+    
+    # Equipment List Section
+    equipment_header = Paragraph("<b>Equipment Details</b>", styles['Heading2'])
+    elements.append(equipment_header)
+    elements.append(Spacer(1, 0.2*inch))
+    
+    if full:
+        # Every row, as a stream of page-sized tables pulled in as the
+        # document is laid out
+        equipment_rows = batch.equipments.order_by('id').values_list(*EQUIPMENT_COLUMNS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        doc.build(_LazyFlowables(chain(elements, _equipment_tables(equipment_rows))))
+        return
+
+    # Limit to first 100 items
+    equipment_limit = 100
+    limited_equipments = batch.equipments.values_list(*EQUIPMENT_COLUMNS)[:equipment_limit]
+    
+    elements.append(_equipment_table(limited_equipments))
+    
+    # Add note if data was limited
+    if total > equipment_limit:
+        elements.append(Spacer(1, 0.2*inch))
+        note = Paragraph(
+            f"<i>Note: Showing first {equipment_limit} of {total} total equipment items. "
+            f"Use the full export for every row.</i>",
+            styles['Normal']
+        )
+        elements.append(note)
+    
+    # Build PDF
+    doc.build(elements)
+
+
+def cache_dir():
+    return Path(settings.MEDIA_ROOT) / 'report_cache'
+
+
+def _variant(full):
+    return 'full' if full else 'summary'
+
+
+def _report_path(batch_id, full=False):
+    return cache_dir() / f"batch_{batch_id}_{_variant(full)}_v{REPORT_VERSION}.pdf"
+
+
+def report_etag(batch, full=False):
+    return f'"report-{batch.id}-{int(batch.uploaded_at.timestamp())}-{_variant(full)}-v{REPORT_VERSION}"'
+
+
+def get_report(batch, full=False):
+    """
+    Return the rendered report of ``batch`` as a file opened for binary
+    reading, rendering it on a cache miss. Reports are always rendered to
+    disk, never into a response buffer, so even a full export is streamed
+    back from a file. The file is opened before anything can evict it, so
+    the caller can read it even if it has left the cache by then.
+    """
+    path = _report_path(batch.id, full)
+    try:
+        report = open(path, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        # Touch it, so eviction sees it as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted in the meantime; the open file still reads
+        return report
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Render to a private file and swap it in, so concurrent requests
+    # never see a half-written report
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        render_report(batch, str(tmp), full=full)
+        report = open(tmp, 'rb')
+        try:
+            os.replace(tmp, path)
+        except BaseException:
+            report.close()
+            raise
+    finally:
+        tmp.unlink(missing_ok=True)
+    evict()
+    return report
+
+
+def evict(max_bytes=None):
+    """Delete least recently used reports until the cache fits in ``max_bytes``."""
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'REPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+    entries = []
+    for path in cache_dir().glob('*.pdf'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            continue  # Open elsewhere, on a platform that won't delete open files
+        total -= size
+
+
+def purge_reports(batch_ids):
+    """Drop cached reports of deleted batches."""
+    for batch_id in batch_ids:
+        for path in cache_dir().glob(f"batch_{batch_id}_*.pdf"):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,270 @@
+"""
+Resumable uploads: init, PUT chunks at offsets, finalize.
+
+A session's bytes are appended to MEDIA_ROOT/upload_sessions/<id>/data.csv.
+After every chunk the complete lines received so far are parsed straight
+into a staged columnar sidecar and StatsAccumulator (staging.stage_lines),
+whose state is kept on the UploadSession row, so by the time the last chunk
+lands almost all of the file has been parsed. Finalize parses the last
+line, hashes the file for de-duplication and inserts the rows from the
+memory-mapped sidecar (ingest.ingest_staged).
+
+A chunk must start at the session's current offset. If a PUT dies half way
+the client asks for the offset again and re-sends from there; the stored
+bytes and the sidecar parts are cut back to what the session row recorded,
+so a partial write is never counted twice.
+
+Rows are split on newlines, so quoted fields must not contain line breaks.
+"""
+import hashlib
+import io
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .accumulator import StatsAccumulator
+from .columnar import SidecarWriter
+from .ingest import get_chunk_rows, get_parser_engine, ingest_staged
+from .models import UploadBatch, UploadSession
+from .parsing import REQUIRED_COLUMNS, missing_columns, read_header
+from .staging import stage_lines
+from .uploads import store_file
+
+COPY_CHUNK_BYTES = 1024 * 1024
+# Bytes of the stored file parsed at a time
+PARSE_WINDOW_BYTES = 16 * 1024 * 1024
+
+
+class SessionConflict(Exception):
+    """The chunk doesn't fit the session: wrong offset, or the session is closed."""
+
+    def __init__(self, message, offset, state=UploadSession.OPEN):
+        super().__init__(message)
+        self.offset = offset
+        self.state = state
+
+
+def get_session_ttl():
+    return getattr(settings, 'UPLOAD_SESSION_TTL_HOURS', 24)
+
+
+def session_dir(session_id):
+    return Path(settings.MEDIA_ROOT) / 'upload_sessions' / str(session_id)
+
+
+def _data_path(session):
+    return session_dir(session.id) / 'data.csv'
+
+
+def _sidecar_path(session):
+    return session_dir(session.id) / 'columnar'
+
+
+def describe(session):
+    """What the API reports about a session."""
+    return {
+        "session_id": str(session.id),
+        "filename": session.filename,
+        "state": session.state,
+        "offset": session.received,
+        "size": session.total_size,
+        "rows_parsed": session.sidecar_state["count"] if session.sidecar_state else 0,
+        "batch_id": session.batch_id,
+        "error": session.error or None,
+    }
+
+
+def create_session(filename, total_size=None, expected_hash=''):
+    session = UploadSession.objects.create(
+        filename=filename, total_size=total_size, expected_hash=expected_hash
+    )
+    directory = session_dir(session.id)
+    directory.mkdir(parents=True)
+    (directory / 'data.csv').touch()
+    return session
+
+
+def _fail(session_id, message):
+    # Called outside the session's transaction, which has been rolled back
+    UploadSession.objects.filter(id=session_id).update(
+        state=UploadSession.FAILED, error=message, updated_at=timezone.now()
+    )
+    shutil.rmtree(session_dir(session_id), ignore_errors=True)
+
+
+def _parse_available(session, final=False):
+    """
+    Parse the stored bytes from ``session.parsed`` up to the last complete
+    line (to the very end when ``final``). Updates the session's sidecar and
+    statistics state but does not save it.
+    """
+    path = _data_path(session)
+    with open(path, 'rb') as fh:
+        if not session.header:
+            line = fh.readline()
+            if not line or (not line.endswith(b"\n") and not final):
+                return
+            header = line.rstrip(b"\r\n")
+            if missing_columns(read_header(io.BytesIO(header + b"\n"))):
+                raise ValueError(f"Missing columns. Required: {REQUIRED_COLUMNS}")
+            session.header = header.decode()
+            session.parsed = len(line)
+
+        writer = SidecarWriter(_sidecar_path(session), session.sidecar_state)
+        running = StatsAccumulator.from_dict(session.stats_state) if session.stats_state else StatsAccumulator()
+        header = session.header.encode()
+        try:
+            fh.seek(session.parsed)
+            while session.parsed < session.received:
+                data = fh.read(min(PARSE_WINDOW_BYTES, session.received - session.parsed))
+                end = len(data)
+                if session.parsed + end < session.received or not final:
+                    end = data.rfind(b"\n") + 1
+                    if not end:
+                        if len(data) == PARSE_WINDOW_BYTES:
+                            raise ValueError(f"A line is longer than {PARSE_WINDOW_BYTES} bytes")
+                        break
+                    fh.seek(session.parsed + end)
+                stage_lines(writer, running, header, data[:end], get_chunk_rows(), get_parser_engine())
+                session.parsed += end
+        finally:
+            session.sidecar_state = writer.close()
+        session.stats_state = running.to_dict()
+
+
+def write_chunk(session_id, offset, stream):
+    """
+    Append the bytes of ``stream`` at ``offset`` and parse what is complete.
+    Raises UploadSession.DoesNotExist, SessionConflict, or ValueError if the
+    chunk overruns the announced size or has bad rows (the session then fails).
+    """
+    with transaction.atomic():
+        # Locked, so two PUTs to one session can't interleave
+        session = UploadSession.objects.select_for_update().get(id=session_id)
+        if session.state != UploadSession.OPEN:
+            raise SessionConflict(f"Session is {session.state}", session.received, session.state)
+        if offset != session.received:
+            raise SessionConflict(f"Expected a chunk at offset {session.received}", session.received)
+
+        written = 0
+        error = None
+        with open(_data_path(session), 'r+b') as out:
+            # Drop whatever an interrupted PUT left past the recorded offset
+            out.truncate(session.received)
+            out.seek(session.received)
+            while True:
+                data = stream.read(COPY_CHUNK_BYTES) if stream is not None else b""
+                if not data:
+                    break
+                if session.total_size is not None and session.received + written + len(data) > session.total_size:
+                    error = f"Chunk goes past the announced size of {session.total_size} bytes"
+                    break
+                out.write(data)
+                written += len(data)
+
+        if error is None:
+            session.received += written
+            try:
+                _parse_available(session)
+            except ValueError as e:
+                error = str(e)
+            else:
+                session.save()
+                return session
+    _fail(session_id, error)
+    raise ValueError(error)
+
+
+def finalize(session_id):
+    """
+    Parse the rest of the upload and turn it into a batch.
+
+    Returns (session, created): ``created`` is False if the file turned out
+    to be a duplicate of an existing batch, or the session had already been
+    finalized (finalize is safe to retry). Raises SessionConflict if bytes
+    are still missing, ValueError if the upload is invalid. Any error but
+    SessionConflict fails the session.
+    """
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(id=session_id)
+        if session.state == UploadSession.COMPLETE:
+            return session, False
+        if session.state == UploadSession.FAILED:
+            raise SessionConflict(f"Session failed: {session.error}", session.received, session.state)
+        if session.total_size is not None and session.received != session.total_size:
+            raise SessionConflict(
+                f"Received {session.received} of {session.total_size} bytes", session.received
+            )
+
+        failure = None
+        try:
+            _parse_available(session, final=True)
+            if not session.header:
+                raise ValueError("The upload is empty")
+            SidecarWriter(_sidecar_path(session), session.sidecar_state).finalize()
+            digest = _file_digest(_data_path(session))
+            if session.expected_hash and session.expected_hash != digest:
+                raise ValueError("The uploaded bytes don't match the announced SHA-256")
+            created = False
+            batch = UploadBatch.objects.filter(content_hash=digest).only('id').first()
+            if batch is None:
+                # Moves the data out of the session, so from here on a
+                # failure can't be retried: it fails the session instead
+                batch, created = _create_batch(session, digest)
+        except Exception as e:
+            failure = e
+        else:
+            session.batch = batch
+            session.state = UploadSession.COMPLETE
+            session.stats_state = None
+            session.save()
+    if failure is not None:
+        _fail(session_id, str(failure))
+        raise failure
+    shutil.rmtree(session_dir(session.id), ignore_errors=True)
+    return session, created
+
+
+def _file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for data in iter(lambda: fh.read(COPY_CHUNK_BYTES), b""):
+            sha.update(data)
+    return sha.hexdigest()
+
+
+def _create_batch(session, digest):
+    name = store_file(_data_path(session), session.filename)
+    try:
+        with transaction.atomic():
+            batch = UploadBatch.objects.create(file=name, content_hash=digest)
+            ingest_staged(batch, _sidecar_path(session), session.stats_state)
+        return batch, True
+    except IntegrityError:
+        # An identical file was uploaded while this session was open
+        default_storage.delete(name)
+        return UploadBatch.objects.only('id').get(content_hash=digest), False
+    except Exception:
+        default_storage.delete(name)
+        raise
+
+
+def abort(session_id):
+    session = UploadSession.objects.get(id=session_id)
+    session.delete()
+    shutil.rmtree(session_dir(session_id), ignore_errors=True)
+
+
+def purge_stale_sessions(now=None):
+    """Delete sessions (and their files) untouched for UPLOAD_SESSION_TTL_HOURS."""
+    cutoff = (now or timezone.now()) - timedelta(hours=get_session_ttl())
+    stale = list(UploadSession.objects.filter(updated_at__lt=cutoff).values_list('id', flat=True))
+    for session_id in stale:
+        shutil.rmtree(session_dir(session_id), ignore_errors=True)
+    UploadSession.objects.filter(id__in=stale).delete()
+    return len(stale)
@@ -0,0 +1,202 @@
+"""
+History retention: which batches are kept, and getting rid of the rest.
+
+The policy comes from settings (see get_policy); a batch is expired once
+it falls outside any of the configured limits, counting from the newest
+upload down:
+
+    RETENTION_MAX_BATCHES      keep at most this many batches
+    RETENTION_MAX_AGE_DAYS     drop batches uploaded longer ago than this
+    RETENTION_MAX_TOTAL_ROWS   keep at most this many equipment rows in total
+    RETENTION_MAX_TOTAL_BYTES  keep at most this many bytes of uploaded files
+
+Uploads never prune inline. They call request_sweep(), which wakes a
+background sweeper thread (or, with RETENTION_SWEEPER = False, sweeps
+right there, which is what the tests use). The `prune_history` management
+command runs the same sweep from cron. Expired batches are deleted a
+chunk of equipment rows at a time, each chunk in its own short
+transaction, so removing a million-row batch never holds a long lock; the
+uploaded file, columnar sidecar and cached reports go with it. Resumable
+upload sessions left untouched for UPLOAD_SESSION_TTL_HOURS are dropped by
+the same sweep.
+"""
+import logging
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .columnar import purge_sidecars
+from .models import ChemicalEquipment, IngestJob, UploadBatch
+from .reports import purge_reports
+from .resumable import purge_stale_sessions
+
+logger = logging.getLogger(__name__)
+
+HISTORY_LIMIT = 5
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+_sweep_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def get_policy(**overrides):
+    """The retention limits from settings; None means that rule is off."""
+    policy = {
+        'max_batches': getattr(settings, 'RETENTION_MAX_BATCHES', HISTORY_LIMIT),
+        'max_age_days': getattr(settings, 'RETENTION_MAX_AGE_DAYS', None),
+        'max_total_rows': getattr(settings, 'RETENTION_MAX_TOTAL_ROWS', None),
+        'max_total_bytes': getattr(settings, 'RETENTION_MAX_TOTAL_BYTES', None),
+    }
+    policy.update({key: value for key, value in overrides.items() if value is not None})
+    return policy
+
+
+def get_delete_chunk_rows():
+    return getattr(settings, 'RETENTION_DELETE_CHUNK_ROWS', 10000)
+
+
+def expired_batches(policy=None, now=None):
+    """
+    IDs of the batches the policy no longer keeps, newest first.
+
+    Only batch metadata is read (one query, served by the uploaded_at
+    index); no equipment rows are touched.
+    """
+    policy = policy or get_policy()
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=policy['max_age_days']) if policy['max_age_days'] is not None else None
+
+    expired = []
+    kept = rows = size = 0
+    batches = (
+        UploadBatch.objects.order_by('-uploaded_at', '-id')
+        .values_list('id', 'uploaded_at', 'row_count', 'file_size')
+    )
+    for batch_id, uploaded_at, row_count, file_size in batches.iterator():
+        if expired:
+            # Everything older than an expired batch is expired too
+            expired.append(batch_id)
+            continue
+        rows += row_count
+        size += file_size
+        if (
+            (policy['max_batches'] is not None and kept + 1 > policy['max_batches'])
+            or (cutoff is not None and uploaded_at < cutoff)
+            or (policy['max_total_rows'] is not None and rows > policy['max_total_rows'])
+            or (policy['max_total_bytes'] is not None and size > policy['max_total_bytes'])
+        ):
+            expired.append(batch_id)
+            continue
+        kept += 1
+    return expired
+
+
+def delete_batch(batch_id, chunk_rows=None):
+    """
+    Delete one batch, its equipment rows and every file that belongs to it.
+
+    Rows go first, ``chunk_rows`` at a time by primary key range, each
+    chunk committed on its own. Returns the number of rows deleted.
+    """
+    chunk_rows = chunk_rows or get_delete_chunk_rows()
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            rows = ChemicalEquipment.objects.filter(batch_id=batch_id)
+            # Id of the last row in this chunk; a range delete rides the (batch, id) index
+            boundary = list(rows.order_by('id').values_list('id', flat=True)[chunk_rows - 1:chunk_rows])
+            if boundary:
+                rows = rows.filter(id__lte=boundary[0])
+            count, _ = rows.delete()
+        deleted += count
+        if not boundary:
+            break
+
+    batch = UploadBatch.objects.only('id', 'file').filter(id=batch_id).first()
+    if batch is not None:
+        name = batch.file.name
+        batch.delete()
+        # The queued job of an upload points at the same file; only remove it once unused
+        if name and not IngestJob.objects.filter(file=name, state__in=[IngestJob.QUEUED, IngestJob.RUNNING]).exists():
+            batch.file.storage.delete(name)
+    purge_sidecars([batch_id])
+    purge_reports([batch_id])
+    return deleted
+
+
+def sweep(policy=None, dry_run=False):
+    """Delete every expired batch. Returns {"batches": [ids], "rows": n}."""
+    with _sweep_lock:
+        expired = expired_batches(policy)
+        rows = 0
+        if not dry_run:
+            for batch_id in expired:
+                rows += delete_batch(batch_id)
+            purge_stale_sessions()
+        return {"batches": expired, "rows": rows}
+
+
+def orphan_files():
+    """
+    Files under MEDIA_ROOT/uploads/ that no batch or pending job refers to,
+    e.g. left behind by uploads from before retention removed files.
+    """
+    upload_dir = Path(settings.MEDIA_ROOT) / 'uploads'
+    if not upload_dir.is_dir():
+        return []
+    referenced = set(UploadBatch.objects.values_list('file', flat=True))
+    referenced.update(
+        IngestJob.objects.filter(state__in=[IngestJob.QUEUED, IngestJob.RUNNING]).values_list('file', flat=True)
+    )
+    media_root = Path(settings.MEDIA_ROOT)
+    return [
+        path for path in sorted(upload_dir.rglob('*'))
+        if path.is_file() and path.relative_to(media_root).as_posix() not in referenced
+    ]
+
+
+def prune_history(keep=None):
+    """Apply the retention policy now, in this thread (``keep`` overrides max_batches)."""
+    return sweep(get_policy(max_batches=keep))
+
+
+def _sweeper_loop():
+    interval = getattr(settings, 'RETENTION_SWEEP_INTERVAL', 300)
+    while True:
+        _wake.wait(timeout=interval)
+        _wake.clear()
+        try:
+            result = sweep()
+            if result["batches"]:
+                logger.info("Retention removed %d batches (%d rows)", len(result["batches"]), result["rows"])
+        except Exception:
+            logger.exception("Retention sweep failed")
+        finally:
+            connection.close()
+
+
+def _ensure_sweeper():
+    global _sweeper
+    with _sweeper_lock:
+        if _sweeper is None or not _sweeper.is_alive():
+            _sweeper = threading.Thread(target=_sweeper_loop, name='retention-sweeper', daemon=True)
+            _sweeper.start()
+
+
+def request_sweep():
+    """
+    Ask for the retention policy to be applied after an upload.
+
+    Wakes the background sweeper once the current transaction commits.
+    With RETENTION_SWEEPER = False the sweep runs inline instead.
+    """
+    if not getattr(settings, 'RETENTION_SWEEPER', True):
+        prune_history()
+        return
+    _ensure_sweeper()
+    transaction.on_commit(_wake.set)
@@ -0,0 +1,61 @@
+"""
+Parse a CSV into a staged columnar sidecar plus its statistics.
+
+This is the CPU-heavy half of an ingest (CSV parsing, coercion, the
+statistics accumulator) with none of the database work, so it can run in
+a worker process: nothing here, or in the modules it imports, needs
+Django to be set up. The main process then inserts the rows straight from
+the staged sidecar's memory-mapped arrays (see ingest.ingest_staged).
+"""
+import io
+import time
+
+from .accumulator import StatsAccumulator
+from .columnar import SidecarWriter
+from .parsing import REQUIRED_COLUMNS, missing_columns, read_chunks, read_header, to_columns
+
+
+def stage_file(path, directory, chunk_rows=None, engine=None):
+    """
+    Parse the CSV at ``path`` into a sidecar written to ``directory``.
+
+    Returns a plain dict (safe to send back from a worker process) with
+    "rows", "state" (StatsAccumulator.to_dict()), "seconds" and "error".
+    On error the partial sidecar is removed and "error" says why.
+    """
+    started = time.perf_counter()
+    result = {"rows": 0, "state": None, "seconds": None, "error": None}
+    writer = None
+    try:
+        if missing_columns(read_header(path)):
+            raise ValueError(f"Missing columns. Required: {REQUIRED_COLUMNS}")
+        writer = SidecarWriter(directory)
+        running = StatsAccumulator()
+        for chunk in read_chunks(path, chunk_rows, engine):
+            columns = to_columns(chunk)
+            writer.append(columns)
+            running.update(columns)
+        writer.finalize()
+        result["rows"] = running.count
+        result["state"] = running.to_dict()
+    except Exception as e:
+        if writer is not None:
+            writer.abort()
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def stage_lines(writer, running, header, data, chunk_rows=None, engine=None):
+    """
+    Parse ``data`` -- complete CSV lines without the header row -- into an
+    open SidecarWriter and StatsAccumulator. ``header`` is the file's header
+    line. Used to parse an upload piece by piece while it is still arriving.
+    Raises ValueError on bad rows.
+    """
+    if not data.strip():
+        return
+    for chunk in read_chunks(io.BytesIO(header + b"\n" + data), chunk_rows, engine):
+        columns = to_columns(chunk)
+        writer.append(columns)
+        running.update(columns)
@@ -1,3 +1,781 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import importlib.util
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import bulk, columnar, distributions, export, parsing, reports, resumable, retention
+from .accumulator import StatsAccumulator
+from .analytics import compute_statistics, get_batch_accumulator
+from .models import ChemicalEquipment, UploadBatch
+
+SAMPLE_CSV = (
+    b"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+    b"Pump-1,Pump,120,5.2,110\n"
+    b"Pump-2,Pump,100,4.8,100\n"
+    b"Valve-1,Valve,60,4.1,105\n"
+)
+
+
+class APITestCase(TestCase):
+    """Authenticated client, with uploads written to a throwaway MEDIA_ROOT."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        # Retention sweeps inline, so pruning is visible as soon as an upload returns
+        media = override_settings(MEDIA_ROOT=self.media_root, RETENTION_SWEEPER=False)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('tester', password='secret123'))
+
+    def upload(self, content=SAMPLE_CSV, name='equipment.csv'):
+        return self.client.post(
+            '/api/upload/', {'file': SimpleUploadedFile(name, content)}, format='multipart'
+        )
+
+
+class UploadHistoryTests(APITestCase):
+    def test_upload_stores_row_count(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 201)
+        batch = UploadBatch.objects.get(id=response.data['batch_id'])
+        self.assertEqual(batch.row_count, 3)
+        self.assertEqual(batch.statistics['type_distribution'], {'Pump': 2, 'Valve': 1})
+
+    def test_rows_are_written_with_executemany(self):
+        # SQLite has no COPY, so rows go through cursor.executemany
+        response = self.upload()
+        self.assertEqual(response.data['ingest']['method'], 'executemany')
+        self.assertEqual(response.data['ingest']['rows'], 3)
+        rows = ChemicalEquipment.objects.filter(batch_id=response.data['batch_id']).order_by('equipment_name')
+        self.assertEqual(
+            list(rows.values_list('equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature')),
+            [('Pump-1', 'Pump', 120.0, 5.2, 110.0), ('Pump-2', 'Pump', 100.0, 4.8, 100.0),
+             ('Valve-1', 'Valve', 60.0, 4.1, 105.0)]
+        )
+
+    @override_settings(INGEST_BATCH_SIZE=2)
+    def test_executemany_in_several_batches(self):
+        response = self.upload()
+        self.assertEqual(ChemicalEquipment.objects.filter(batch_id=response.data['batch_id']).count(), 3)
+
+    def test_non_numeric_value_is_a_bad_request(self):
+        for engine in ('auto', 'c'):
+            with self.subTest(engine=engine), override_settings(CSV_PARSER_ENGINE=engine):
+                response = self.upload(SAMPLE_CSV + b"Pump-3,Pump,fast,5,100\n")
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(UploadBatch.objects.exists())
+        self.assertFalse(ChemicalEquipment.objects.exists())
+
+    def test_chunked_ingest_matches_a_single_pass(self):
+        content = b"Equipment Name,Type,Flowrate,Pressure,Temperature\n" + b"".join(
+            f"E-{i},{('Pump', 'Valve', 'Reactor')[i % 3]},{100 + i % 7},{i % 5},{90 + i}\n".encode()
+            for i in range(25)
+        )
+        with override_settings(INGEST_CHUNK_ROWS=4):
+            chunked = self.upload(content).data
+        UploadBatch.objects.all().delete()
+        single = self.upload(content).data
+
+        self.assertEqual(chunked['ingest']['rows'], 25)
+        self.assertEqual(chunked['statistics'], single['statistics'])
+        batch = UploadBatch.objects.get(id=single['batch_id'])
+        self.assertEqual(ChemicalEquipment.objects.filter(batch=batch).count(), 25)
+
+    def test_history_is_a_single_query(self):
+        self.upload()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/upload/')
+        self.assertEqual(response.data[0]['equipment_count'], 3)
+
+    def test_history_query_count_does_not_grow_with_batches(self):
+        for i in range(4):
+            # Distinct contents, otherwise de-duplication hands back the first batch
+            self.upload(SAMPLE_CSV + f"Extra-{i},Valve,1,1,1\n".encode())
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/upload/')
+        self.assertEqual(len(response.data), 4)
+        self.assertTrue(all(item['equipment_count'] == 4 for item in response.data))
+
+
+class ConditionalRequestTests(APITestCase):
+    def test_batch_stats_revalidate_with_etag(self):
+        batch_id = self.upload().data['batch_id']
+        response = self.client.get(f'/api/batch/{batch_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(f'/api/batch/{batch_id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+        cached = self.client.get(f'/api/batch/{batch_id}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_history_etag_changes_with_uploads(self):
+        self.upload()
+        first = self.client.get('/api/upload/')
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+        with self.assertNumQueries(1):
+            cached = self.client.get('/api/upload/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        self.upload(SAMPLE_CSV + b"Extra,Valve,1,1,1\n")
+        response = self.client.get('/api/upload/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_history_changes_when_a_batch_is_deleted(self):
+        self.upload()
+        self.upload(SAMPLE_CSV + b"Extra,Valve,1,1,1\n")
+        first = self.client.get('/api/upload/')
+        # Deletion leaves the newest upload time as it was, so no date validator
+        self.assertNotIn('Last-Modified', first)
+
+        UploadBatch.objects.order_by('uploaded_at').first().delete()
+        response = self.client.get('/api/upload/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+
+class DeduplicationTests(APITestCase):
+    def test_reupload_returns_existing_batch(self):
+        first = self.upload()
+        self.assertEqual(first.status_code, 201)
+        self.assertFalse(first.data['dedup']['hit'])
+
+        second = self.upload(name='renamed.csv')
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(second.data['dedup']['hit'])
+        self.assertEqual(second.data['batch_id'], first.data['batch_id'])
+        self.assertEqual(second.data['statistics'], first.data['statistics'])
+        self.assertEqual(UploadBatch.objects.count(), 1)
+
+    def test_hash_matches_file_contents(self):
+        response = self.upload()
+        self.assertEqual(response.data['dedup']['sha256'], hashlib.sha256(SAMPLE_CSV).hexdigest())
+
+
+@override_settings(INGEST_JOB_WORKERS=0)
+class IngestJobTests(APITestCase):
+    def test_async_upload_returns_job_and_reports_result(self):
+        response = self.client.post(
+            '/api/upload/?mode=async',
+            {'file': SimpleUploadedFile('equipment.csv', SAMPLE_CSV)},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 202)
+
+        status = self.client.get(f"/api/jobs/{response.data['job_id']}/").data
+        self.assertEqual(status['state'], 'succeeded')
+        self.assertEqual(status['rows_processed'], 3)
+        self.assertEqual(status['statistics']['total_count'], 3)
+        self.assertTrue(UploadBatch.objects.filter(id=status['batch_id']).exists())
+
+    def test_failed_job_deletes_its_file(self):
+        response = self.client.post(
+            '/api/upload/?mode=async',
+            {'file': SimpleUploadedFile('bad.csv', SAMPLE_CSV + b"Pump-3,Pump,fast,5,100\n")},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 202)
+
+        status = self.client.get(f"/api/jobs/{response.data['job_id']}/").data
+        self.assertEqual(status['state'], 'failed')
+        self.assertEqual(list(Path(self.media_root, 'uploads').glob('*')), [])
+
+    def test_async_upload_rejects_bad_header(self):
+        response = self.client.post(
+            '/api/upload/?mode=async',
+            {'file': SimpleUploadedFile('bad.csv', b"Name,Type\nPump-1,Pump\n")},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ReportCacheTests(APITestCase):
+    def test_report_is_cached_and_revalidated(self):
+        batch_id = self.upload().data['batch_id']
+
+        response = self.client.get(f'/api/export-pdf/{batch_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(len(list(reports.cache_dir().glob(f'batch_{batch_id}_*.pdf'))), 1)
+
+        response = self.client.get(f'/api/export-pdf/{batch_id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_full_export_is_a_separate_report(self):
+        rows = b"".join(f"Pump-{i},Pump,{i},1,1\n".encode() for i in range(150))
+        batch_id = self.upload(SAMPLE_CSV + rows).data['batch_id']
+
+        summary = self.client.get(f'/api/export-pdf/{batch_id}/')
+        full = self.client.get(f'/api/export-pdf/{batch_id}/?full=1')
+        self.assertEqual(full.status_code, 200)
+        self.assertNotEqual(summary['ETag'], full['ETag'])
+        self.assertIn('full_report.pdf', full['Content-Disposition'])
+        self.assertEqual(len(list(reports.cache_dir().glob(f'batch_{batch_id}_*.pdf'))), 2)
+
+    @override_settings(REPORT_CACHE_MAX_BYTES=1)
+    def test_report_larger_than_the_cache_is_still_served(self):
+        batch_id = self.upload().data['batch_id']
+        for _ in range(2):
+            response = self.client.get(f'/api/export-pdf/{batch_id}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        # Evicted straight after rendering
+        self.assertEqual(list(reports.cache_dir().glob('*.pdf')), [])
+
+    def test_pruned_batches_lose_their_reports(self):
+        first_id = self.upload().data['batch_id']
+        self.client.get(f'/api/export-pdf/{first_id}/')
+
+        for i in range(retention.HISTORY_LIMIT):
+            self.upload(SAMPLE_CSV + f"Extra-{i},Valve,1,1,1\n".encode())
+
+        self.assertFalse(UploadBatch.objects.filter(id=first_id).exists())
+        self.assertEqual(list(reports.cache_dir().glob(f'batch_{first_id}_*.pdf')), [])
+
+
+class EquipmentRowsTests(APITestCase):
+    def test_pages_follow_the_cursor(self):
+        batch_id = self.upload().data['batch_id']
+
+        first = self.client.get(f'/api/batch/{batch_id}/equipment/?limit=2&fields=equipment_name').data
+        self.assertEqual(first['columns'], ['id', 'equipment_name'])
+        self.assertEqual([row[1] for row in first['rows']], ['Pump-1', 'Pump-2'])
+
+        second = self.client.get(
+            f"/api/batch/{batch_id}/equipment/?limit=2&fields=equipment_name&cursor={first['next_cursor']}"
+        ).data
+        self.assertEqual([row[1] for row in second['rows']], ['Valve-1'])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_filters_by_type_and_range(self):
+        batch_id = self.upload().data['batch_id']
+        data = self.client.get(f'/api/batch/{batch_id}/equipment/?type=Pump&flowrate_min=110').data
+        self.assertEqual(len(data['rows']), 1)
+        self.assertEqual(data['rows'][0][1], 'Pump-1')
+
+    def test_rejects_unknown_fields(self):
+        batch_id = self.upload().data['batch_id']
+        response = self.client.get(f'/api/batch/{batch_id}/equipment/?fields=secret')
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchExportTests(APITestCase):
+    def test_csv_export_round_trips(self):
+        batch_id = self.upload().data['batch_id']
+        response = self.client.get(f'/api/batch/{batch_id}/export/?format=csv')
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature'])
+        self.assertEqual(rows[1], ['Pump-1', 'Pump', '120.0', '5.2', '110.0'])
+        self.assertEqual(len(rows), 4)
+
+    def test_unknown_format_is_rejected(self):
+        batch_id = self.upload().data['batch_id']
+        response = self.client.get(f'/api/batch/{batch_id}/export/?format=xlsx')
+        self.assertEqual(response.status_code, 400)
+
+    @skipUnless(export.pa is not None, "pyarrow is not installed")
+    def test_arrow_and_parquet_exports(self):
+        batch_id = self.upload().data['batch_id']
+
+        body = b''.join(self.client.get(f'/api/batch/{batch_id}/export/?format=arrow').streaming_content)
+        table = export.pa.ipc.open_stream(body).read_all()
+        self.assertEqual(table.column('flowrate').to_pylist(), [120.0, 100.0, 60.0])
+
+        body = b''.join(self.client.get(f'/api/batch/{batch_id}/export/?format=parquet').streaming_content)
+        table = export.pq.read_table(export.pa.BufferReader(body))
+        self.assertEqual(table.column('equipment_name').to_pylist(), ['Pump-1', 'Pump-2', 'Valve-1'])
+
+
+class ColumnarSidecarTests(APITestCase):
+    @override_settings(INGEST_CHUNK_ROWS=2)
+    def test_ingest_writes_sidecar(self):
+        batch_id = self.upload().data['batch_id']
+        sidecar = columnar.open_sidecar(batch_id)
+        self.assertEqual(len(sidecar), 3)
+        self.assertEqual(sidecar['flowrate'].tolist(), [120.0, 100.0, 60.0])
+        self.assertEqual(sidecar.equipment_types().tolist(), ['Pump', 'Pump', 'Valve'])
+        self.assertEqual(sidecar.equipment_names(1).tolist(), ['Pump-2', 'Valve-1'])
+
+    def test_statistics_from_sidecar_match_ingest(self):
+        batch = UploadBatch.objects.get(id=self.upload().data['batch_id'])
+        self.assertEqual(compute_statistics(batch), batch.statistics)
+
+    def test_pruned_batches_lose_their_sidecar(self):
+        first_id = self.upload().data['batch_id']
+        for i in range(retention.HISTORY_LIMIT):
+            self.upload(SAMPLE_CSV + f"Extra-{i},Valve,1,1,1\n".encode())
+        self.assertIsNone(columnar.open_sidecar(first_id))
+        self.assertFalse(columnar.sidecar_dir(first_id).exists())
+
+
+class DistributionTests(APITestCase):
+    def test_upload_reports_percentiles_and_histograms(self):
+        distributions = self.upload().data['statistics']['distributions']
+        flowrate = distributions['overall']['flowrate']
+        self.assertEqual((flowrate['min'], flowrate['p50'], flowrate['max']), (60.0, 100.0, 120.0))
+        self.assertEqual(flowrate['p95'], 118.0)
+        self.assertEqual(sum(flowrate['histogram']), 3)
+        self.assertEqual(len(flowrate['edges']), distributions['bins'] + 1)
+
+        pumps = distributions['by_type']['Pump']['flowrate']
+        self.assertEqual((pumps['count'], pumps['mean'], pumps['std']), (2, 110.0, 10.0))
+        # Per-type histograms share the overall edges
+        self.assertEqual(pumps['histogram'][-1], 1)
+
+    def test_histogram_bins_match_numpy(self):
+        # Integer values fall exactly on bin edges
+        values = np.arange(100, 121)
+        content = b"Equipment Name,Type,Flowrate,Pressure,Temperature\n" + b"".join(
+            f"P-{v},Pump,{v},5,100\n".encode() for v in values
+        )
+        flowrate = self.upload(content).data['statistics']['distributions']['overall']['flowrate']
+        expected, _ = np.histogram(values, bins=distributions.histogram_edges(100, 120))
+        self.assertEqual(flowrate['histogram'], expected.tolist())
+
+    def test_compressed_digest_histogram_keeps_every_value(self):
+        values = np.random.default_rng(0).normal(100, 15, 5000)
+        digest = distributions.TDigest().update(values)
+        edges = distributions.histogram_edges(values.min(), values.max())
+        counts = digest.histogram(edges)
+        self.assertEqual(counts.sum(), 5000)
+        expected, _ = np.histogram(values, bins=edges)
+        # Centroids near the median span several bins, so only roughly equal
+        self.assertLess(np.abs(counts - expected).sum(), 0.1 * 5000)
+
+    def test_database_fallback_matches_sidecar(self):
+        batch = UploadBatch.objects.get(id=self.upload().data['batch_id'])
+        columnar.purge_sidecars([batch.id])
+        self.assertEqual(compute_statistics(batch), batch.statistics)
+
+
+class StatsAccumulatorTests(APITestCase):
+    def columns(self, types, values):
+        values = np.array(values, dtype=float)
+        return {
+            'equipment_type': np.array(types, dtype=object),
+            'flowrate': values, 'pressure': values * 2, 'temperature': values + 1,
+        }
+
+    def test_chunks_and_merges_match_one_pass(self):
+        rng = np.random.default_rng(0)
+        types = rng.choice(['Pump', 'Valve', 'Reactor'], 20000)
+        values = rng.lognormal(3, 1, 20000)
+
+        one_pass = StatsAccumulator().update(self.columns(types, values))
+        left = StatsAccumulator().update(self.columns(types[:7000], values[:7000]))
+        right = StatsAccumulator().update(self.columns(types[7000:], values[7000:]))
+        merged = StatsAccumulator.from_dict(left.to_dict()).merge(right)
+
+        self.assertEqual(merged.type_counts(), one_pass.type_counts())
+        self.assertAlmostEqual(merged.overall['flowrate'].mean, values.mean())
+        self.assertAlmostEqual(merged.overall['flowrate'].std, values.std())
+        pumps = values[types == 'Pump']
+        self.assertAlmostEqual(merged.per_type['Pump']['pressure'].std, (pumps * 2).std())
+
+        # Quantile sketch stays within a small rank error
+        ordered = np.sort(values)
+        for q in (0.5, 0.95, 0.99):
+            estimate = merged.overall['flowrate'].digest.quantile(q)
+            self.assertLess(abs(np.searchsorted(ordered, estimate) / len(values) - q), 0.005)
+
+    def test_batch_state_is_stored_and_mergeable(self):
+        first = self.upload().data['batch_id']
+        second = self.upload(SAMPLE_CSV + b"Reactor-1,Reactor,80,6,150\n").data['batch_id']
+        combined = get_batch_accumulator(UploadBatch.objects.get(id=first))
+        combined.merge(get_batch_accumulator(UploadBatch.objects.get(id=second)))
+        self.assertEqual(combined.type_counts(), {'Pump': 4, 'Valve': 2, 'Reactor': 1})
+        self.assertEqual(combined.as_dict()['distributions']['overall']['temperature']['max'], 150.0)
+
+
+class CompareAndTrendsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = self.upload().data['batch_id']
+        self.second = self.upload(SAMPLE_CSV + b"Pump-3,Pump,90,9.0,120\n").data['batch_id']
+
+    def test_compare_is_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.client.get(f'/api/compare/?batches={self.first},{self.second},999').data
+        self.assertEqual([b['batch_id'] for b in data['batches']], [self.first, self.second])
+        self.assertEqual(data['batches'][1]['statistics']['type_distribution'], {'Pump': 3, 'Valve': 1})
+        self.assertEqual(data['missing'], [999])
+
+    def test_compare_falls_back_to_one_grouped_query(self):
+        UploadBatch.objects.update(statistics=None)
+        with self.assertNumQueries(2):
+            data = self.client.get(f'/api/compare/?batches={self.first},{self.second}').data
+        self.assertEqual(data['batches'][0]['statistics']['average_flowrate'], 93.33)
+
+    def test_compare_combined(self):
+        data = self.client.get(f'/api/compare/?batches={self.first},{self.second}&combined=1').data
+        self.assertEqual(data['combined']['total_count'], 7)
+        self.assertEqual(data['combined']['distributions']['overall']['pressure']['max'], 9.0)
+
+    def test_trends(self):
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/trends/?param=pressure&type=Pump').data
+        self.assertEqual([p['batch_id'] for p in data['points']], [self.first, self.second])
+        self.assertEqual([p['max'] for p in data['points']], [5.2, 9.0])
+        self.assertEqual(data['points'][1]['count'], 3)
+
+    def test_trends_rejects_unknown_param(self):
+        self.assertEqual(self.client.get('/api/trends/?param=viscosity').status_code, 400)
+
+
+class RetentionTests(APITestCase):
+    def upload_many(self, n):
+        return [self.upload(SAMPLE_CSV + f"Extra-{i},Valve,1,1,1\n".encode()).data['batch_id'] for i in range(n)]
+
+    def test_count_rule_deletes_rows_and_files(self):
+        ids = self.upload_many(retention.HISTORY_LIMIT + 1)
+        oldest = ids[0]
+        self.assertFalse(UploadBatch.objects.filter(id=oldest).exists())
+        self.assertFalse(ChemicalEquipment.objects.filter(batch_id=oldest).exists())
+        self.assertEqual(UploadBatch.objects.count(), retention.HISTORY_LIMIT)
+        self.assertEqual(len(list((Path(self.media_root) / 'uploads').iterdir())), retention.HISTORY_LIMIT)
+
+    @override_settings(RETENTION_MAX_BATCHES=None, RETENTION_MAX_TOTAL_ROWS=10)
+    def test_row_rule(self):
+        ids = self.upload_many(3)
+        # 4 rows each: the newest two fit in 10 rows
+        self.assertEqual(sorted(UploadBatch.objects.values_list('id', flat=True)), ids[1:])
+
+    @override_settings(RETENTION_MAX_BATCHES=None)
+    def test_age_rule(self):
+        ids = self.upload_many(2)
+        UploadBatch.objects.filter(id=ids[0]).update(uploaded_at=timezone.now() - timedelta(days=40))
+        self.assertEqual(retention.expired_batches(retention.get_policy(max_age_days=30)), [ids[0]])
+
+        result = retention.sweep(retention.get_policy(max_age_days=30))
+        self.assertEqual(result, {"batches": [ids[0]], "rows": 4})
+
+    def test_delete_batch_in_small_chunks(self):
+        batch_id = self.upload().data['batch_id']
+        self.assertEqual(retention.delete_batch(batch_id, chunk_rows=2), 3)
+        self.assertFalse(UploadBatch.objects.filter(id=batch_id).exists())
+
+    def test_upload_records_file_size(self):
+        batch = UploadBatch.objects.get(id=self.upload().data['batch_id'])
+        self.assertEqual(batch.file_size, len(SAMPLE_CSV))
+
+
+@override_settings(BULK_UPLOAD_WORKERS=0)
+class BulkUploadTests(APITestCase):
+    def bulk(self, *files):
+        return self.client.post('/api/upload/bulk/', {'files': list(files)}, format='multipart')
+
+    def test_each_file_becomes_a_batch(self):
+        other = SAMPLE_CSV + b"Valve-2,Valve,70,4.0,95\n"
+        response = self.bulk(SimpleUploadedFile('a.csv', SAMPLE_CSV), SimpleUploadedFile('b.csv', other))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([f['status'] for f in response.data['files']], ['created', 'created'])
+        self.assertEqual(response.data['totals']['rows'], 7)
+
+        batch = UploadBatch.objects.get(id=response.data['files'][1]['batch_id'])
+        self.assertEqual(batch.row_count, 4)
+        self.assertEqual(batch.file_size, len(other))
+        self.assertEqual(batch.statistics['type_distribution'], {'Valve': 2, 'Pump': 2})
+        self.assertEqual(ChemicalEquipment.objects.filter(batch=batch).count(), 4)
+        # The staged sidecar became the batch's sidecar
+        self.assertEqual(len(columnar.open_sidecar(batch.id)), 4)
+        self.assertFalse(any((Path(self.media_root) / 'staging').iterdir()))
+
+    def test_zip_archive(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('data/one.csv', SAMPLE_CSV)
+            zf.writestr('readme.txt', b'not a csv')
+        response = self.bulk(SimpleUploadedFile('upload.zip', archive.getvalue()))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['files']), 1)
+        self.assertEqual(response.data['files'][0]['filename'], 'one.csv')
+        self.assertEqual(response.data['files'][0]['rows'], 3)
+
+    def test_duplicates_and_errors_are_reported_per_file(self):
+        earlier = self.upload().data['batch_id']
+        response = self.bulk(
+            SimpleUploadedFile('same.csv', SAMPLE_CSV),
+            SimpleUploadedFile('bad.csv', b"Name,Kind\nx,y\n"),
+            SimpleUploadedFile('new.csv', SAMPLE_CSV + b"X,Valve,1,1,1\n"),
+            SimpleUploadedFile('new-again.csv', SAMPLE_CSV + b"X,Valve,1,1,1\n"),
+        )
+        files = response.data['files']
+        self.assertEqual([f['status'] for f in files], ['duplicate', 'error', 'created', 'duplicate'])
+        self.assertEqual(files[0]['batch_id'], earlier)
+        self.assertIn('Missing columns', files[1]['error'])
+        self.assertEqual(files[3]['duplicate_of'], 'new.csv')
+        self.assertEqual(UploadBatch.objects.count(), 2)
+
+    @override_settings(BULK_UPLOAD_MAX_MEMBER_BYTES=1000)
+    def test_zip_member_over_the_size_limit_is_refused(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('small.csv', SAMPLE_CSV)
+            # Compresses to almost nothing
+            zf.writestr('bomb.csv', SAMPLE_CSV + b"0" * 100000)
+        response = self.bulk(SimpleUploadedFile('upload.zip', archive.getvalue()))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bomb.csv', response.data['error'])
+        self.assertFalse(UploadBatch.objects.exists())
+
+    def test_duplicate_race_leaves_no_stored_file(self):
+        earlier = UploadBatch.objects.get(id=self.upload().data['batch_id'])
+        path = Path(self.media_root) / 'raced.csv'
+        path.write_bytes(SAMPLE_CSV)
+        source = {"filename": 'raced.csv', "path": path, "sha256": earlier.content_hash}
+        result = bulk._ingest(source, {"rows": 3, "state": None, "seconds": 0.0, "error": None})
+
+        self.assertEqual(result['status'], 'duplicate')
+        self.assertEqual(result['batch_id'], earlier.id)
+        self.assertEqual(
+            [p.name for p in (Path(self.media_root) / 'uploads').iterdir()], [Path(earlier.file.name).name]
+        )
+
+    @override_settings(BULK_UPLOAD_WORKERS=1)
+    def test_broken_worker_pool_is_replaced(self):
+        # A pool whose worker was killed, as by the OOM killer
+        broken = bulk.ProcessPoolExecutor(1, mp_context=bulk.multiprocessing.get_context('spawn'))
+        broken.submit(os._exit, 1).exception()
+        bulk._pool = broken
+        self.addCleanup(setattr, bulk, '_pool', None)
+
+        response = self.bulk(SimpleUploadedFile('a.csv', SAMPLE_CSV))
+        self.addCleanup(bulk._pool.shutdown)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['files'][0]['status'], 'created')
+        self.assertIsNot(bulk._pool, broken)
+
+    @override_settings(BULK_UPLOAD_MAX_FILES=1)
+    def test_too_many_files(self):
+        response = self.bulk(SimpleUploadedFile('a.csv', SAMPLE_CSV), SimpleUploadedFile('b.csv', SAMPLE_CSV))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UploadBatch.objects.exists())
+
+
+class ResumableUploadTests(APITestCase):
+    def start(self, content=SAMPLE_CSV, **extra):
+        response = self.client.post('/api/upload/sessions/', {'filename': 'big.csv', 'size': len(content), **extra})
+        self.assertEqual(response.status_code, 201)
+        return response.data['session_id']
+
+    def put(self, session_id, offset, data):
+        return self.client.put(
+            f'/api/upload/sessions/{session_id}/?offset={offset}', data, content_type='application/octet-stream'
+        )
+
+    def finalize(self, session_id):
+        return self.client.post(f'/api/upload/sessions/{session_id}/finalize/')
+
+    def test_chunks_are_parsed_as_they_arrive(self):
+        session_id = self.start()
+        cut = [0, 30, 70, len(SAMPLE_CSV)]  # the cuts fall mid-line
+        for start, stop in zip(cut, cut[1:]):
+            response = self.put(session_id, start, SAMPLE_CSV[start:stop])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['offset'], stop)
+        # Every complete line was parsed before finalize
+        self.assertEqual(response.data['rows_parsed'], 3)
+
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, 201)
+        batch = UploadBatch.objects.get(id=response.data['batch_id'])
+        self.assertEqual(batch.row_count, 3)
+        self.assertEqual(batch.content_hash, hashlib.sha256(SAMPLE_CSV).hexdigest())
+        self.assertEqual(batch.statistics, compute_statistics(batch))
+        self.assertEqual(len(columnar.open_sidecar(batch.id)), 3)
+        self.assertFalse(any((Path(self.media_root) / 'upload_sessions').iterdir()))
+        # Finalize is safe to retry
+        self.assertEqual(self.finalize(session_id).data['batch_id'], batch.id)
+
+    def test_resume_after_an_interrupted_chunk(self):
+        session_id = self.start()
+        self.put(session_id, 0, SAMPLE_CSV[:40])
+        response = self.put(session_id, 60, SAMPLE_CSV[60:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 40)
+        self.assertEqual(response.data['state'], 'open')
+
+        # Bytes a dropped PUT left on disk past the offset are discarded
+        with open(Path(self.media_root) / 'upload_sessions' / session_id / 'data.csv', 'ab') as fh:
+            fh.write(b'garbage')
+        self.assertEqual(self.client.get(f'/api/upload/sessions/{session_id}/').data['offset'], 40)
+        self.assertEqual(self.put(session_id, 40, SAMPLE_CSV[40:]).status_code, 200)
+        response = self.finalize(session_id)
+        self.assertEqual(response.data['statistics']['total_count'], 3)
+
+    def test_finalize_needs_every_byte(self):
+        session_id = self.start()
+        self.put(session_id, 0, SAMPLE_CSV[:40])
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 40)
+
+    def test_bad_header_fails_the_session(self):
+        content = b"Name,Kind\nx,y\n"
+        session_id = self.start(content)
+        response = self.put(session_id, 0, content)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(f'/api/upload/sessions/{session_id}/').data['state'], 'failed')
+        response = self.put(session_id, len(content), b'')
+        self.assertEqual(response.status_code, 409)
+        # Tells the client not to bother retrying
+        self.assertEqual(response.data['state'], 'failed')
+
+    def test_chunk_past_the_announced_size_fails_the_session(self):
+        session_id = self.start()
+        response = self.put(session_id, 0, SAMPLE_CSV + b"Pump-3,Pump,5,5,5\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('announced size', response.data['error'])
+        self.assertEqual(self.client.get(f'/api/upload/sessions/{session_id}/').data['state'], 'failed')
+        self.assertFalse((Path(self.media_root) / 'upload_sessions' / session_id).exists())
+
+    def test_failed_ingest_fails_the_session(self):
+        session_id = self.start()
+        self.put(session_id, 0, SAMPLE_CSV)
+        with mock.patch.object(resumable, 'ingest_staged', side_effect=ValueError("disk full")):
+            self.assertEqual(self.finalize(session_id).status_code, 400)
+        self.assertEqual(self.client.get(f'/api/upload/sessions/{session_id}/').data['state'], 'failed')
+        # A retry is told the session failed instead of looking for its moved data
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('disk full', response.data['error'])
+        self.assertFalse(UploadBatch.objects.exists())
+        self.assertFalse(any((Path(self.media_root) / 'uploads').iterdir()))
+
+    def test_finalize_after_the_batch_was_deleted(self):
+        session_id = self.start()
+        self.put(session_id, 0, SAMPLE_CSV)
+        self.assertEqual(self.finalize(session_id).status_code, 201)
+        UploadBatch.objects.all().delete()
+        self.assertEqual(self.finalize(session_id).status_code, 410)
+
+    def test_known_file_is_not_uploaded_again(self):
+        batch_id = self.upload().data['batch_id']
+        response = self.client.post(
+            '/api/upload/sessions/', {'filename': 'again.csv', 'sha256': hashlib.sha256(SAMPLE_CSV).hexdigest()}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['batch_id'], batch_id)
+
+        # Without the hash up front, finalize still finds the existing batch
+        session_id = self.start()
+        self.put(session_id, 0, SAMPLE_CSV)
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['dedup']['hit'])
+        self.assertEqual(UploadBatch.objects.count(), 1)
+
+
+class CompressedUploadTests(APITestCase):
+    def test_gzip_file_is_parsed_and_stored_compressed(self):
+        compressed = gzip.compress(SAMPLE_CSV, mtime=0)
+        response = self.upload(compressed, name='equipment.csv.gz')
+        self.assertEqual(response.status_code, 201)
+        batch = UploadBatch.objects.get(id=response.data['batch_id'])
+        self.assertEqual(batch.row_count, 3)
+        self.assertTrue(batch.file.name.endswith('.csv.gz'))
+        self.assertEqual(batch.file_size, len(compressed))
+        self.assertEqual(batch.statistics['type_distribution'], {'Pump': 2, 'Valve': 1})
+
+    def test_gzip_encoded_raw_body(self):
+        compressed = gzip.compress(SAMPLE_CSV, mtime=0)
+        response = self.client.post(
+            '/api/upload/', compressed, content_type='text/csv',
+            HTTP_CONTENT_ENCODING='gzip', HTTP_CONTENT_DISPOSITION='attachment; filename=plant.csv'
+        )
+        self.assertEqual(response.status_code, 201)
+        batch = UploadBatch.objects.get(id=response.data['batch_id'])
+        self.assertEqual(batch.file.name, 'uploads/plant.csv.gz')
+        # Hashed decompressed, for de-duplication against plain uploads
+        self.assertEqual(batch.content_hash, hashlib.sha256(SAMPLE_CSV).hexdigest())
+
+    def test_compressed_and_plain_copies_are_duplicates(self):
+        batch_id = self.upload(gzip.compress(SAMPLE_CSV, compresslevel=1), name='fast.csv.gz').data['batch_id']
+        for content, name in ((SAMPLE_CSV, 'plain.csv'), (gzip.compress(SAMPLE_CSV, compresslevel=9), 'best.csv.gz')):
+            response = self.upload(content, name=name)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['batch_id'], batch_id)
+        self.assertEqual(UploadBatch.objects.count(), 1)
+
+    def test_corrupt_gzip_is_refused(self):
+        response = self.upload(b"not gzip at all", name='broken.csv.gz')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('broken.csv.gz', response.data['error'])
+        self.assertFalse(UploadBatch.objects.exists())
+
+    def test_unknown_encoding_is_refused(self):
+        response = self.client.post(
+            '/api/upload/', SAMPLE_CSV, content_type='text/csv',
+            HTTP_CONTENT_ENCODING='br', HTTP_CONTENT_DISPOSITION='attachment; filename=plant.csv'
+        )
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(UploadBatch.objects.exists())
+
+    @skipUnless(importlib.util.find_spec('zstandard'), "zstandard is not installed")
+    def test_zstd_file(self):
+        import zstandard
+        response = self.upload(zstandard.ZstdCompressor().compress(SAMPLE_CSV), name='equipment.csv.zst')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['statistics']['total_count'], 3)
+
+    @override_settings(BULK_UPLOAD_WORKERS=0)
+    def test_bulk_accepts_compressed_files(self):
+        response = self.client.post('/api/upload/bulk/', {'files': [
+            SimpleUploadedFile('a.csv.gz', gzip.compress(SAMPLE_CSV, mtime=0)),
+        ]}, format='multipart')
+        self.assertEqual(response.data['files'][0]['rows'], 3)
+        self.assertTrue(UploadBatch.objects.get().file.name.endswith('.csv.gz'))
+
+        response = self.client.post('/api/upload/bulk/', {'files': [SimpleUploadedFile('a.csv', SAMPLE_CSV)]}, format='multipart')
+        self.assertEqual(response.data['files'][0]['status'], 'duplicate')
+
+
+class ParserEngineTests(APITestCase):
+    def parse(self, engine, content=SAMPLE_CSV, chunk_rows=2):
+        return [parsing.to_columns(chunk) for chunk in parsing.read_chunks(io.BytesIO(content), chunk_rows, engine)]
+
+    @skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow is not installed")
+    def test_engines_agree(self):
+        content = b"Equipment Name,Type,Flowrate,Pressure,Temperature,Notes\n007,Pump,1.5,2,3,x\nPump-2,Valve,4,5,6,\nV-9,Valve,7,8,9,y\n"
+        c, arrow = self.parse('c', content), self.parse('pyarrow', content)
+        self.assertEqual([len(chunk['flowrate']) for chunk in arrow], [2, 1])
+        for mine, theirs in zip(c, arrow):
+            for field in mine:
+                self.assertEqual(mine[field].tolist(), theirs[field].tolist())
+        # Names are read as text, not inferred as numbers
+        self.assertEqual(arrow[0]['equipment_name'].tolist(), ['007', 'Pump-2'])
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            parsing.resolve_engine('python')
+
+    @override_settings(CSV_PARSER_ENGINE='c')
+    def test_upload_with_c_engine(self):
+        batch = UploadBatch.objects.get(id=self.upload().data['batch_id'])
+        self.assertEqual(batch.statistics['type_distribution'], {'Pump': 2, 'Valve': 1})
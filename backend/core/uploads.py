@@ -0,0 +1,100 @@
+"""
+Upload helpers: content hashing for de-duplication, and storing files
+that were staged on disk.
+
+The content hash is taken over the CSV itself: a compressed upload is
+hashed decompressed, so the same data matches however it was sent.
+"""
+import hashlib
+import shutil
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler
+
+from .parsing import compression_of, decompressed
+
+COPY_CHUNK_BYTES = 1024 * 1024
+
+HIT_KEY = 'core:dedup:hits'
+MISS_KEY = 'core:dedup:misses'
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Computes the SHA-256 of each uploaded file while it streams in.
+
+    It sits first in the handler chain and passes every chunk on untouched,
+    so the normal memory/temp-file handlers still build the UploadedFile.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.digests = {}
+        self._hash = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hash.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.digests[self.field_name] = self._hash.hexdigest()
+        # Let the next handler produce the file object
+        return None
+
+
+def file_digest(file_obj, handler=None, field_name='file'):
+    """
+    SHA-256 of an uploaded file's CSV: taken from ``handler`` if it saw a
+    plain file stream past, otherwise read from the file itself.
+    """
+    if compression_of(file_obj.name) is None and handler is not None and field_name in handler.digests:
+        return handler.digests[field_name]
+    file_obj.seek(0)
+    digest = content_digest(file_obj, file_obj.name)
+    file_obj.seek(0)
+    return digest
+
+
+def content_digest(fileobj, name):
+    """
+    SHA-256 of the CSV read from ``fileobj``, decompressed first if ``name``
+    says it is compressed. Raises ValueError if it doesn't decompress.
+    """
+    sha = hashlib.sha256()
+    codec = compression_of(name)
+    try:
+        stream = decompressed(fileobj, codec) if codec else fileobj
+        for data in iter(lambda: stream.read(COPY_CHUNK_BYTES), b""):
+            sha.update(data)
+    except Exception as e:
+        if codec is None:
+            raise
+        raise ValueError(f"{name} is not a valid {codec} file: {e}") from e
+    return sha.hexdigest()
+
+
+def record_dedup(hit):
+    """Bump the process-wide hit/miss counters and return both."""
+    key = HIT_KEY if hit else MISS_KEY
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+    return {"hits": cache.get(HIT_KEY, 0), "misses": cache.get(MISS_KEY, 0)}
+
+
+def store_file(path, filename):
+    """
+    Move a staged file into uploads/ under (a free variant of) ``filename``
+    and return its storage name, for use as UploadBatch.file. The file is
+    moved, not copied.
+    """
+    name = default_storage.get_available_name(f"uploads/{filename}")
+    target = Path(default_storage.path(name))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(path), str(target))
+    return name
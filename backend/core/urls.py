@@ -1,11 +1,20 @@
 from django.urls import path
-from .views import FileUploadView, generate_pdf, BatchAnalysisView
+from .views import FileUploadView, BulkUploadView, UploadSessionsView, UploadSessionView, UploadSessionFinalizeView, generate_pdf, BatchAnalysisView, EquipmentRowsView, BatchExportView, CompareView, TrendsView, JobStatusView
 from .auth_views import RegisterView, LoginView
 
 urlpatterns = [
     path('upload/', FileUploadView.as_view(), name='file-upload'),
+    path('upload/bulk/', BulkUploadView.as_view(), name='bulk-upload'),
+    path('upload/sessions/', UploadSessionsView.as_view(), name='upload-sessions'),
+    path('upload/sessions/<uuid:session_id>/', UploadSessionView.as_view(), name='upload-session'),
+    path('upload/sessions/<uuid:session_id>/finalize/', UploadSessionFinalizeView.as_view(), name='upload-session-finalize'),
     path('export-pdf/<int:batch_id>/', generate_pdf, name='export-pdf'),
     path('batch/<int:batch_id>/', BatchAnalysisView.as_view(), name='batch-analysis'),
+    path('batch/<int:batch_id>/equipment/', EquipmentRowsView.as_view(), name='batch-equipment'),
+    path('batch/<int:batch_id>/export/', BatchExportView.as_view(), name='batch-export'),
+    path('compare/', CompareView.as_view(), name='compare'),
+    path('trends/', TrendsView.as_view(), name='trends'),
+    path('jobs/<uuid:job_id>/', JobStatusView.as_view(), name='job-status'),
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
 ]
\ No newline at end of file
@@ -1,88 +1,183 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, FileUploadParser
 from rest_framework import status
-import pandas as pd
-from .models import UploadBatch, ChemicalEquipment
+import hashlib
+import time
+import zipfile
+from django.db import IntegrityError
+from django.urls import reverse
+from .models import UploadBatch, ChemicalEquipment, IngestJob, UploadSession
+from .parsing import REQUIRED_COLUMNS, check_compression, compression_of, missing_columns, read_header
+from .ingest import ingest_file
+from .analytics import get_batch_statistics, batch_statistics_many, get_batch_accumulator, parameter_summary, statistics_etag
+from .parsing import PARAMETERS
+from .retention import request_sweep
+from .uploads import HashingUploadHandler, file_digest, record_dedup
+from . import bulk, jobs, resumable
 from .serializers import UploadBatchSerializer
-from django.http import HttpResponse
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.enums import TA_CENTER
+from rest_framework.negotiation import DefaultContentNegotiation
+from django.http import HttpResponse, HttpResponseNotModified, FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
+from .reports import get_report, report_etag
+from . import export
+
+# Content-Encoding of a raw upload body -> suffix of the stored file
+CONTENT_ENCODINGS = {'gzip': '.gz', 'zstd': '.zst'}
+
+# Batch statistics never change, so clients may reuse them for a day without
+# asking; the history list changes with every upload and is revalidated each time
+BATCH_CACHE_CONTROL = 'private, max-age=86400'
+HISTORY_CACHE_CONTROL = 'private, no-cache'
+
+
+def with_validators(response, etag, last_modified, cache_control):
+    """Set the caching headers a client needs to revalidate ``response`` later."""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    return response
+
 
 class FileUploadView(APIView):
-    parser_classes = (MultiPartParser, FormParser)
+    # Multipart form uploads, or the file as the raw body (name in Content-Disposition)
+    parser_classes = (MultiPartParser, FormParser, FileUploadParser)
     # Uses global REST_FRAMEWORK settings: BasicAuthentication + IsAuthenticated
 
+    def initialize_request(self, request, *args, **kwargs):
+        # Hash uploads while they stream in, before DRF parses the body
+        self.hasher = HashingUploadHandler(request)
+        request.upload_handlers.insert(0, self.hasher)
+        return super().initialize_request(request, *args, **kwargs)
+
     def post(self, request, *args, **kwargs):
         file_obj = request.FILES.get('file')
         
         if not file_obj:
             return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 1. Create the Batch entry
-        batch = UploadBatch.objects.create(file=file_obj)
+        # A compressed raw body is kept compressed: name it after its codec so
+        # the parser decompresses it while reading
+        encoding = request.headers.get('Content-Encoding', '').lower()
+        if encoding and encoding != 'identity':
+            suffix = CONTENT_ENCODINGS.get(encoding)
+            if suffix is None or request.content_type.startswith('multipart/'):
+                return Response({"error": f"Content-Encoding '{encoding}' is not supported here; send .csv.gz or .csv.zst files instead"}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+            if compression_of(file_obj.name) is None:
+                file_obj.name += suffix
+        # Same CSV as an earlier upload (compressed or not): hand back that
+        # batch, no parsing or writes
+        try:
+            check_compression(file_obj.name)
+            digest = file_digest(file_obj, self.hasher)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        existing = UploadBatch.objects.defer('stats_state').filter(content_hash=digest).first()
+        if existing is not None:
+            return self.duplicate_response(existing, digest)
 
+        # Job mode: hand the ingest to the background pool and return at once
+        if (request.query_params.get('mode') or request.data.get('mode')) == 'async':
+            return self.post_async(request, file_obj, digest)
+
+        # 1. Create the Batch entry
         try:
-            # 2. Read CSV using Pandas
-            df = pd.read_csv(batch.file.path)
+            batch = UploadBatch.objects.create(file=file_obj, content_hash=digest)
+        except IntegrityError:
+            # An identical upload landed between the lookup above and now
+            return self.duplicate_response(UploadBatch.objects.defer('stats_state').get(content_hash=digest), digest)
+        started = time.perf_counter()
 
-            # Basic Validation: Check if required columns exist
-            required_columns = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-            if not all(col in df.columns for col in required_columns):
+        try:
+            # 2. Validate the header once, before touching any data rows
+            if missing_columns(read_header(batch.file.path)):
                 batch.delete() # Clean up bad upload
-                return Response({"error": f"Missing columns. Required: {required_columns}"}, status=status.HTTP_400_BAD_REQUEST)
-
-            # 3. Process Data & Save to DB
-            equipment_list = []
-            for _, row in df.iterrows():
-                equipment_list.append(ChemicalEquipment(
-                    batch=batch,
-                    equipment_name=row['Equipment Name'],
-                    equipment_type=row['Type'],
-                    flowrate=row['Flowrate'],
-                    pressure=row['Pressure'],
-                    temperature=row['Temperature']
-                ))
-            
-            # Bulk create is much faster than saving one by one
-            ChemicalEquipment.objects.bulk_create(equipment_list)
-
-            # 4. Calculate Statistics (The "Analytics" part)
-            stats = {
-                "total_count": len(df),
-                "average_flowrate": round(df['Flowrate'].mean(), 2),
-                "average_pressure": round(df['Pressure'].mean(), 2),
-                "average_temperature": round(df['Temperature'].mean(), 2),
-                # This counts how many of each Type exist (e.g., {"Pump": 10, "Valve": 5})
-                "type_distribution": df['Type'].value_counts().to_dict()
-            }
+                return Response({"error": f"Missing columns. Required: {REQUIRED_COLUMNS}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            # 3. Stream the file into the DB chunk by chunk
+            # Each chunk is coerced with NumPy, inserted, and folded into the
+            # running statistics, so the whole file is never held in memory
+            running, write_method = ingest_file(batch, batch.file.path)
+            elapsed = time.perf_counter() - started
+
+            # 4. Statistics were accumulated while streaming (The "Analytics" part)
+            # and stored on the batch alongside the rows
+            stats = batch.statistics
 
             # 5. History Management: Keep only last 5 uploads
-            # Get IDs of all batches, ordered by newest first
-            all_batches = UploadBatch.objects.order_by('-uploaded_at')
-            if all_batches.count() > 5:
-                # Identify the ones to delete (everything after the 5th one)
-                ids_to_delete = all_batches.values_list('id', flat=True)[5:]
-                UploadBatch.objects.filter(id__in=ids_to_delete).delete()
+            request_sweep()
 
             # 6. Return the analysis
             return Response({
                 "message": "File processed successfully",
                 "batch_id": batch.id,
-                "statistics": stats
+                "statistics": stats,
+                "ingest": {
+                    "rows": running.count,
+                    "seconds": round(elapsed, 3),
+                    "rows_per_sec": round(running.count / elapsed) if elapsed > 0 else None,
+                    "method": write_method
+                },
+                "dedup": {"hit": False, "sha256": digest, **record_dedup(hit=False)}
             }, status=status.HTTP_201_CREATED)
 
+        except ValueError as e:
+            # Bad cell values (parsing.to_columns) or malformed CSV: the client's fault
+            batch.delete()
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             batch.delete() # Clean up if something crashes
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def post_async(self, request, file_obj, digest):
+        job = IngestJob.objects.create(file=file_obj, content_hash=digest)
+
+        # Reject a bad header now rather than failing the job later
+        try:
+            if missing_columns(read_header(job.file.path)):
+                job.delete()
+                return Response({"error": f"Missing columns. Required: {REQUIRED_COLUMNS}"}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            job.delete()
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        jobs.submit(job)
+        return Response({
+            "message": "File accepted for processing",
+            "job_id": str(job.id),
+            "status_url": request.build_absolute_uri(reverse('job-status', args=[job.id])),
+            "dedup": {"hit": False, "sha256": digest, **record_dedup(hit=False)}
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def duplicate_response(self, batch, digest):
+        if batch.statistics is None:
+            # The first copy is still being ingested in another request
+            return Response({"error": "An identical file is still being processed", "batch_id": batch.id}, status=status.HTTP_409_CONFLICT)
+        return Response({
+            "message": "File already processed",
+            "batch_id": batch.id,
+            "statistics": batch.statistics,
+            "dedup": {"hit": True, "sha256": digest, **record_dedup(hit=True)}
+        }, status=status.HTTP_200_OK)
+
     def get(self, request, *args, **kwargs):
-        # Fetch the last 5 batches
-        recent_batches = UploadBatch.objects.order_by('-uploaded_at')[:5]
+        # Fetch the last 5 batches in one query; row_count is denormalized at
+        # ingest so there is no per-batch COUNT(*)
+        recent_batches = list(
+            UploadBatch.objects.only('id', 'file', 'uploaded_at', 'row_count')
+            .order_by('-uploaded_at')[:5]
+        )
+
+        # A validator from the same rows, so a 304 costs that one query and nothing else.
+        # ETag only: deleting a batch changes the list without a newer uploaded_at,
+        # so a Last-Modified date would let a stale list through
+        key = ";".join(f"{batch.id}:{batch.row_count}:{batch.file.name}" for batch in recent_batches)
+        etag = f'"history-{hashlib.sha1(key.encode()).hexdigest()[:16]}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return with_validators(not_modified, etag, None, HISTORY_CACHE_CONTROL)
         
         data = []
         for batch in recent_batches:
@@ -90,178 +185,407 @@ class FileUploadView(APIView):
                 "id": batch.id,
                 "filename": batch.file.name.split('/')[-1], # Clean filename
                 "uploaded_at": batch.uploaded_at,
-                "equipment_count": batch.equipments.count()
+                "equipment_count": batch.row_count
             })
             
-        return Response(data, status=status.HTTP_200_OK)
+        return with_validators(Response(data, status=status.HTTP_200_OK), etag, None, HISTORY_CACHE_CONTROL)
+
+class BulkUploadView(APIView):
+    """
+    POST several CSVs at once, as repeated `files` parts and/or ZIP
+    archives of CSVs. Each file becomes its own batch; files are parsed in
+    parallel worker processes (see bulk.py) and reported one by one.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request, *args, **kwargs):
+        uploaded = request.FILES.getlist('files') + request.FILES.getlist('file')
+        if not uploaded:
+            return Response({"error": "No files provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+        started = time.perf_counter()
+        try:
+            results = bulk.bulk_ingest(uploaded)
+        except (ValueError, zipfile.BadZipFile) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        elapsed = time.perf_counter() - started
+        if not results:
+            return Response({"error": "No CSV files found in the upload"}, status=status.HTTP_400_BAD_REQUEST)
+
+        created = [r for r in results if r["status"] == "created"]
+        if created:
+            request_sweep()
+
+        rows = sum(r["rows"] for r in created)
+        return Response({
+            "files": results,
+            "totals": {
+                "files": len(results),
+                "created": len(created),
+                "duplicates": sum(r["status"] == "duplicate" for r in results),
+                "errors": sum(r["status"] == "error" for r in results),
+                "rows": rows,
+                "seconds": round(elapsed, 3),
+                "rows_per_sec": round(rows / elapsed) if elapsed > 0 else None
+            }
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+class UploadSessionsView(APIView):
+    """
+    Start a resumable upload (see resumable.py). POST {filename, size?, sha256?};
+    then PUT the bytes to upload_url in chunks with ?offset= and POST to
+    finalize_url. With a known sha256 the upload is skipped entirely.
+    """
+
+    def post(self, request):
+        filename = request.data.get('filename')
+        if not filename:
+            return Response({"error": "filename is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            size = request.data.get('size')
+            size = int(size) if size not in (None, '') else None
+        except (TypeError, ValueError):
+            return Response({"error": "size must be a whole number of bytes"}, status=status.HTTP_400_BAD_REQUEST)
+        digest = (request.data.get('sha256') or '').lower()
+
+        # The server already has these bytes: no need to send them at all
+        if digest:
+            existing = UploadBatch.objects.defer('stats_state').filter(content_hash=digest).first()
+            if existing is not None and existing.statistics is not None:
+                return Response({
+                    "message": "File already processed",
+                    "batch_id": existing.id,
+                    "statistics": existing.statistics,
+                    "dedup": {"hit": True, "sha256": digest, **record_dedup(hit=True)}
+                }, status=status.HTTP_200_OK)
+
+        # Sessions are parsed line by line as chunks arrive, which needs plain CSV
+        if compression_of(filename):
+            return Response({"error": "Resumable uploads take plain CSV; upload compressed files to /api/upload/"}, status=status.HTTP_400_BAD_REQUEST)
+
+        session = resumable.create_session(filename.split('/')[-1], size, digest)
+        return Response({
+            **resumable.describe(session),
+            "upload_url": request.build_absolute_uri(reverse('upload-session', args=[session.id])),
+            "finalize_url": request.build_absolute_uri(reverse('upload-session-finalize', args=[session.id]))
+        }, status=status.HTTP_201_CREATED)
+
+class UploadSessionView(APIView):
+    def get(self, request, session_id):
+        # Where to resume from after a failed PUT
+        try:
+            session = UploadSession.objects.get(id=session_id)
+        except UploadSession.DoesNotExist:
+            return Response({"error": "Upload session not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(resumable.describe(session), status=status.HTTP_200_OK)
+
+    def put(self, request, session_id):
+        try:
+            offset = int(request.query_params.get('offset', request.headers.get('Upload-Offset', '')))
+        except ValueError:
+            return Response({"error": "offset is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The raw body is read straight off the request stream, never parsed
+        try:
+            session = resumable.write_chunk(session_id, offset, request.stream)
+        except UploadSession.DoesNotExist:
+            return Response({"error": "Upload session not found"}, status=status.HTTP_404_NOT_FOUND)
+        except resumable.SessionConflict as e:
+            return Response({"error": str(e), "offset": e.offset, "state": e.state}, status=status.HTTP_409_CONFLICT)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resumable.describe(session), status=status.HTTP_200_OK)
+
+    def delete(self, request, session_id):
+        try:
+            resumable.abort(session_id)
+        except UploadSession.DoesNotExist:
+            return Response({"error": "Upload session not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class UploadSessionFinalizeView(APIView):
+    def post(self, request, session_id):
+        started = time.perf_counter()
+        try:
+            session, created = resumable.finalize(session_id)
+        except UploadSession.DoesNotExist:
+            return Response({"error": "Upload session not found"}, status=status.HTTP_404_NOT_FOUND)
+        except resumable.SessionConflict as e:
+            return Response({"error": str(e), "offset": e.offset, "state": e.state}, status=status.HTTP_409_CONFLICT)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        elapsed = time.perf_counter() - started
+
+        batch = UploadBatch.objects.defer('stats_state').filter(id=session.batch_id).first()
+        if batch is None:
+            # Finalized before, but retention has deleted the batch since
+            return Response({"error": "The batch of this upload has been deleted"}, status=status.HTTP_410_GONE)
+        if created:
+            request_sweep()
+        return Response({
+            "message": "File processed successfully" if created else "File already processed",
+            "batch_id": batch.id,
+            "statistics": batch.statistics,
+            "ingest": {
+                "rows": batch.row_count,
+                # Only what was left after the last chunk: the rest was parsed while uploading
+                "finalize_seconds": round(elapsed, 3)
+            },
+            "dedup": {"hit": not created, "sha256": batch.content_hash, **record_dedup(hit=not created)}
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 class BatchAnalysisView(APIView):
     def get(self, request, batch_id):
         try:
-            batch = UploadBatch.objects.get(id=batch_id)
-            
-            # Recalculate or retrieve stats (for now, let's recalculate simply as we don't store stats in DB yet)
-            # In a production app, you'd store stats in a JSONField or similar
-            
-            equipments = batch.equipments.all()
-            total_count = equipments.count()
-            
-            if total_count == 0:
+            batch = UploadBatch.objects.defer('stats_state').get(id=batch_id)
+
+            # Once ingested (row_count is set with the statistics) the stats are
+            # fixed, so a client holding them gets a 304
+            etag = statistics_etag(batch) if batch.row_count else None
+            last_modified = int(batch.uploaded_at.timestamp())
+            if etag:
+                not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if not_modified is not None:
+                    return with_validators(not_modified, etag, last_modified, BATCH_CACHE_CONTROL)
+
+            # Stats are stored at ingest, so this is a single-row lookup
+            stats = get_batch_statistics(batch)
+
+            if stats["total_count"] == 0:
                  return Response({"error": "Batch is empty"}, status=status.HTTP_404_NOT_FOUND)
-            
-            # Simple aggregations
-            # Note: For large datasets, doing this in Python is slow. 
-            # Better to use Django aggregates: .aggregate(Avg('flowrate'), ...)
-            
-            from django.db.models import Avg
-            
-            aggregates = equipments.aggregate(
-                avg_flow=Avg('flowrate'),
-                avg_pressure=Avg('pressure'),
-                avg_temp=Avg('temperature')
-            )
-            
-            type_counts = {}
-            for e in equipments:
-                type_counts[e.equipment_type] = type_counts.get(e.equipment_type, 0) + 1
-            
-            stats = {
-                "total_count": total_count,
-                "average_flowrate": round(aggregates['avg_flow'] or 0, 2),
-                "average_pressure": round(aggregates['avg_pressure'] or 0, 2),
-                "average_temperature": round(aggregates['avg_temp'] or 0, 2),
-                "type_distribution": type_counts
-            }
-            
-            return Response({
+
+            response = Response({
                 "batch_id": batch.id,
                 "statistics": stats,
                 "created_at": batch.uploaded_at
             }, status=status.HTTP_200_OK)
+            if etag:
+                with_validators(response, etag, last_modified, BATCH_CACHE_CONTROL)
+            return response
             
         except UploadBatch.DoesNotExist:
             return Response({"error": "Batch not found"}, status=status.HTTP_404_NOT_FOUND)
 
-def generate_pdf(request, batch_id):
-    try:
-        batch = UploadBatch.objects.get(id=batch_id)
-        equipments = batch.equipments.all()
-        
-        # Create the HttpResponse object with PDF headers
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="batch_{batch_id}_report.pdf"'
-
-        # Create the PDF document
-        doc = SimpleDocTemplate(response, pagesize=letter,
-                                rightMargin=72, leftMargin=72,
-                                topMargin=72, bottomMargin=18)
-        
-        # Container for PDF elements
-        elements = []
-        
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#2c3e50'),
-            spaceAfter=12,
-            alignment=TA_CENTER
-        )
-        
-        # Title
-        title = Paragraph(f"Chemical Equipment Analytics Report", title_style)
-        elements.append(title)
-        
-        subtitle = Paragraph(
-            f"<b>Batch ID:</b> {batch_id} | <b>Generated:</b> {batch.uploaded_at.strftime('%Y-%m-%d %H:%M')}",
-            styles['Normal']
-        )
-        elements.append(subtitle)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Calculate statistics
-        from django.db.models import Avg
-        total = equipments.count()
-        aggregates = equipments.aggregate(
-            avg_flow=Avg('flowrate'),
-            avg_pressure=Avg('pressure'),
-            avg_temp=Avg('temperature')
+class CompareView(APIView):
+    """
+    Side-by-side statistics of several batches: ?batches=1,2,3.
+
+    Everything comes from the stored statistics in one query (plus one
+    grouped query for any old batches without them). ?combined=1 also
+    merges the batches' accumulators into one set of statistics.
+    """
+    MAX_BATCHES = 50
+
+    def get(self, request):
+        try:
+            ids = [int(i) for i in request.query_params.get('batches', '').split(',') if i.strip()]
+        except ValueError:
+            return Response({"error": "batches must be a comma-separated list of batch ids"}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({"error": "No batches given, use ?batches=1,2,3"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.MAX_BATCHES:
+            return Response({"error": f"At most {self.MAX_BATCHES} batches can be compared"}, status=status.HTTP_400_BAD_REQUEST)
+
+        combined = request.query_params.get('combined', '').lower() in ('1', 'true', 'yes')
+        fields = ['id', 'file', 'uploaded_at', 'statistics'] + (['stats_state'] if combined else [])
+        batches = {batch.id: batch for batch in UploadBatch.objects.filter(id__in=ids).only(*fields)}
+        statistics = batch_statistics_many(list(batches.values()))
+
+        data = {
+            "batches": [
+                {
+                    "batch_id": batch_id,
+                    "filename": batches[batch_id].file.name.split('/')[-1],
+                    "uploaded_at": batches[batch_id].uploaded_at,
+                    "statistics": statistics[batch_id]
+                }
+                for batch_id in ids if batch_id in batches
+            ],
+            "missing": [batch_id for batch_id in ids if batch_id not in batches]
+        }
+
+        if combined and batches:
+            merged = None
+            for batch in batches.values():
+                accumulator = get_batch_accumulator(batch)
+                merged = accumulator if merged is None else merged.merge(accumulator)
+            data["combined"] = merged.as_dict()
+
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class TrendsView(APIView):
+    """
+    How one parameter moves across uploads, oldest first: ?param=pressure,
+    optionally &type=Pump and &limit=N (most recent N batches).
+    Served from the stored statistics in a single query.
+    """
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 500
+
+    def get(self, request):
+        param = request.query_params.get('param', '')
+        if param not in PARAMETERS:
+            return Response({"error": f"param must be one of {PARAMETERS}"}, status=status.HTTP_400_BAD_REQUEST)
+        eq_type = request.query_params.get('type') or None
+        try:
+            limit = min(int(request.query_params.get('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response({"error": "limit must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        batches = list(
+            UploadBatch.objects.only('id', 'file', 'uploaded_at', 'statistics')
+            .order_by('-uploaded_at')[:limit]
         )
-        
-        # Summary Statistics Table
-        summary_data = [
-            ['Metric', 'Value'],
-            ['Total Equipment', str(total)],
-            ['Average Flowrate', f"{round(aggregates['avg_flow'] or 0, 2)} m³/hr"],
-            ['Average Pressure', f"{round(aggregates['avg_pressure'] or 0, 2)} Pa"],
-            ['Average Temperature', f"{round(aggregates['avg_temp'] or 0, 2)} °C"],
-        ]
-        
-        summary_table = Table(summary_data, colWidths=[3*inch, 3*inch])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#72e3ad')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(summary_table)
-        elements.append(Spacer(1, 0.4*inch))
-        
-        # Equipment List Section
-        equipment_header = Paragraph("<b>Equipment Details</b>", styles['Heading2'])
-        elements.append(equipment_header)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Limit to first 100 items
-        equipment_limit = 100
-        limited_equipments = equipments[:equipment_limit]
-        
-        # Equipment Table
-        equipment_data = [['Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']]
-        
-        for eq in limited_equipments:
-            equipment_data.append([
-                eq.equipment_name,
-                eq.equipment_type,
-                f"{eq.flowrate}",
-                f"{eq.pressure}",
-                f"{eq.temperature}"
-            ])
-        
-        equipment_table = Table(equipment_data, colWidths=[1.8*inch, 1.2*inch, 1*inch, 1*inch, 1*inch])
-        equipment_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (1, -1), 'LEFT'),  # Name and Type left-aligned
-            ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),  # Numbers right-aligned
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-        ]))
-        
-        elements.append(equipment_table)
-        
-        # Add note if data was limited
-        if total > equipment_limit:
-            elements.append(Spacer(1, 0.2*inch))
-            note = Paragraph(
-                f"<i>Note: Showing first {equipment_limit} of {total} total equipment items.</i>",
-                styles['Normal']
-            )
-            elements.append(note)
-        
-        # Build PDF
-        doc.build(elements)
+        statistics = batch_statistics_many(batches)
+
+        points = []
+        for batch in reversed(batches):
+            summary = parameter_summary(statistics[batch.id], param, eq_type)
+            if summary is None:
+                continue
+            points.append({
+                "batch_id": batch.id,
+                "filename": batch.file.name.split('/')[-1],
+                "uploaded_at": batch.uploaded_at,
+                **summary
+            })
+
+        return Response({"param": param, "type": eq_type, "points": points}, status=status.HTTP_200_OK)
+
+
+class EquipmentRowsView(APIView):
+    """
+    Raw equipment rows of a batch, one page at a time.
+
+    Pages are keyed on the primary key (?cursor=<last id seen>), so every
+    page is an index range scan, however deep into the batch it is. Rows
+    come back as plain value lists under "columns".
+
+    Query params: cursor, limit, fields=a,b,c, type=Pump,Valve and
+    <flowrate|pressure|temperature>_<min|max>.
+    """
+    COLUMNS = ['id', 'equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature']
+    RANGE_FIELDS = ['flowrate', 'pressure', 'temperature']
+    DEFAULT_LIMIT = 500
+    MAX_LIMIT = 5000
+
+    def get(self, request, batch_id):
+        params = request.query_params
+        try:
+            cursor = int(params.get('cursor', 0))
+            limit = min(int(params.get('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response({"error": "cursor and limit must be positive integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Column projection; id always comes first since it is the cursor
+        columns = self.COLUMNS
+        if params.get('fields'):
+            requested = [f.strip() for f in params['fields'].split(',') if f.strip()]
+            unknown = [f for f in requested if f not in self.COLUMNS]
+            if unknown:
+                return Response({"error": f"Unknown fields: {unknown}. Available: {self.COLUMNS}"}, status=status.HTTP_400_BAD_REQUEST)
+            columns = ['id'] + [f for f in requested if f != 'id']
+
+        if not UploadBatch.objects.filter(id=batch_id).exists():
+            return Response({"error": "Batch not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        rows = ChemicalEquipment.objects.filter(batch_id=batch_id, id__gt=cursor)
+        if params.get('type'):
+            rows = rows.filter(equipment_type__in=params['type'].split(','))
+        for field in self.RANGE_FIELDS:
+            for bound, lookup in (('min', 'gte'), ('max', 'lte')):
+                value = params.get(f'{field}_{bound}')
+                if value is None:
+                    continue
+                try:
+                    rows = rows.filter(**{f'{field}__{lookup}': float(value)})
+                except ValueError:
+                    return Response({"error": f"{field}_{bound} must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Fetch one extra row to learn whether there is a next page
+        page = list(rows.order_by('id').values_list(*columns)[:limit + 1])
+        next_cursor = None
+        next_url = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = page[-1][0]
+            query = params.copy()
+            query['cursor'] = next_cursor
+            next_url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+        return Response({
+            "batch_id": batch_id,
+            "columns": columns,
+            "rows": page,
+            "next_cursor": next_cursor,
+            "next": next_url
+        }, status=status.HTTP_200_OK)
+
+class IgnoreFormatNegotiation(DefaultContentNegotiation):
+    # ?format= names the export format here, not a DRF renderer, so always answer in JSON
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class BatchExportView(APIView):
+    """
+    Stream a batch's rows as ?format=csv (default), arrow (IPC stream) or parquet.
+    The body is written chunk by chunk straight from the database.
+    """
+    content_negotiation_class = IgnoreFormatNegotiation
+
+    def get(self, request, batch_id):
+        fmt = request.query_params.get('format', 'csv').lower()
+        if fmt not in export.FORMATS:
+            return Response({"error": f"Unknown format '{fmt}'. Choose one of {list(export.FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        if fmt not in export.available_formats():
+            return Response({"error": f"The '{fmt}' export needs pyarrow, which is not installed on the server"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        try:
+            batch = UploadBatch.objects.defer('stats_state').get(id=batch_id)
+        except UploadBatch.DoesNotExist:
+            return Response({"error": "Batch not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        content_type, extension, _ = export.FORMATS[fmt]
+        response = StreamingHttpResponse(export.stream_batch(batch, fmt), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="batch_{batch_id}.{extension}"'
         return response
-        
+
+
+class JobStatusView(APIView):
+    def get(self, request, job_id):
+        try:
+            job = IngestJob.objects.select_related('batch').defer('batch__stats_state').get(id=job_id)
+        except IngestJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(jobs.job_status(job), status=status.HTTP_200_OK)
+
+def generate_pdf(request, batch_id):
+    try:
+        batch = UploadBatch.objects.defer('stats_state').get(id=batch_id)
     except UploadBatch.DoesNotExist:
-        return HttpResponse("Batch not found", status=404)
\ No newline at end of file
+        return HttpResponse("Batch not found", status=404)
+
+    # ?full=1 lists every equipment row instead of the first 100
+    full = request.GET.get('full', '').lower() in ('1', 'true', 'yes')
+
+    # Reports never change once rendered, so a matching ETag needs no body
+    etag = report_etag(batch, full)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    response = FileResponse(
+        get_report(batch, full),
+        as_attachment=True,
+        filename=f"batch_{batch_id}_{'full_' if full else ''}report.pdf",
+        content_type='application/pdf'
+    )
+    response['ETag'] = etag
+    return response
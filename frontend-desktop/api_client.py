@@ -1,17 +1,112 @@
+import gzip
+import hashlib
+import io
 import os
+import tempfile
+import time
+import zipfile
+from urllib.parse import quote, urlencode
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
+from response_cache import ResponseCache, freshness
 
 # Load environment variables
 load_dotenv()
 
+# (connect, read) timeouts in seconds for each kind of call; override any of
+# them with APIClient(timeouts={...}) or per call with timeout=. The read part
+# of "upload" covers the server parsing and storing the file before it answers
+TIMEOUTS = {
+    'default': (5, 10),
+    'report': (5, 30),
+    'upload': (10, 600),
+    'chunk': (10, 120),
+    'finalize': (10, 300),
+}
+# Connections kept open to the server; at least the UI's worker thread count
+POOL_SIZE = 8
+# GET/HEAD/OPTIONS are retried on connection errors and 429/502/503/504,
+# waiting 0.3s, 0.6s, 1.2s... between tries
+RETRIES = 3
+RETRY_BACKOFF = 0.3
+# Where cached batch stats and history are kept between runs ('' keeps them in memory only)
+CACHE_PATH = os.getenv(
+    "API_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "equipment-visualizer", "responses.json")
+)
+
+
+class RequestCancelled(Exception):
+    """Raised when a request is cancelled through its cancel Event."""
+
+
+class ProgressReader:
+    """
+    File wrapper handed to requests as a request body: reports every block
+    sent to on_progress("upload", sent, total) and raises RequestCancelled
+    once the cancel Event is set, which aborts the request mid-upload.
+    """
+
+    def __init__(self, fileobj, on_progress=None, cancel=None):
+        self._file = fileobj
+        self._on_progress = on_progress
+        self._cancel = cancel
+        fileobj.seek(0, os.SEEK_END)
+        self._total = fileobj.tell()
+        fileobj.seek(0)
+        self._sent = 0
+
+    def __len__(self):
+        # Lets requests send a Content-Length rather than a chunked body
+        return self._total
+
+    def read(self, size=-1):
+        if self._cancel is not None and self._cancel.is_set():
+            raise RequestCancelled("Upload cancelled")
+        data = self._file.read(size)
+        self._sent += len(data)
+        if self._on_progress:
+            self._on_progress("upload", self._sent, self._total)
+        return data
+
+
+def build_session(pool_size=POOL_SIZE, retries=RETRIES, backoff=RETRY_BACKOFF):
+    """
+    A requests.Session whose connections are kept alive and reused, so only
+    the first call to the server pays for the TCP (and TLS) handshake.
+    Idempotent requests are retried with backoff; uploads are not, they
+    have their own resume logic.
+    """
+    retry = Retry(
+        total=retries, connect=retries, read=retries, status=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS'}),
+        # Hand the last error response back instead of raising MaxRetryError
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
 class APIClient:
-    def __init__(self):
+    def __init__(self, timeouts=None, pool_size=POOL_SIZE, retries=RETRIES, cache_path=CACHE_PATH):
         self.base_url = os.getenv("API_URL", "http://127.0.0.1:8000")
         # Ensure no trailing slash for cleaner concatenation
         if self.base_url.endswith("/"):
             self.base_url = self.base_url[:-1]
         
+        self.timeouts = {**TIMEOUTS, **(timeouts or {})}
+        # One pooled keep-alive session for every call (shared by the UI's worker threads)
+        self.session = build_session(pool_size, retries)
+        # Batch stats and history, revalidated with conditional GETs
+        self.cache = ResponseCache(path=cache_path or None)
+        
         # Credentials storage
         self._username = None
         self._password = None
@@ -20,11 +115,64 @@ class APIClient:
         """Store credentials for authenticated requests."""
         self._username = username
         self._password = password
+        self.session.auth = self.get_auth()
     
     def clear_credentials(self):
         """Clear stored credentials."""
         self._username = None
         self._password = None
+        self.session.auth = None
+        self.session.cookies.clear()
+
+    def close(self):
+        """Save the response cache and close the pooled connections."""
+        try:
+            self.cache.save()
+        except OSError as e:
+            print(f"Could not save the response cache: {e}")
+        self.session.close()
+
+    def _timeout(self, kind, timeout=None):
+        return timeout if timeout is not None else self.timeouts[kind]
+
+    def _cached_get(self, url, params=None, timeout=None):
+        """
+        GET url as JSON through the response cache. An entry still fresh by
+        the server's Cache-Control is returned without any request; a stale
+        one is revalidated with If-None-Match / If-Modified-Since, and a 304
+        reuses it.
+        """
+        # Per user, so a different login never sees someone else's copy
+        key = f"{self._username or ''}@{url}"
+        if params:
+            key += "?" + urlencode(sorted(params.items()))
+
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.hits += 1
+            return entry["body"]
+
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = self.session.get(url, params=params, headers=headers, timeout=self._timeout('default', timeout))
+        max_age = freshness(response.headers)
+        if response.status_code == 304 and entry is not None:
+            self.cache.revalidated += 1
+            self.cache.refresh(key, max_age or 0)
+            return entry["body"]
+
+        response.raise_for_status()
+        body = response.json()
+        self.cache.misses += 1
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if max_age is not None and (max_age or etag or last_modified):
+            self.cache.put(key, body, etag, last_modified, max_age)
+        return body
     
     def get_auth(self):
         """Get auth tuple if credentials are set."""
@@ -32,7 +180,7 @@ class APIClient:
             return (self._username, self._password)
         return None
     
-    def test_auth(self):
+    def test_auth(self, timeout=None):
         """
         Test if the stored credentials are valid.
         Returns True if authentication succeeds, False otherwise.
@@ -40,46 +188,281 @@ class APIClient:
         try:
             # Try to access the upload endpoint with OPTIONS or a simple GET
             test_url = f"{self.base_url}/api/upload/"
-            response = requests.options(test_url, auth=self.get_auth(), timeout=10)
+            response = self.session.options(test_url, timeout=self._timeout('default', timeout))
             # If we get anything other than 401, credentials are likely valid
             return response.status_code != 401
         except requests.exceptions.RequestException:
             # If we can't connect, assume it's a network issue, not auth
             return True  # Let the actual upload reveal the real error
 
-    def upload_csv(self, file_path):
+    @staticmethod
+    def _upload_body(file_path, compress, on_progress=None, cancel=None):
+        """
+        (filename, file object, Content-Encoding) to send for file_path.
+        With compress, a plain CSV is gzipped first (CSV shrinks about 10x); the
+        server stores it that way. mtime=0 keeps the bytes identical across
+        runs, so re-uploading the same file is still recognised as a duplicate.
+        Compression is reported to on_progress as the "compress" phase.
+        """
+        name = os.path.basename(file_path)
+        if not compress or name.lower().endswith(('.gz', '.zst')):
+            return name, open(file_path, 'rb'), None
+        body = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+        total = os.path.getsize(file_path)
+        done = 0
+        try:
+            with open(file_path, 'rb') as src, gzip.GzipFile(filename='', mode='wb', fileobj=body, mtime=0) as gz:
+                for block in iter(lambda: src.read(1024 * 1024), b''):
+                    if cancel is not None and cancel.is_set():
+                        raise RequestCancelled("Upload cancelled")
+                    gz.write(block)
+                    done += len(block)
+                    if on_progress:
+                        on_progress("compress", done, total)
+        except BaseException:
+            body.close()
+            raise
+        body.seek(0)
+        return name, body, 'gzip'
+
+    def _post_file(self, url, file_path, compress, on_progress, cancel, timeout):
+        # The file goes as the raw request body, read through ProgressReader,
+        # so upload progress can be reported and the upload cancelled midway
+        name, body, encoding = self._upload_body(file_path, compress, on_progress, cancel)
+        with body:
+            headers = {
+                'Content-Type': 'text/csv',
+                'Content-Disposition': f"attachment; filename*=utf-8''{quote(name)}"
+            }
+            if encoding:
+                headers['Content-Encoding'] = encoding
+            reader = ProgressReader(body, on_progress, cancel)
+            response = self.session.post(url, data=reader, headers=headers, timeout=self._timeout('upload', timeout))
+        response.raise_for_status()
+        return response.json()
+
+    def upload_csv(self, file_path, compress=True, on_progress=None, cancel=None, timeout=None):
         """
-        Uploads a CSV file to the /api/upload/ endpoint.
+        Uploads a CSV file to the /api/upload/ endpoint, gzipped unless compress is False.
         Returns the JSON response containing statistics and batch_id.
+        Re-uploading an identical file returns the earlier batch (dedup.hit is True).
+        on_progress(phase, done, total) is called while compressing ("compress")
+        and sending ("upload"); setting the cancel Event aborts the upload with
+        RequestCancelled. timeout replaces the client's "upload" timeout.
         """
         upload_url = f"{self.base_url}/api/upload/"
         
         try:
-            with open(file_path, 'rb') as f:
-                files = {'file': (os.path.basename(file_path), f, 'text/csv')}
-                response = requests.post(upload_url, files=files, auth=self.get_auth())
-                
-            response.raise_for_status()
-            return response.json()
+            return self._post_file(upload_url, file_path, compress, on_progress, cancel, timeout)
             
         except requests.exceptions.RequestException as e:
             print(f"API Request Error: {e}")
             raise e
+        except RequestCancelled:
+            raise
         except Exception as e:
             print(f"General Error: {e}")
             raise e
 
-    def get_recent_uploads(self):
+    def upload_csv_async(self, file_path, compress=True, on_progress=None, cancel=None, timeout=None):
+        """
+        Uploads a CSV file in job mode, gzipped unless compress is False.
+        Returns immediately with the job_id and status_url; poll get_job() for the result.
+        If the same file was uploaded before, the response has no job_id and
+        already carries batch_id and statistics.
+        on_progress and cancel work as in upload_csv.
+        """
+        upload_url = f"{self.base_url}/api/upload/?mode=async"
+        
+        try:
+            return self._post_file(upload_url, file_path, compress, on_progress, cancel, timeout)
+            
+        except requests.exceptions.RequestException as e:
+            print(f"API Request Error: {e}")
+            raise e
+
+    def upload_many(self, file_paths, as_zip=False, timeout=None):
+        """
+        Uploads several CSV files in one request to /api/upload/bulk/.
+        Each file becomes its own batch; the response lists per file its
+        status (created, duplicate or error), batch_id, statistics and timings.
+        With as_zip=True the files are sent as a single ZIP archive instead.
+        """
+        upload_url = f"{self.base_url}/api/upload/bulk/"
+        handles = []
+
+        try:
+            if as_zip:
+                archive = io.BytesIO()
+                with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+                    for file_path in file_paths:
+                        zf.write(file_path, os.path.basename(file_path))
+                archive.seek(0)
+                files = [('files', ('upload.zip', archive, 'application/zip'))]
+            else:
+                for file_path in file_paths:
+                    handles.append(open(file_path, 'rb'))
+                files = [
+                    ('files', (os.path.basename(file_path), f, 'text/csv'))
+                    for file_path, f in zip(file_paths, handles)
+                ]
+            response = self.session.post(upload_url, files=files, timeout=self._timeout('upload', timeout))
+
+            response.raise_for_status()
+            return response.json()
+
+        except requests.exceptions.RequestException as e:
+            print(f"API Request Error: {e}")
+            raise e
+        finally:
+            for f in handles:
+                f.close()
+
+    def upload_resumable(self, file_path, chunk_size=8 * 1024 * 1024, session_id=None,
+                         max_retries=5, on_progress=None, cancel=None):
+        """
+        Uploads a (large) CSV file through a resumable upload session.
+        The file is sent in chunk_size pieces; a failed chunk is retried from
+        the offset the server reports, with a growing pause between tries,
+        so a dropped connection never restarts the upload from zero. Gives up
+        after max_retries failures in a row, or at once if the session is
+        no longer open.
+        Pass the session_id of an earlier, interrupted call to carry on with it.
+        on_progress("upload", bytes_sent, total_bytes) is called after every chunk.
+        Setting the cancel Event stops after the current chunk with
+        RequestCancelled; the session stays open to be resumed.
+        Returns the same JSON as upload_csv.
+        """
+        sessions_url = f"{self.base_url}/api/upload/sessions/"
+        total = os.path.getsize(file_path)
+
+        try:
+            if session_id is None:
+                response = self.session.post(sessions_url, data={
+                    'filename': os.path.basename(file_path),
+                    'size': total,
+                    'sha256': self._file_sha256(file_path)
+                }, timeout=self.timeouts['default'])
+                response.raise_for_status()
+                if response.status_code == 200:
+                    # The server already has this file
+                    return response.json()
+                session_id = response.json()['session_id']
+            session_url = f"{sessions_url}{session_id}/"
+
+            offset = self._session_offset(session_url)
+            failures = 0
+            resync = False
+            with open(file_path, 'rb') as f:
+                while offset < total:
+                    if cancel is not None and cancel.is_set():
+                        raise RequestCancelled(f"Upload cancelled; resume with session_id={session_id}")
+                    try:
+                        if resync:
+                            # Ask where the failed chunk left off; a failure
+                            # here is retried like any other
+                            offset = self._session_offset(session_url)
+                            resync = False
+                            continue
+                        f.seek(offset)
+                        chunk = f.read(chunk_size)
+                        response = self.session.put(
+                            session_url, params={'offset': offset}, data=chunk,
+                            headers={'Content-Type': 'application/octet-stream'},
+                            timeout=self.timeouts['chunk']
+                        )
+                        if response.status_code == 409:
+                            conflict = response.json()
+                            if conflict.get('state', 'open') != 'open':
+                                # Completed, failed or expired: no chunk will ever be taken
+                                raise requests.exceptions.HTTPError(conflict['error'], response=response)
+                            # Out of step with the server: continue from its offset,
+                            # but give up if it keeps refusing without moving on
+                            failures = failures + 1 if conflict['offset'] <= offset else 0
+                            if failures > max_retries:
+                                raise requests.exceptions.HTTPError(
+                                    f"Server keeps refusing offset {offset}: {conflict['error']}", response=response
+                                )
+                            offset = conflict['offset']
+                            continue
+                        response.raise_for_status()
+                        offset = response.json()['offset']
+                        failures = 0
+                    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                        failures += 1
+                        if failures > max_retries:
+                            raise
+                        time.sleep(min(2 ** failures, 30))
+                        resync = True
+                        continue
+                    if on_progress:
+                        on_progress("upload", offset, total)
+
+            response = self.session.post(f"{session_url}finalize/", timeout=self.timeouts['finalize'])
+            response.raise_for_status()
+            return response.json()
+
+        except requests.exceptions.RequestException as e:
+            print(f"API Request Error: {e}")
+            raise e
+
+    def _session_offset(self, session_url):
+        response = self.session.get(session_url, timeout=self.timeouts['default'])
+        response.raise_for_status()
+        return response.json()['offset']
+
+    @staticmethod
+    def _file_sha256(file_path):
+        sha = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def get_job(self, job_id, timeout=None):
+        """
+        Fetch the state of a background ingest job.
+        Returns state, rows_processed, rows_per_sec and, once finished, batch_id and statistics.
+        """
+        job_url = f"{self.base_url}/api/jobs/{job_id}/"
+        
+        try:
+            response = self.session.get(job_url, timeout=self._timeout('default', timeout))
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"API Request Error: {e}")
+            raise e
+
+    def wait_for_job(self, job_id, poll_interval=0.5, timeout=None, on_progress=None):
+        """
+        Poll a job until it succeeds or fails.
+        on_progress, if given, is called with each status payload.
+        Returns the final status; raises RuntimeError if the job failed.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            job = self.get_job(job_id)
+            if on_progress:
+                on_progress(job)
+            if job.get("state") == "succeeded":
+                return job
+            if job.get("state") == "failed":
+                raise RuntimeError(job.get("error") or "Ingest job failed")
+            if deadline and time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} still {job.get('state')} after {timeout}s")
+            time.sleep(poll_interval)
+
+    def get_recent_uploads(self, timeout=None):
         """
         Fetch the last 5 recent uploads from the server.
         Returns a list of upload data with id, filename, uploaded_at, equipment_count.
+        Revalidated on every call, so an unchanged list comes back as a 304.
         """
         upload_url = f"{self.base_url}/api/upload/"
         
         try:
-            response = requests.get(upload_url, auth=self.get_auth(), timeout=10)
-            response.raise_for_status()
-            return response.json()
+            return self._cached_get(upload_url, timeout=timeout)
         except requests.exceptions.RequestException as e:
             print(f"API Request Error: {e}")
             return []
@@ -87,41 +470,94 @@ class APIClient:
             print(f"General Error: {e}")
             return []
 
-    def get_batch_stats(self, batch_id):
+    def get_batch_stats(self, batch_id, timeout=None):
         """
         Fetch statistics for a specific batch.
         Returns the batch statistics including type distribution.
+        They never change, so switching back to a batch is served from the cache.
         """
         stats_url = f"{self.base_url}/api/batch/{batch_id}/"
         
         try:
-            response = requests.get(stats_url, auth=self.get_auth(), timeout=10)
+            return self._cached_get(stats_url, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"API Request Error: {e}")
+            raise e
+
+    def compare_batches(self, batch_ids, combined=False, timeout=None):
+        """
+        Fetch the statistics of several batches in one request.
+        With combined=True the response also has their merged statistics.
+        """
+        compare_url = f"{self.base_url}/api/compare/"
+        params = {"batches": ",".join(str(batch_id) for batch_id in batch_ids)}
+        if combined:
+            params["combined"] = 1
+
+        try:
+            response = self.session.get(compare_url, params=params, timeout=self._timeout('default', timeout))
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"API Request Error: {e}")
+            raise e
+
+    def get_trends(self, param, eq_type=None, limit=None, timeout=None):
+        """
+        Fetch how one parameter ('flowrate', 'pressure' or 'temperature')
+        moves across uploads, oldest first, optionally for one equipment type.
+        """
+        trends_url = f"{self.base_url}/api/trends/"
+        params = {"param": param}
+        if eq_type:
+            params["type"] = eq_type
+        if limit:
+            params["limit"] = limit
+
+        try:
+            response = self.session.get(trends_url, params=params, timeout=self._timeout('default', timeout))
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"API Request Error: {e}")
             raise e
 
-    def download_pdf(self, batch_id, save_path):
+    def download_pdf(self, batch_id, save_path, on_progress=None, cancel=None, timeout=None):
         """
         Download PDF report for a specific batch.
         Saves the PDF to the specified path.
+        on_progress("download", received, total) is called per chunk (total is
+        None if the server doesn't say); setting the cancel Event stops the
+        download with RequestCancelled and removes the partial file.
         Returns True on success, False on failure.
         """
         pdf_url = f"{self.base_url}/api/export-pdf/{batch_id}/"
         
         try:
-            response = requests.get(pdf_url, auth=self.get_auth(), timeout=30, stream=True)
+            response = self.session.get(pdf_url, timeout=self._timeout('report', timeout), stream=True)
             response.raise_for_status()
             
+            total = int(response.headers['Content-Length']) if 'Content-Length' in response.headers else None
+            received = 0
             with open(save_path, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
+                    if cancel is not None and cancel.is_set():
+                        break
                     f.write(chunk)
+                    received += len(chunk)
+                    if on_progress:
+                        on_progress("download", received, total)
+            if cancel is not None and cancel.is_set():
+                response.close()
+                os.remove(save_path)
+                raise RequestCancelled("Download cancelled")
             
             return True
         except requests.exceptions.RequestException as e:
             print(f"PDF Download Error: {e}")
             raise e
+        except RequestCancelled:
+            raise
         except Exception as e:
             print(f"General Error: {e}")
             raise e
@@ -0,0 +1,133 @@
+"""
+Frame time of the dashboard's bar and pie charts over rapid batch switches,
+rendered off-screen with Agg: the old rebuild (axes.clear(), new artists,
+full draw) against the in-place charts of ui/charts.py.
+
+Batches are picked at random from a small pool, so some switches land on
+the batch already shown (which the new charts skip) and all of them share
+the same equipment types, as batches of one plant do.
+
+    python benchmarks/bench_chart_updates.py --switches 50 --types 6 40
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np  # noqa: E402
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from theme import Theme  # noqa: E402
+from ui.charts import PIE_COLORS, BarChart, PieChart  # noqa: E402
+
+
+class AggCanvas(FigureCanvasAgg):
+    """The bits of dashboard.MplCanvas the charts use, without Qt."""
+
+    def __init__(self, width=5, height=4, dpi=100):
+        self.fig = Figure(figsize=(width, height), dpi=dpi)
+        self.axes = self.fig.add_subplot(111)
+        self.fig.patch.set_facecolor(Theme.CARD)
+        self.axes.set_facecolor(Theme.CARD)
+        super().__init__(self.fig)
+
+
+def rebuild_bar(canvas, type_dist):
+    # Dashboard.plot_bar_chart before the in-place charts
+    ax = canvas.axes
+    ax.clear()
+    ax.bar(list(type_dist.keys()), list(type_dist.values()), color=Theme.CHART_1, alpha=0.9)
+    ax.set_title("Count per Type", color=Theme.FOREGROUND, fontsize=12, fontweight='bold')
+    ax.tick_params(colors=Theme.FOREGROUND, labelcolor=Theme.FOREGROUND, axis='x', rotation=45)
+    ax.tick_params(colors=Theme.FOREGROUND, labelcolor=Theme.FOREGROUND, axis='y')
+    for spine in ax.spines.values():
+        spine.set_edgecolor(Theme.BORDER)
+    ax.patch.set_alpha(0)
+    canvas.fig.subplots_adjust(bottom=0.25)
+    canvas.draw()
+
+
+def rebuild_pie(canvas, type_dist):
+    # Dashboard.plot_pie_chart before the in-place charts
+    values = list(type_dist.values())
+    ax = canvas.axes
+    ax.clear()
+    _, texts, autotexts = ax.pie(
+        values, labels=list(type_dist.keys()), autopct='%1.1f%%',
+        colors=[PIE_COLORS[i % len(PIE_COLORS)] for i in range(len(values))],
+        textprops={'color': Theme.FOREGROUND},
+        wedgeprops={'edgecolor': Theme.CARD, 'linewidth': 1}
+    )
+    for text in texts:
+        text.set_color(Theme.FOREGROUND)
+        text.set_fontsize(9)
+    for autotext in autotexts:
+        autotext.set_color("#ffffff")
+        autotext.set_fontweight('bold')
+    ax.set_title("Type Share", color=Theme.FOREGROUND, fontsize=12, fontweight='bold')
+    canvas.draw()
+
+
+def make_batches(n_batches, n_types, rng):
+    types = [f"Type-{i:02d}" for i in range(n_types)]
+    base = rng.integers(20, 200, n_types)
+    return [
+        {t: int(v) for t, v in zip(types, np.maximum(1, base + rng.integers(-15, 16, n_types)))}
+        for _ in range(n_batches)
+    ]
+
+
+def run(update, batches, order):
+    frames = []
+    for i in order:
+        start = time.perf_counter()
+        update(batches[i])
+        frames.append((time.perf_counter() - start) * 1000)
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--switches', type=int, default=50)
+    parser.add_argument('--batches', type=int, default=5, help="Distinct batches switched between")
+    parser.add_argument('--types', type=int, nargs='+', default=[6, 40], help="Equipment types per batch")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{args.switches} batch switches among {args.batches} batches, bar + pie, Agg")
+    print(f"{'types':>6}{'charts':>10}{'total ms':>10}{'median':>9}{'p95':>9}{'max':>9}{'  draws':>7}")
+    for n_types in args.types:
+        batches = make_batches(args.batches, n_types, rng)
+        order = rng.integers(0, args.batches, args.switches)
+
+        old_bar, old_pie = AggCanvas(), AggCanvas()
+        rebuild_bar(old_bar, batches[0])
+        rebuild_pie(old_pie, batches[0])
+        old = run(lambda d: (rebuild_bar(old_bar, d), rebuild_pie(old_pie, d)), batches, order)
+
+        new_bar, new_pie = AggCanvas(), AggCanvas()
+        bar, pie = BarChart(new_bar), PieChart(new_pie)
+        bar.update(batches[0])
+        pie.update(batches[0])
+        bar.full_draws = pie.full_draws = 0
+        new = run(lambda d: (bar.update(d), pie.update(d)), batches, order)
+
+        for name, frames, draws in (
+            ("rebuild", old, f"{2 * args.switches}"),
+            ("in place", new, f"{bar.full_draws + pie.full_draws}"),
+        ):
+            frames_sorted = sorted(frames)
+            print(
+                f"{n_types:>6}{name:>10}{sum(frames):>10.1f}{statistics.median(frames):>9.2f}"
+                f"{frames_sorted[int(len(frames) * 0.95) - 1]:>9.2f}{max(frames):>9.2f}{draws:>7}"
+            )
+    print("draws = full figure draws; the rest of the in-place updates were blits or skipped")
+
+
+if __name__ == '__main__':
+    main()
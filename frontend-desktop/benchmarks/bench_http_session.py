@@ -0,0 +1,146 @@
+"""
+Round-trip latency of the dashboard's history-then-stats load sequence
+(GET /api/upload/ then GET /api/batch/<id>/), made the old way with a new
+connection per call (module-level requests.get) and through APIClient's
+pooled keep-alive session.
+
+By default it runs against a local stub server. --connect-delay makes the
+stub wait before serving each new connection, standing in for the TCP/TLS
+handshake to a remote server; point --url at a real backend (with --user
+and --password) to measure that instead.
+
+    python benchmarks/bench_http_session.py --rounds 200 --connect-delay 20
+    python benchmarks/bench_http_session.py --url https://example.com --user u --password p
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from api_client import APIClient  # noqa: E402
+
+HISTORY = [
+    {"id": 5 - i, "filename": f"sample_{i}.csv", "uploaded_at": "2026-01-01T00:00:00Z", "equipment_count": 15}
+    for i in range(5)
+]
+STATS = {
+    "batch_id": 5,
+    "statistics": {
+        "total_count": 15,
+        "average_flowrate": 119.8,
+        "average_pressure": 6.1,
+        "average_temperature": 117.5,
+        "type_distribution": {"Pump": 4, "Valve": 3, "Compressor": 2, "Reactor": 2, "HeatExchanger": 2, "Condenser": 2},
+    },
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive needs HTTP/1.1
+    protocol_version = 'HTTP/1.1'
+    connect_delay = 0.0
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+        time.sleep(self.connect_delay)
+
+    def do_GET(self):
+        body = json.dumps(HISTORY if self.path.startswith('/api/upload/') else STATS).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def per_call(base_url, auth, batch_id):
+    # What every APIClient method used to do
+    requests.get(f"{base_url}/api/upload/", auth=auth, timeout=10).json()
+    requests.get(f"{base_url}/api/batch/{batch_id}/", auth=auth, timeout=10).json()
+
+
+def pooled(client, batch_id):
+    # Empty the response cache first, so every round goes over the network
+    client.cache.clear()
+    client.get_recent_uploads()
+    client.get_batch_stats(batch_id)
+
+
+def measure(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=100)
+    parser.add_argument('--connect-delay', type=float, default=0.0,
+                        help="Stub server only: ms to wait on every new connection")
+    parser.add_argument('--url', help="Benchmark this server instead of the stub")
+    parser.add_argument('--user')
+    parser.add_argument('--password')
+    parser.add_argument('--batch', type=int, default=5, help="Batch id whose stats are fetched")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        StubHandler.connect_delay = args.connect_delay / 1000
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+    # In-memory cache only: nothing is written to ~/.cache by a benchmark
+    client = APIClient(cache_path='')
+    client.base_url = base_url
+    auth = None
+    if args.user:
+        auth = (args.user, args.password)
+        client.set_credentials(*auth)
+
+    try:
+        # Warm up both paths (DNS, imports, the pool's first connection)
+        per_call(base_url, auth, args.batch)
+        pooled(client, args.batch)
+
+        print(f"{base_url}, {args.rounds} rounds of history + stats")
+        print(f"{'client':>22}{'median ms':>12}{'p95 ms':>10}{'connections':>13}")
+        results = {}
+        for name, fn in (
+            ("connection per call", lambda: per_call(base_url, auth, args.batch)),
+            ("pooled session", lambda: pooled(client, args.batch)),
+        ):
+            opened = StubHandler.connections
+            median, p95 = measure(fn, args.rounds)
+            results[name] = median
+            connections = str(StubHandler.connections - opened) if server else "-"
+            print(f"{name:>22}{median:>12.2f}{p95:>10.2f}{connections:>13}")
+
+        saved = results["connection per call"] - results["pooled session"]
+        print(f"saved per load: {saved:.2f} ms ({saved / results['connection per call']:.0%})")
+    finally:
+        client.close()
+        if server:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,13 @@
-from importlib.resources import files
 import sys
 import os
+
+# First, so --profile-startup times every import after it
+import startup
+sys.argv = startup.enable_profiling(sys.argv)
+
+from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication
+# Light: the dashboard (and matplotlib with it) is only imported after login
 from ui.main_window import MainWindow
 
 
@@ -13,7 +19,7 @@ def main():
         QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
 
     app = QApplication(sys.argv)
-    
+
     # Load Stylesheet
     style_path = os.path.join(os.path.dirname(__file__), "ui", "styles.qss")
     if os.path.exists(style_path):
@@ -24,11 +30,11 @@ def main():
 
     window = MainWindow()
     window.show()
-    
+    startup.mark("main window shown")
+
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
     # Needed for import resolution if running from inside the folder
     sys.path.append(os.path.dirname(__file__))
-    from PyQt5.QtCore import Qt # Import here to ensure context is ready
     main()
@@ -0,0 +1,121 @@
+"""
+LRU cache of GET responses for APIClient, optionally persisted to a JSON
+file so a restarted app starts warm.
+
+Each entry keeps the decoded body with the validators the server sent
+(ETag, Last-Modified) and until when the body may be reused without asking
+(from Cache-Control max-age). Fresh entries are answered with no request;
+stale ones are revalidated with a conditional GET, which costs a 304 and no
+body when nothing changed.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+def freshness(headers):
+    """
+    Seconds a response may be reused without revalidating, or None if it
+    must not be stored at all (Cache-Control: no-store).
+    """
+    cache_control = headers.get('Cache-Control', '').lower()
+    if 'no-store' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return 0
+    match = MAX_AGE_RE.search(cache_control)
+    return int(match.group(1)) if match else 0
+
+
+class ResponseCache:
+    """Thread-safe LRU of {key: entry}; the UI's worker threads share one."""
+
+    def __init__(self, max_entries=256, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body, etag=None, last_modified=None, max_age=0):
+        entry = {
+            "body": body,
+            "etag": etag,
+            "last_modified": last_modified,
+            "expires": time.time() + max_age,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        return entry
+
+    def refresh(self, key, max_age):
+        """The server confirmed the entry (304): reuse it for max_age more seconds."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["expires"] = time.time() + max_age
+                self._dirty = True
+            return entry
+
+    @staticmethod
+    def is_fresh(entry):
+        return entry["expires"] > time.time()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            # No cache yet, or a damaged one: start cold
+            return
+        with self._lock:
+            for key, entry in entries[-self.max_entries:]:
+                self._entries[key] = entry
+
+    def save(self):
+        """Write the entries, least recently used first, if anything changed."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = list(self._entries.items())
+            self._dirty = False
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        # Written aside and renamed, so a crash never leaves half a file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
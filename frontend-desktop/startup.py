@@ -0,0 +1,109 @@
+"""
+Startup helpers: background warm-up of the plotting stack, and an optional
+import-time profile (python main.py --profile-startup).
+
+Only the login dialog is needed at launch. The dashboard's heavy imports
+(matplotlib, its font cache, NumPy) are done by warm_up_plotting() on a
+background thread while the user types their credentials, so building the
+dashboard after login finds them already loaded.
+"""
+import builtins
+import sys
+import threading
+import time
+from collections import defaultdict
+
+PROFILE_FLAG = '--profile-startup'
+
+_start = time.perf_counter()
+_profile = None
+
+
+class ImportProfile:
+    """
+    Times imports by wrapping builtins.__import__. Each top-level package is
+    charged its own time only: a nested import is charged to its package and
+    subtracted from the importer's.
+    """
+
+    def __init__(self):
+        self.self_times = defaultdict(float)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            # Relative or already loaded: nothing worth timing
+            return self._import(name, globals, locals, fromlist, level)
+
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)  # time spent in nested imports
+        start = time.perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            with self._lock:
+                self.self_times[name.partition('.')[0]] += elapsed - nested
+            if stack:
+                stack[-1] += elapsed
+
+    def take(self):
+        """The times recorded since the last take(), and reset them."""
+        with self._lock:
+            times, self.self_times = self.self_times, defaultdict(float)
+        return times
+
+
+def enable_profiling(argv):
+    """Start profiling if argv has --profile-startup; returns argv without it."""
+    global _profile
+    if PROFILE_FLAG in argv:
+        _profile = ImportProfile()
+        argv = [arg for arg in argv if arg != PROFILE_FLAG]
+    return argv
+
+
+def mark(label):
+    """Print the time since launch and what was imported since the last mark (when profiling)."""
+    if _profile is None:
+        return
+    times = _profile.take()
+    print(f"[startup] {time.perf_counter() - _start:7.3f}s  {label}  (imports: {sum(times.values()):.3f}s)")
+    for package, seconds in sorted(times.items(), key=lambda item: -item[1])[:12]:
+        if seconds >= 0.001:
+            print(f"[startup]            {seconds:7.3f}s  {package}")
+
+
+def _warm_up():
+    start = time.perf_counter()
+    try:
+        import numpy  # noqa: F401
+        import matplotlib
+        from matplotlib import font_manager
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        import matplotlib.ticker  # noqa: F401
+
+        # Loads (or on first run builds) the font cache, then renders some text
+        # off-screen so the default font is opened and its glyphs cached
+        font_manager.findfont(matplotlib.rcParams['font.family'][0])
+        fig = Figure(figsize=(1, 1))
+        fig.text(0.5, 0.5, "0.0%")
+        FigureCanvasAgg(fig).draw()
+    except Exception as e:
+        # Only a head start: the dashboard imports all of this itself anyway
+        print(f"Plot warm-up failed: {e}")
+        return
+    if _profile is not None:
+        print(f"[startup] plotting warm-up finished in {time.perf_counter() - start:.3f}s (background)")
+
+
+def warm_up_plotting():
+    """Import and prime matplotlib on a daemon thread; returns the thread."""
+    thread = threading.Thread(target=_warm_up, name='plot-warm-up', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,177 @@
+"""
+Bar and pie charts of the type distribution that update in place.
+
+Rebuilding a chart (axes.clear(), new artists, styling, full draw) on every
+batch switch gets slow with many types. These charts create their artists
+once and, when the same types come back, only move them: bar heights, wedge
+angles and label positions. The artists are "animated", so a full draw
+leaves them out; the background under them is saved after each full draw
+and an update just restores it, draws the artists on top and blits. A full
+(idle) draw happens only when the layout changes: different types, or a
+new y-axis limit. A distribution identical to the one on screen is not
+redrawn at all.
+
+Only matplotlib is used here, so the charts also run on a plain Agg canvas
+(see benchmarks/bench_chart_updates.py). A canvas needs .fig and .axes.
+"""
+from abc import ABC, abstractmethod
+
+import numpy as np
+from matplotlib.ticker import MaxNLocator
+
+from theme import Theme
+
+PIE_COLORS = [
+    Theme.CHART_1, Theme.CHART_2, Theme.CHART_3, Theme.CHART_4, Theme.CHART_5,
+    Theme.CHART_6, Theme.CHART_7, Theme.CHART_8, Theme.CHART_9, Theme.CHART_10
+]
+# matplotlib's pie() defaults, which in-place updates have to reproduce
+LABEL_DISTANCE = 1.1
+PCT_DISTANCE = 0.6
+
+
+class BlitChart(ABC):
+    """Draws a set of animated artists over a saved background."""
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.fig = canvas.fig
+        self.axes = canvas.axes
+        self.artists = []
+        self._data = None
+        self._background = None
+        self.full_draws = 0
+        self.blits = 0
+        canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        # After every full draw (first show, resize, layout change)
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in self.artists:
+            self.fig.draw_artist(artist)
+
+    def update(self, type_dist):
+        """
+        Show ``type_dist`` ({type: count}). Returns False if it is what the
+        chart already shows, in which case nothing is drawn.
+        """
+        data = tuple(type_dist.items())
+        if data == self._data:
+            return False
+        self._data = data
+        labels = [label for label, _ in data]
+        values = [value for _, value in data]
+
+        if self._apply(labels, values) or self._background is None or not self.canvas.supports_blit:
+            self.full_draws += 1
+            self.canvas.draw_idle()
+        else:
+            self.blits += 1
+            self.canvas.restore_region(self._background)
+            self._draw_artists()
+            self.canvas.blit(self.fig.bbox)
+        return True
+
+    @abstractmethod
+    def _apply(self, labels, values):
+        """Update the artists; return True if the layout changed and needs a full draw."""
+
+
+class BarChart(BlitChart):
+    def __init__(self, canvas):
+        super().__init__(canvas)
+        self._bars = None
+        self._labels = None
+
+        ax = self.axes
+        ax.set_title("Count per Type", color=Theme.FOREGROUND, fontsize=12, fontweight='bold')
+        ax.tick_params(colors=Theme.FOREGROUND, labelcolor=Theme.FOREGROUND, axis='x', rotation=45)
+        ax.tick_params(colors=Theme.FOREGROUND, labelcolor=Theme.FOREGROUND, axis='y')
+        for spine in ax.spines.values():
+            spine.set_edgecolor(Theme.BORDER)
+        ax.patch.set_alpha(0)
+        self.fig.subplots_adjust(bottom=0.25)
+
+    @staticmethod
+    def _y_limit(values):
+        # Rounded up to a tick, so batches of similar size share a y-axis and can be blitted
+        return MaxNLocator(nbins=6, steps=[1, 2, 2.5, 5, 10]).tick_values(0, max(values, default=0) * 1.05 or 1)[-1]
+
+    def _apply(self, labels, values):
+        top = self._y_limit(values)
+        if labels == self._labels:
+            for bar, value in zip(self._bars, values):
+                bar.set_height(value)
+            if top == self.axes.get_ylim()[1]:
+                return False
+            self.axes.set_ylim(0, top)
+            return True
+
+        if self._bars is not None:
+            self._bars.remove()
+        # Numeric positions: categorical units would keep every type ever shown on the axis
+        x = np.arange(len(labels))
+        self._bars = self.axes.bar(x, values, color=Theme.CHART_1, alpha=0.9, animated=True)
+        self._labels = labels
+        self.artists = list(self._bars)
+        self.axes.set_xticks(x, labels)
+        self.axes.set_xlim(-0.6, len(labels) - 0.4)
+        self.axes.set_ylim(0, top)
+        return True
+
+
+class PieChart(BlitChart):
+    def __init__(self, canvas):
+        super().__init__(canvas)
+        self._wedges = []
+        self._texts = []
+        self._autotexts = []
+        self._labels = None
+        self.axes.set_title("Type Share", color=Theme.FOREGROUND, fontsize=12, fontweight='bold')
+
+    def _apply(self, labels, values):
+        total = sum(values)
+        if labels == self._labels and total:
+            angle = 0.0
+            for wedge, text, autotext, value in zip(self._wedges, self._texts, self._autotexts, values):
+                span = 360.0 * value / total
+                wedge.set_theta1(angle)
+                wedge.set_theta2(angle + span)
+                mid = np.deg2rad(angle + span / 2)
+                x, y = np.cos(mid), np.sin(mid)
+                text.set_position((LABEL_DISTANCE * x, LABEL_DISTANCE * y))
+                text.set_horizontalalignment('left' if x > 0 else 'right')
+                autotext.set_position((PCT_DISTANCE * x, PCT_DISTANCE * y))
+                autotext.set_text(f"{100.0 * value / total:.1f}%")
+                angle += span
+            return False
+
+        for artist in self.artists:
+            artist.remove()
+        self.artists = []
+        self._labels = labels
+        if not total:
+            self._wedges, self._texts, self._autotexts = [], [], []
+            return True
+
+        colors = [PIE_COLORS[i % len(PIE_COLORS)] for i in range(len(values))]
+        self._wedges, self._texts, self._autotexts = self.axes.pie(
+            values, labels=labels, autopct='%1.1f%%',
+            colors=colors,
+            labeldistance=LABEL_DISTANCE, pctdistance=PCT_DISTANCE,
+            textprops={'color': Theme.FOREGROUND},
+            wedgeprops={'edgecolor': Theme.CARD, 'linewidth': 1}
+        )
+        for text in self._texts:
+            text.set_color(Theme.FOREGROUND)
+            text.set_fontsize(9)
+        for autotext in self._autotexts:
+            autotext.set_color("#ffffff")
+            autotext.set_fontweight('bold')
+        self.artists = [*self._wedges, *self._texts, *self._autotexts]
+        for artist in self.artists:
+            artist.set_animated(True)
+        return True
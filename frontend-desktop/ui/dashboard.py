@@ -1,7 +1,7 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QFrame, 
     QSizePolicy, QFileDialog, QMessageBox, QScrollArea, QListWidget,
-    QListWidgetItem
+    QListWidgetItem, QComboBox, QProgressBar
 )
 from PyQt5.QtCore import Qt, QSize
 from PyQt5.QtGui import QColor, QFont
@@ -10,11 +10,12 @@ import matplotlib
 matplotlib.use('Qt5Agg')
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-import numpy as np
 
 from theme import Theme
 from ui.components import Card, ModernButton
+from ui.charts import BarChart, PieChart
 from api_client import APIClient
+from ui.workers import RequestRunner
 
 class MplCanvas(FigureCanvas):
     def __init__(self, parent=None, width=5, height=4, dpi=100):
@@ -49,6 +50,10 @@ class Dashboard(QWidget):
         self.api_client = api_client if api_client else APIClient()
         self.stats = None
         self.batch_id = None  # Store batch_id for PDF export
+        # Every API call runs on here, never on the GUI thread
+        self.runner = RequestRunner(self)
+        self.upload_worker = None
+        self.pdf_worker = None
         
         # Main Layout (Scrollable)
         main_layout = QVBoxLayout(self)
@@ -69,6 +74,8 @@ class Dashboard(QWidget):
         self.setup_upload_section()
         self.setup_stats_section()
         self.setup_charts_section()
+        self.setup_distribution_section()
+        self.setup_trends_section()
         self.setup_recent_uploads_section()
         
         self.layout.addStretch()
@@ -186,7 +193,7 @@ class Dashboard(QWidget):
                 background-color: #5fd69a;
             }}
         """)
-        self.upload_btn.clicked.connect(self.browse_file)
+        self.upload_btn.clicked.connect(self.on_upload_clicked)
         
         # Export PDF Button
         self.pdf_btn = ModernButton("Export PDF", is_primary=False)
@@ -211,19 +218,32 @@ class Dashboard(QWidget):
                 color: #a0a0a0;
             }}
         """)
-        self.pdf_btn.clicked.connect(self.download_pdf)
+        self.pdf_btn.clicked.connect(self.on_pdf_clicked)
         
         btn_container.addStretch()
         btn_container.addWidget(self.upload_btn)
         btn_container.addWidget(self.pdf_btn)
         btn_container.addStretch()
-        
+
+        # Upload/export progress, shown while a transfer is running
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setFixedWidth(335)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setVisible(False)
+        self.progress_lbl = QLabel("")
+        self.progress_lbl.setStyleSheet(f"color: {Theme.MUTED}; background: transparent;")
+        self.progress_lbl.setAlignment(Qt.AlignCenter)
+        self.progress_lbl.setVisible(False)
+
         layout.addWidget(icon_lbl)
         layout.addWidget(title_lbl)
         layout.addWidget(desc_lbl)
         layout.addSpacing(15)
         layout.addLayout(btn_container)
-        
+        layout.addSpacing(10)
+        layout.addWidget(self.progress_bar, 0, Qt.AlignCenter)
+        layout.addWidget(self.progress_lbl)
+
         self.layout.addWidget(self.upload_card)
 
     def setup_stats_section(self):
@@ -261,6 +281,7 @@ class Dashboard(QWidget):
         bar_layout.addWidget(bar_header)
         
         self.bar_canvas = MplCanvas(self, width=5, height=4)
+        self.bar_chart = BarChart(self.bar_canvas)
         bar_layout.addWidget(self.bar_canvas)
         
         # 2. Pie Chart (Share)
@@ -272,6 +293,7 @@ class Dashboard(QWidget):
         pie_layout.addWidget(pie_header)
         
         self.pie_canvas = MplCanvas(self, width=5, height=4)
+        self.pie_chart = PieChart(self.pie_canvas)
         pie_layout.addWidget(self.pie_canvas)
         
         charts_layout.addWidget(bar_frame)
@@ -280,6 +302,56 @@ class Dashboard(QWidget):
         self.charts_container.setVisible(False)
         self.layout.addWidget(self.charts_container)
 
+    def setup_distribution_section(self):
+        """Histograms and percentiles of each parameter, overall or per type."""
+        self.distribution_frame = QFrame()
+        self.distribution_frame.setProperty("class", "Card")
+        layout = QVBoxLayout(self.distribution_frame)
+
+        header_layout = QHBoxLayout()
+        header = QLabel("Parameter Distributions")
+        header.setProperty("class", "CardTitle")
+        header_layout.addWidget(header)
+        header_layout.addStretch()
+
+        self.distribution_type_combo = QComboBox()
+        self.distribution_type_combo.currentIndexChanged.connect(self.plot_distributions)
+        header_layout.addWidget(self.distribution_type_combo)
+        layout.addLayout(header_layout)
+
+        self.distribution_canvas = MplCanvas(self, width=12, height=3.5)
+        self.distribution_canvas.setMinimumHeight(300)
+        layout.addWidget(self.distribution_canvas)
+
+        self.distribution_frame.setVisible(False)
+        self.layout.addWidget(self.distribution_frame)
+
+    def setup_trends_section(self):
+        """Drift of one parameter across uploads, from a single /api/trends/ request."""
+        self.trends_frame = QFrame()
+        self.trends_frame.setProperty("class", "Card")
+        layout = QVBoxLayout(self.trends_frame)
+
+        header_layout = QHBoxLayout()
+        header = QLabel("Trends Across Uploads")
+        header.setProperty("class", "CardTitle")
+        header_layout.addWidget(header)
+        header_layout.addStretch()
+
+        self.trend_param_combo = QComboBox()
+        for label, param in (("Flowrate", "flowrate"), ("Pressure", "pressure"), ("Temperature", "temperature")):
+            self.trend_param_combo.addItem(label, param)
+        self.trend_param_combo.currentIndexChanged.connect(self.load_trends)
+        header_layout.addWidget(self.trend_param_combo)
+        layout.addLayout(header_layout)
+
+        self.trend_canvas = MplCanvas(self, width=12, height=3)
+        self.trend_canvas.setMinimumHeight(260)
+        layout.addWidget(self.trend_canvas)
+
+        self.trends_frame.setVisible(False)
+        self.layout.addWidget(self.trends_frame)
+
     def setup_recent_uploads_section(self):
         """Setup the recent uploads section showing last 5 uploads."""
         self.recent_uploads_frame = QFrame()
@@ -327,40 +399,43 @@ class Dashboard(QWidget):
 
     def load_recent_uploads(self):
         """Fetch and display recent uploads."""
-        try:
-            uploads = self.api_client.get_recent_uploads()
-            self.recent_uploads_list.clear()
+        self.load_trends()
+        self.runner.submit(
+            self.api_client.get_recent_uploads, key="recent",
+            on_result=self.show_recent_uploads,
+            on_error=lambda e: print(f"Failed to load recent uploads: {e}")
+        )
+
+    def show_recent_uploads(self, uploads):
+        self.recent_uploads_list.clear()
+        
+        if not uploads:
+            item = QListWidgetItem("No recent uploads")
+            item.setFlags(item.flags() & ~Qt.ItemIsSelectable)
+            self.recent_uploads_list.addItem(item)
+            return
+        
+        for upload in uploads:
+            filename = upload.get('filename', 'Unknown')
+            uploaded_at = upload.get('uploaded_at', '')
+            equipment_count = upload.get('equipment_count', 0)
+            batch_id = upload.get('id')
             
-            if not uploads:
-                item = QListWidgetItem("No recent uploads")
-                item.setFlags(item.flags() & ~Qt.ItemIsSelectable)
-                self.recent_uploads_list.addItem(item)
-                return
+            # Format the date
+            if uploaded_at:
+                from datetime import datetime
+                try:
+                    dt = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
+                    date_str = dt.strftime('%Y-%m-%d %H:%M')
+                except:
+                    date_str = uploaded_at[:16]
+            else:
+                date_str = 'Unknown date'
             
-            for upload in uploads:
-                filename = upload.get('filename', 'Unknown')
-                uploaded_at = upload.get('uploaded_at', '')
-                equipment_count = upload.get('equipment_count', 0)
-                batch_id = upload.get('id')
-                
-                # Format the date
-                if uploaded_at:
-                    from datetime import datetime
-                    try:
-                        dt = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
-                        date_str = dt.strftime('%Y-%m-%d %H:%M')
-                    except:
-                        date_str = uploaded_at[:16]
-                else:
-                    date_str = 'Unknown date'
-                
-                item_text = f"📄 {filename}  •  {date_str}  •  {equipment_count} items"
-                item = QListWidgetItem(item_text)
-                item.setData(Qt.UserRole, batch_id)  # Store batch_id
-                self.recent_uploads_list.addItem(item)
-                
-        except Exception as e:
-            print(f"Failed to load recent uploads: {e}")
+            item_text = f"📄 {filename}  •  {date_str}  •  {equipment_count} items"
+            item = QListWidgetItem(item_text)
+            item.setData(Qt.UserRole, batch_id)  # Store batch_id
+            self.recent_uploads_list.addItem(item)
 
     def on_recent_upload_clicked(self, item):
         """Handle click on a recent upload item."""
@@ -370,14 +445,27 @@ class Dashboard(QWidget):
 
     def load_batch_stats(self, batch_id):
         """Load statistics for a specific batch."""
-        try:
-            data = self.api_client.get_batch_stats(batch_id)
-            self.batch_id = batch_id
-            self.stats = data.get("statistics", {})
-            self.update_ui_with_stats()
-            self.pdf_btn.setEnabled(True)
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to load batch data:\n{str(e)}")
+        # Keyed, so clicking through the list only ever shows the last batch clicked
+        self.runner.submit(
+            self.api_client.get_batch_stats, batch_id, key="batch",
+            on_result=lambda data: self.show_batch(batch_id, data),
+            on_error=lambda e: QMessageBox.warning(self, "Error", f"Failed to load batch data:\n{str(e)}")
+        )
+
+    def show_batch(self, batch_id, data):
+        self.batch_id = batch_id
+        self.stats = data.get("statistics", {})
+        self.update_ui_with_stats()
+        self.pdf_btn.setEnabled(True)
+
+    def on_upload_clicked(self):
+        # The upload button doubles as the cancel button while uploading
+        if self.upload_worker is not None:
+            self.upload_worker.cancel()
+            self.upload_btn.setEnabled(False)
+            self.progress_lbl.setText("Cancelling...")
+        else:
+            self.browse_file()
 
     def browse_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Open CSV File", "", "CSV Files (*.csv)")
@@ -385,22 +473,38 @@ class Dashboard(QWidget):
             self.upload_file(file_path)
 
     def upload_file(self, file_path):
-        self.upload_btn.setText("Processing...")
-        self.upload_btn.setEnabled(False)
-        
-        try:
-            data = self.api_client.upload_csv(file_path)
-            self.batch_id = data.get("batch_id")
-            self.stats = data.get("statistics", {})
-            self.update_ui_with_stats()
-            self.pdf_btn.setEnabled(True)
-            self.load_recent_uploads()  # Refresh recent uploads
-            QMessageBox.information(self, "Success", "File uploaded and processed successfully!")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to upload file:\n{str(e)}")
-        finally:
-            self.upload_btn.setText("Upload CSV")
-            self.upload_btn.setEnabled(True)
+        self.upload_btn.setText("Cancel Upload")
+        self.show_progress("Preparing...")
+        self.upload_worker = self.runner.submit(
+            self.api_client.upload_csv, file_path, cancellable=True,
+            on_progress=self.on_transfer_progress,
+            on_result=self.on_upload_done,
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"Failed to upload file:\n{str(e)}"),
+            on_cancelled=lambda: self.progress_lbl.setText("Upload cancelled"),
+            on_finished=self.on_upload_finished
+        )
+
+    def on_upload_done(self, data):
+        self.batch_id = data.get("batch_id")
+        self.stats = data.get("statistics", {})
+        self.update_ui_with_stats()
+        self.pdf_btn.setEnabled(True)
+        self.load_recent_uploads()  # Refresh recent uploads
+        QMessageBox.information(self, "Success", "File uploaded and processed successfully!")
+
+    def on_upload_finished(self):
+        self.upload_worker = None
+        self.upload_btn.setText("Upload CSV")
+        self.upload_btn.setEnabled(True)
+        self.hide_progress()
+
+    def on_pdf_clicked(self):
+        if self.pdf_worker is not None:
+            self.pdf_worker.cancel()
+            self.pdf_btn.setEnabled(False)
+            self.progress_lbl.setText("Cancelling...")
+        else:
+            self.download_pdf()
 
     def download_pdf(self):
         """Download PDF report for the current batch."""
@@ -419,17 +523,55 @@ class Dashboard(QWidget):
         if not save_path:
             return
         
-        self.pdf_btn.setText("Exporting...")
-        self.pdf_btn.setEnabled(False)
-        
-        try:
-            self.api_client.download_pdf(self.batch_id, save_path)
-            QMessageBox.information(self, "Success", f"PDF report saved to:\n{save_path}")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to download PDF:\n{str(e)}")
-        finally:
-            self.pdf_btn.setText("Export PDF")
-            self.pdf_btn.setEnabled(True)
+        self.pdf_btn.setText("Cancel Export")
+        self.show_progress("Generating report...")
+        self.pdf_worker = self.runner.submit(
+            self.api_client.download_pdf, self.batch_id, save_path, cancellable=True,
+            on_progress=self.on_transfer_progress,
+            on_result=lambda _: QMessageBox.information(self, "Success", f"PDF report saved to:\n{save_path}"),
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"Failed to download PDF:\n{str(e)}"),
+            on_finished=self.on_pdf_finished
+        )
+
+    def on_pdf_finished(self):
+        self.pdf_worker = None
+        self.pdf_btn.setText("Export PDF")
+        self.pdf_btn.setEnabled(True)
+        self.hide_progress()
+
+    def show_progress(self, text):
+        self.progress_bar.setRange(0, 0)  # Busy until the first progress report
+        self.progress_bar.setVisible(True)
+        self.progress_lbl.setText(text)
+        self.progress_lbl.setVisible(True)
+
+    def hide_progress(self):
+        # An upload and an export can overlap; keep the bar while either runs
+        if self.upload_worker is None and self.pdf_worker is None:
+            self.progress_bar.setVisible(False)
+            self.progress_lbl.setVisible(False)
+
+    def on_transfer_progress(self, progress):
+        phase, done, total = progress
+        labels = {"compress": "Compressing", "upload": "Uploading", "download": "Downloading"}
+        if phase == "upload" and total and done >= total:
+            # Every byte is sent; the server is parsing now
+            self.progress_bar.setRange(0, 0)
+            self.progress_lbl.setText("Processing...")
+        elif total:
+            # Scaled to 0-1000: QProgressBar takes ints, and files may pass 2 GB
+            self.progress_bar.setRange(0, 1000)
+            self.progress_bar.setValue(int(done * 1000 / total))
+            self.progress_lbl.setText(
+                f"{labels.get(phase, phase)}... {done / 1e6:.1f} of {total / 1e6:.1f} MB"
+            )
+        else:
+            self.progress_bar.setRange(0, 0)
+            self.progress_lbl.setText(f"{labels.get(phase, phase)}... {done / 1e6:.1f} MB")
+
+    def shutdown(self):
+        """Cancel running requests; called when the window closes."""
+        self.runner.shutdown()
 
     def update_ui_with_stats(self):
         if not self.stats:
@@ -451,62 +593,100 @@ class Dashboard(QWidget):
         self.stats_container.setVisible(True)
         self.charts_container.setVisible(True)
         
-        # 3. Charts
-        self.plot_bar_chart(type_dist)
-        self.plot_pie_chart(type_dist)
+        # 3. Charts (updated in place; an unchanged distribution isn't redrawn)
+        self.bar_chart.update(type_dist)
+        self.pie_chart.update(type_dist)
 
-    def plot_bar_chart(self, type_dist):
-        labels = list(type_dist.keys())
-        values = list(type_dist.values())
-        
-        self.bar_canvas.axes.clear()
-        
-        TEXT_COLOR = Theme.FOREGROUND 
-        
-        self.bar_canvas.axes.bar(labels, values, color=Theme.CHART_1, alpha=0.9)
-        self.bar_canvas.axes.set_title("Count per Type", color=TEXT_COLOR, fontsize=12, fontweight='bold')
-        self.bar_canvas.axes.tick_params(colors=TEXT_COLOR, labelcolor=TEXT_COLOR, axis='x', rotation=45)
-        self.bar_canvas.axes.tick_params(colors=TEXT_COLOR, labelcolor=TEXT_COLOR, axis='y')
-        
-        # Style spines
-        for spine in self.bar_canvas.axes.spines.values():
-            spine.set_edgecolor(Theme.BORDER)
-            
-        self.bar_canvas.axes.patch.set_alpha(0)
-        self.bar_canvas.fig.subplots_adjust(bottom=0.25)
-        
-        self.bar_canvas.draw()
+        # 4. Distributions (missing from very old servers)
+        distributions = self.stats.get("distributions")
+        self.distribution_frame.setVisible(bool(distributions))
+        if distributions:
+            self.distribution_type_combo.blockSignals(True)
+            self.distribution_type_combo.clear()
+            self.distribution_type_combo.addItem("All types", "")
+            for eq_type in distributions.get("by_type", {}):
+                self.distribution_type_combo.addItem(eq_type, eq_type)
+            self.distribution_type_combo.blockSignals(False)
+            self.plot_distributions()
+
+    def plot_distributions(self, *_):
+        distributions = (self.stats or {}).get("distributions")
+        if not distributions:
+            return
+
+        eq_type = self.distribution_type_combo.currentData()
+        source = distributions["by_type"].get(eq_type) if eq_type else distributions["overall"]
+        if not source:
+            return
 
-    def plot_pie_chart(self, type_dist):
-        labels = list(type_dist.keys())
-        values = list(type_dist.values())
-        
-        # React-matching color palette
-        colors = [
-            Theme.CHART_1, Theme.CHART_2, Theme.CHART_3, Theme.CHART_4, Theme.CHART_5,
-            Theme.CHART_6, Theme.CHART_7, Theme.CHART_8, Theme.CHART_9, Theme.CHART_10
-        ]
-        
-        color_map = [colors[i % len(colors)] for i in range(len(values))]
-        
-        self.pie_canvas.axes.clear()
-        
         TEXT_COLOR = Theme.FOREGROUND
-        
-        wedges, texts, autotexts = self.pie_canvas.axes.pie(
-            values, labels=labels, autopct='%1.1f%%',
-            colors=color_map,
-            textprops={'color': TEXT_COLOR},
-            wedgeprops={'edgecolor': Theme.CARD, 'linewidth': 1}
+        titles = {"flowrate": "Flowrate", "pressure": "Pressure", "temperature": "Temperature"}
+        percentile_colors = {"p50": Theme.CHART_2, "p95": Theme.CHART_4, "p99": Theme.CHART_6}
+
+        fig = self.distribution_canvas.fig
+        fig.clear()
+        for i, field in enumerate(titles):
+            summary = source.get(field)
+            # Per-type histograms use the overall bin edges
+            edges = distributions["overall"].get(field, {}).get("edges")
+            ax = fig.add_subplot(1, len(titles), i + 1)
+            ax.set_facecolor(Theme.CARD)
+            if not summary or not edges:
+                continue
+
+            ax.stairs(summary["histogram"], edges, fill=True, color=Theme.CHART_1, alpha=0.8)
+            for name, color in percentile_colors.items():
+                ax.axvline(summary[name], color=color, linestyle='--', linewidth=1, label=f"{name} {summary[name]}")
+
+            ax.set_title(f"{titles[field]}  (σ {summary['std']})", color=TEXT_COLOR, fontsize=10, fontweight='bold')
+            ax.tick_params(colors=TEXT_COLOR, labelcolor=TEXT_COLOR, labelsize=8)
+            for spine in ax.spines.values():
+                spine.set_edgecolor(Theme.BORDER)
+            ax.legend(fontsize=7, frameon=False, labelcolor=TEXT_COLOR)
+
+        fig.tight_layout()
+        self.distribution_canvas.draw()
+
+    def load_trends(self, *_):
+        param = self.trend_param_combo.currentData()
+        label = self.trend_param_combo.currentText()
+        self.runner.submit(
+            self.api_client.get_trends, param, key="trends",
+            on_result=lambda data: self.show_trends(data.get("points", []), label),
+            on_error=lambda e: print(f"Failed to load trends: {e}")
         )
-        
-        for text in texts:
-            text.set_color(TEXT_COLOR)
-            text.set_fontsize(9)
-            
-        for autotext in autotexts:
-            autotext.set_color("#ffffff")
-            autotext.set_fontweight('bold')
-        
-        self.pie_canvas.axes.set_title("Type Share", color=TEXT_COLOR, fontsize=12, fontweight='bold')
-        self.pie_canvas.draw()
+
+    def show_trends(self, points, label):
+        # A trend needs at least two uploads
+        self.trends_frame.setVisible(len(points) > 1)
+        if len(points) > 1:
+            self.plot_trends(points, label)
+
+    def plot_trends(self, points, label):
+        TEXT_COLOR = Theme.FOREGROUND
+        x = list(range(len(points)))
+        ax = self.trend_canvas.axes
+        ax.clear()
+
+        ax.plot(x, [p["mean"] for p in points], marker='o', color=Theme.CHART_1, label="mean")
+        # Percentile band, for batches whose statistics include distributions
+        banded = [i for i, p in enumerate(points) if p.get("p95") is not None]
+        if banded:
+            ax.fill_between(
+                banded,
+                [points[i]["p50"] for i in banded],
+                [points[i]["p95"] for i in banded],
+                color=Theme.CHART_2, alpha=0.15, label="p50–p95"
+            )
+            ax.plot(banded, [points[i]["p99"] for i in banded], linestyle=':', color=Theme.CHART_6, label="p99")
+
+        ax.set_xticks(x)
+        ax.set_xticklabels([f"#{p['batch_id']}" for p in points])
+        ax.set_title(f"{label} per Upload", color=TEXT_COLOR, fontsize=12, fontweight='bold')
+        ax.tick_params(colors=TEXT_COLOR, labelcolor=TEXT_COLOR)
+        for spine in ax.spines.values():
+            spine.set_edgecolor(Theme.BORDER)
+        ax.legend(fontsize=8, frameon=False, labelcolor=TEXT_COLOR)
+        ax.patch.set_alpha(0)
+
+        self.trend_canvas.draw()
@@ -5,6 +5,7 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont, QPalette, QColor
 from theme import Theme
+from ui.workers import RequestRunner
 
 
 class LoginDialog(QDialog):
@@ -14,6 +15,7 @@ class LoginDialog(QDialog):
         super().__init__(parent)
         self.api_client = api_client
         self.authenticated = False
+        self.runner = RequestRunner(self, max_threads=1)
         
         self.setWindowTitle("Login - Chemical Equipment Parameter Visualizer")
         self.setFixedSize(440, 500)
@@ -168,21 +170,35 @@ class LoginDialog(QDialog):
         self.login_btn.setText("Logging in...")
         self.login_btn.setEnabled(False)
         
-        try:
-            self.api_client.set_credentials(username, password)
-            
-            if self.api_client.test_auth():
-                self.authenticated = True
-                self.accept()
-            else:
-                QMessageBox.critical(self, "Login Failed", "Invalid username or password.")
-                self.api_client.clear_credentials()
-        except Exception as e:
-            QMessageBox.critical(self, "Connection Error", f"Could not connect to server:\n{str(e)}")
+        # Checked off the GUI thread, so the dialog keeps painting on a slow server
+        self.api_client.set_credentials(username, password)
+        self.runner.submit(
+            self.api_client.test_auth, key="login",
+            on_result=self.on_auth_result,
+            on_error=self.on_auth_error,
+            on_finished=self.on_auth_finished
+        )
+
+    def on_auth_result(self, ok):
+        if ok:
+            self.authenticated = True
+            self.accept()
+        else:
+            QMessageBox.critical(self, "Login Failed", "Invalid username or password.")
             self.api_client.clear_credentials()
-        finally:
-            self.login_btn.setText("Login")
-            self.login_btn.setEnabled(True)
+
+    def on_auth_error(self, e):
+        QMessageBox.critical(self, "Connection Error", f"Could not connect to server:\n{str(e)}")
+        self.api_client.clear_credentials()
+
+    def on_auth_finished(self):
+        self.login_btn.setText("Login")
+        self.login_btn.setEnabled(True)
+
+    def reject(self):
+        # Closing mid-check drops the pending answer
+        self.runner.cancel_all()
+        super().reject()
     
     def get_credentials(self):
         return (self.username_input.text().strip(), self.password_input.text())
@@ -2,9 +2,9 @@ from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, 
     QStackedWidget, QLabel, QFrame, QPushButton, QMessageBox
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
+import startup
 from theme import Theme
-from ui.dashboard import Dashboard
 from ui.components import SidebarButton
 from ui.login_dialog import LoginDialog
 from api_client import APIClient
@@ -47,18 +47,22 @@ class MainWindow(QMainWindow):
         if not hasattr(self, '_login_shown'):
             self._login_shown = True
             # Use a single-shot timer to show dialog after window is visible
-            from PyQt5.QtCore import QTimer
-            QTimer.singleShot(100, self.show_login_dialog)
+            QTimer.singleShot(0, self.show_login_dialog)
     
     def show_login_dialog(self):
         """Display login dialog and initialize dashboard on success."""
         login_dialog = LoginDialog(self.api_client, self)
+        # Runs once the dialog is up: load matplotlib while the user types
+        QTimer.singleShot(0, self.on_login_dialog_shown)
         result = login_dialog.exec_()
         
         if result == LoginDialog.Accepted and login_dialog.authenticated:
-            # Login successful - create and show dashboard
+            # Login successful - create and show dashboard. Imported only now;
+            # the warm-up has usually loaded its dependencies by this point
+            from ui.dashboard import Dashboard
             self.view_dashboard = Dashboard(api_client=self.api_client)
             self.content_layout.addWidget(self.view_dashboard)
+            startup.mark("dashboard built")
         else:
             # Login cancelled or failed - close the application
             QMessageBox.information(
@@ -67,3 +71,14 @@ class MainWindow(QMainWindow):
                 "Authentication is required to use this application."
             )
             self.close()
+
+    def on_login_dialog_shown(self):
+        startup.mark("login dialog shown")
+        startup.warm_up_plotting()
+
+    def closeEvent(self, event):
+        """Cancel in-flight requests so the worker threads don't outlive the window."""
+        if self.view_dashboard is not None:
+            self.view_dashboard.shutdown()
+        self.api_client.close()
+        super().closeEvent(event)
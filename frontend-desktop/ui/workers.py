@@ -0,0 +1,141 @@
+"""
+Background request layer for the desktop client.
+
+Every APIClient call runs on a QThreadPool worker so the GUI thread only
+ever paints. Results, errors and progress come back as Qt signals, which
+Qt delivers on the GUI thread, so slots may touch widgets directly.
+
+    runner = RequestRunner(parent_widget)
+    runner.submit(api_client.get_batch_stats, batch_id, key="batch",
+                  on_result=show_stats, on_error=show_error)
+
+Submitting with a ``key`` cancels the previous request with that key, so a
+slow answer can never overwrite a newer one (e.g. clicking quickly through
+the recent uploads list).
+"""
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from api_client import RequestCancelled
+
+# Progress is forwarded at most this often; a 1 GB upload reads ~16k blocks
+PROGRESS_INTERVAL = 1 / 30
+
+
+class WorkerSignals(QObject):
+    """Signals of one Worker. QRunnable isn't a QObject, so they live here."""
+    progress = pyqtSignal(object)   # (phase, done, total)
+    result = pyqtSignal(object)
+    error = pyqtSignal(object)      # the exception raised
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()         # always last, whatever the outcome
+
+
+class Worker(QRunnable):
+    """
+    Runs fn(*args, **kwargs) on a pool thread.
+
+    With cancellable=True, fn is also passed ``cancel`` (a threading.Event)
+    and ``on_progress`` (a (phase, done, total) callback), as the APIClient
+    upload and download methods accept. cancel() sets the event, and once
+    cancelled the worker emits neither result nor error.
+    """
+
+    def __init__(self, fn, *args, cancellable=False, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self.cancel_event = threading.Event()
+        self._last_progress = 0.0
+        if cancellable:
+            self.kwargs['cancel'] = self.cancel_event
+            self.kwargs['on_progress'] = self._report_progress
+
+    @property
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _report_progress(self, phase, done, total):
+        now = time.monotonic()
+        if now - self._last_progress >= PROGRESS_INTERVAL or done == total:
+            self._last_progress = now
+            self.signals.progress.emit((phase, done, total))
+
+    def run(self):
+        try:
+            if self.is_cancelled:
+                self.signals.cancelled.emit()
+                return
+            try:
+                result = self.fn(*self.args, **self.kwargs)
+            except RequestCancelled:
+                self.signals.cancelled.emit()
+            except Exception as e:
+                if self.is_cancelled:
+                    self.signals.cancelled.emit()
+                else:
+                    self.signals.error.emit(e)
+            else:
+                if self.is_cancelled:
+                    self.signals.cancelled.emit()
+                else:
+                    self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+class RequestRunner(QObject):
+    """Submits Workers to its own thread pool and keeps track of them."""
+
+    def __init__(self, parent=None, max_threads=4):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._active = set()
+        self._keyed = {}
+
+    def submit(self, fn, *args, key=None, on_result=None, on_error=None, on_progress=None,
+               on_cancelled=None, on_finished=None, cancellable=False, **kwargs):
+        """Run fn in the background and return its Worker (call .cancel() to stop it)."""
+        if key is not None and key in self._keyed:
+            self._keyed[key].cancel()
+
+        worker = Worker(fn, *args, cancellable=cancellable, **kwargs)
+        for signal, slot in (
+            (worker.signals.result, on_result),
+            (worker.signals.error, on_error),
+            (worker.signals.progress, on_progress),
+            (worker.signals.cancelled, on_cancelled),
+            (worker.signals.finished, on_finished),
+        ):
+            if slot is not None:
+                signal.connect(slot)
+        worker.signals.finished.connect(lambda: self._forget(worker, key))
+
+        # Hold a reference until finished: the signals object must outlive the run
+        self._active.add(worker)
+        if key is not None:
+            self._keyed[key] = worker
+        self.pool.start(worker)
+        return worker
+
+    def _forget(self, worker, key):
+        self._active.discard(worker)
+        if key is not None and self._keyed.get(key) is worker:
+            del self._keyed[key]
+
+    def cancel_all(self):
+        for worker in list(self._active):
+            worker.cancel()
+
+    def shutdown(self, timeout_ms=3000):
+        """Cancel everything and wait (briefly) for the pool threads to stop."""
+        self.cancel_all()
+        return self.pool.waitForDone(timeout_ms)
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
-import { Bar, Pie } from 'react-chartjs-2';
+import { Bar, Pie, Line } from 'react-chartjs-2';
 import {
     Chart as ChartJS,
     CategoryScale,
@@ -9,7 +9,10 @@ import {
     Title,
     Tooltip,
     Legend,
-    ArcElement
+    ArcElement,
+    LineElement,
+    PointElement,
+    Filler
 } from 'chart.js';
 import {
     Activity,
@@ -43,7 +46,7 @@ import {
 } from "@/components/ui/card";
 
 // Register ChartJS components
-ChartJS.register(CategoryScale, LinearScale, BarElement, Title, Tooltip, Legend, ArcElement);
+ChartJS.register(CategoryScale, LinearScale, BarElement, Title, Tooltip, Legend, ArcElement, LineElement, PointElement, Filler);
 
 // Theme chart colors matching the cn theme
 const chartColors = {
@@ -64,6 +67,171 @@ const chartColors = {
 };
 
 const API_BASE = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000';
+const JOB_POLL_INTERVAL = 500; // ms between upload job status checks
+// Give up on a running job whose progress hasn't moved for this long (its
+// worker has probably died, e.g. on a server restart) or on any job that
+// takes longer than the max, queue time included
+const JOB_STALL_TIMEOUT = 2 * 60 * 1000;
+const JOB_MAX_WAIT = 30 * 60 * 1000;
+
+const PARAMETER_LABELS = {
+    flowrate: 'Flowrate (m³/hr)',
+    pressure: 'Pressure (Pa)',
+    temperature: 'Temperature (°C)'
+};
+
+// Histogram + percentiles of each parameter, overall or for one equipment type
+const ParameterDistributions = ({ distributions }) => {
+    const [selectedType, setSelectedType] = useState('');
+    const types = Object.keys(distributions.by_type || {});
+    const source = selectedType ? distributions.by_type[selectedType] : distributions.overall;
+
+    return (
+        <Card>
+            <CardHeader className="p-4 sm:p-6 flex flex-row items-center justify-between space-y-0">
+                <CardTitle className="flex items-center gap-2 text-base sm:text-lg">
+                    <TrendingUp className="h-5 w-5 text-primary" />
+                    Parameter Distributions
+                </CardTitle>
+                <select
+                    value={selectedType}
+                    onChange={(e) => setSelectedType(e.target.value)}
+                    className="rounded-md border border-border bg-background px-2 py-1 text-xs sm:text-sm"
+                >
+                    <option value="">All types</option>
+                    {types.map(type => <option key={type} value={type}>{type}</option>)}
+                </select>
+            </CardHeader>
+            <CardContent className="p-4 sm:p-6 pt-0 grid gap-4 sm:gap-6 grid-cols-1 lg:grid-cols-3">
+                {Object.entries(PARAMETER_LABELS).map(([field, label]) => {
+                    const summary = source?.[field];
+                    const edges = distributions.overall[field]?.edges;
+                    if (!summary || !edges) return null;
+                    // Per-type histograms share the overall bin edges
+                    const binLabels = summary.histogram.map((_, i) => `${edges[i].toFixed(1)}–${edges[i + 1].toFixed(1)}`);
+                    return (
+                        <div key={field} className="space-y-2">
+                            <p className="text-xs sm:text-sm font-medium">{label}</p>
+                            <div className="h-[180px] w-full">
+                                <Bar
+                                    data={{
+                                        labels: binLabels,
+                                        datasets: [{
+                                            label: 'Count',
+                                            data: summary.histogram,
+                                            backgroundColor: chartColors.bar.background,
+                                            borderColor: chartColors.bar.border,
+                                            borderWidth: 1,
+                                            categoryPercentage: 1.0,
+                                            barPercentage: 1.0,
+                                        }]
+                                    }}
+                                    options={{
+                                        responsive: true,
+                                        maintainAspectRatio: false,
+                                        animation: false,
+                                        plugins: { legend: { display: false } },
+                                        scales: {
+                                            y: {
+                                                beginAtZero: true,
+                                                grid: { color: 'rgba(131, 148, 150, 0.1)' },
+                                                ticks: { color: '#839496', font: { size: 10 } }
+                                            },
+                                            x: {
+                                                grid: { display: false },
+                                                ticks: { color: '#839496', font: { size: 9 }, maxRotation: 45, autoSkip: true }
+                                            }
+                                        }
+                                    }}
+                                />
+                            </div>
+                            <p className="text-[10px] sm:text-xs text-muted-foreground font-medium">
+                                p50 {summary.p50} · p95 {summary.p95} · p99 {summary.p99} · σ {summary.std} · range {summary.min}–{summary.max}
+                            </p>
+                        </div>
+                    );
+                })}
+            </CardContent>
+        </Card>
+    );
+};
+
+// Drift of one parameter across uploads, from a single /api/trends/ request
+const ParameterTrends = ({ points, param, onParamChange }) => {
+    const labels = points.map(p => `#${p.batch_id}`);
+    const withPercentiles = points.map(p => p.p95 !== null && p.p95 !== undefined);
+
+    return (
+        <Card>
+            <CardHeader className="p-4 sm:p-6 flex flex-row items-center justify-between space-y-0">
+                <CardTitle className="flex items-center gap-2 text-base sm:text-lg">
+                    <Activity className="h-5 w-5 text-primary" />
+                    Trends Across Uploads
+                </CardTitle>
+                <select
+                    value={param}
+                    onChange={(e) => onParamChange(e.target.value)}
+                    className="rounded-md border border-border bg-background px-2 py-1 text-xs sm:text-sm"
+                >
+                    {Object.entries(PARAMETER_LABELS).map(([field, label]) => (
+                        <option key={field} value={field}>{label}</option>
+                    ))}
+                </select>
+            </CardHeader>
+            <CardContent className="p-4 sm:p-6 pt-0">
+                <div className="h-[220px] sm:h-[280px] w-full">
+                    <Line
+                        data={{
+                            labels,
+                            datasets: [
+                                {
+                                    label: 'p95',
+                                    data: points.map((p, i) => withPercentiles[i] ? p.p95 : null),
+                                    borderColor: 'rgba(59, 130, 246, 0.4)',
+                                    backgroundColor: 'rgba(59, 130, 246, 0.12)',
+                                    fill: '+1',
+                                    pointRadius: 0,
+                                },
+                                {
+                                    label: 'p50',
+                                    data: points.map((p, i) => withPercentiles[i] ? p.p50 : null),
+                                    borderColor: 'rgba(59, 130, 246, 0.4)',
+                                    borderDash: [4, 4],
+                                    pointRadius: 0,
+                                },
+                                {
+                                    label: 'Mean',
+                                    data: points.map(p => p.mean),
+                                    borderColor: chartColors.bar.border,
+                                    backgroundColor: chartColors.bar.background,
+                                    borderWidth: 2,
+                                },
+                            ]
+                        }}
+                        options={{
+                            responsive: true,
+                            maintainAspectRatio: false,
+                            animation: false,
+                            plugins: {
+                                legend: { labels: { boxWidth: 10, color: '#839496', font: { size: 11 } } }
+                            },
+                            scales: {
+                                y: {
+                                    grid: { color: 'rgba(131, 148, 150, 0.1)' },
+                                    ticks: { color: '#839496', font: { size: 10 } }
+                                },
+                                x: {
+                                    grid: { display: false },
+                                    ticks: { color: '#839496', font: { size: 10 } }
+                                }
+                            }
+                        }}
+                    />
+                </div>
+            </CardContent>
+        </Card>
+    );
+};
 
 const Dashboard = ({ authHeader, onLogout, darkMode, toggleDarkMode }) => {
     const [stats, setStats] = useState(null);
@@ -72,6 +240,9 @@ const Dashboard = ({ authHeader, onLogout, darkMode, toggleDarkMode }) => {
     const [batchId, setBatchId] = useState(null);
     const [recentUploads, setRecentUploads] = useState([]);
     const [mobileMenuOpen, setMobileMenuOpen] = useState(false);
+    const [jobProgress, setJobProgress] = useState(null);
+    const [trendParam, setTrendParam] = useState('pressure');
+    const [trendPoints, setTrendPoints] = useState([]);
 
     // Fetch recent uploads on mount
     useEffect(() => {
@@ -88,6 +259,25 @@ const Dashboard = ({ authHeader, onLogout, darkMode, toggleDarkMode }) => {
         } catch (err) {
             console.error("Failed to fetch history", err);
         }
+        fetchTrends(trendParam);
+    };
+
+    const fetchTrends = async (param) => {
+        if (!authHeader) return;
+        try {
+            const response = await axios.get(`${API_BASE}/api/trends/`, {
+                headers: { 'Authorization': authHeader },
+                params: { param }
+            });
+            setTrendPoints(response.data.points);
+        } catch (err) {
+            console.error("Failed to fetch trends", err);
+        }
+    };
+
+    const changeTrendParam = (param) => {
+        setTrendParam(param);
+        fetchTrends(param);
     };
 
     const handleBatchSelect = async (id) => {
@@ -120,25 +310,65 @@ const Dashboard = ({ authHeader, onLogout, darkMode, toggleDarkMode }) => {
         setError('');
 
         try {
-            const response = await axios.post(`${API_BASE}/api/upload/`, formData, {
+            // Job mode: the server replies 202 straight away and ingests in the background
+            const response = await axios.post(`${API_BASE}/api/upload/?mode=async`, formData, {
                 headers: {
                     'Content-Type': 'multipart/form-data',
                     'Authorization': authHeader
                 },
             });
-            setStats(response.data.statistics);
-            setBatchId(response.data.batch_id);
+            // 200 means the same file was ingested before and comes back straight away
+            const result = response.status === 202 ? await pollJob(response.data.job_id) : response.data;
+            setStats(result.statistics);
+            setBatchId(result.batch_id);
             fetchHistory(); // Refresh history
         } catch (err) {
             if (err.response?.status === 401) {
                 setError('Session expired. Please login again.');
                 onLogout();
+            } else if (err.response?.status === 409) {
+                setError('This file is already being processed. Try again in a moment.');
+            } else if (err.jobFailed) {
+                setError(`Processing failed: ${err.message}`);
             } else {
                 setError('Failed to upload file. Make sure Server is running!');
             }
             console.error(err);
         } finally {
             setLoading(false);
+            setJobProgress(null);
+        }
+    };
+
+    // Poll /api/jobs/<id>/ until the ingest finishes, surfacing progress as we go
+    const pollJob = async (jobId) => {
+        const fail = (message) => {
+            const failure = new Error(message);
+            failure.jobFailed = true;
+            return failure;
+        };
+        const startedAt = Date.now();
+        let lastProgress = { state: null, rows: -1, at: startedAt };
+        while (true) {
+            const { data } = await axios.get(`${API_BASE}/api/jobs/${jobId}/`, {
+                headers: { 'Authorization': authHeader }
+            });
+            setJobProgress(data);
+            if (data.state === 'succeeded') return data;
+            if (data.state === 'failed') throw fail(data.error || 'Unknown error');
+
+            const now = Date.now();
+            // A queued job waits its turn without reporting anything, so only a
+            // running one can stall; JOB_MAX_WAIT still caps the queue time
+            if (data.state !== 'running' || data.state !== lastProgress.state || data.rows_processed !== lastProgress.rows) {
+                lastProgress = { state: data.state, rows: data.rows_processed, at: now };
+            } else if (now - lastProgress.at > JOB_STALL_TIMEOUT) {
+                throw fail('The server stopped reporting progress on this upload. Please try again.');
+            }
+            if (now - startedAt > JOB_MAX_WAIT) {
+                throw fail('The upload is taking too long to process. Please try again later.');
+            }
+            await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL));
         }
     };
 
@@ -316,7 +546,11 @@ const Dashboard = ({ authHeader, onLogout, darkMode, toggleDarkMode }) => {
                             {loading && (
                                 <div className="flex items-center justify-center gap-2 p-3 sm:p-4 bg-primary/5 rounded-lg w-full">
                                     <div className="h-4 w-4 border-2 border-primary border-t-transparent rounded-full animate-spin" />
-                                    <span className="text-xs sm:text-sm text-primary font-medium">Processing your data...</span>
+                                    <span className="text-xs sm:text-sm text-primary font-medium">
+                                        {jobProgress?.state === 'running'
+                                            ? `Processing... ${jobProgress.rows_processed.toLocaleString()} rows${jobProgress.rows_per_sec ? ` (${jobProgress.rows_per_sec.toLocaleString()} rows/s)` : ''}`
+                                            : 'Processing your data...'}
+                                    </span>
                                 </div>
                             )}
 
@@ -487,9 +721,18 @@ const Dashboard = ({ authHeader, onLogout, darkMode, toggleDarkMode }) => {
                                 </CardContent>
                             </Card>
                         </div>
+
+                        {stats.distributions && (
+                            <ParameterDistributions key={batchId} distributions={stats.distributions} />
+                        )}
                     </div>
                 )}
 
+                {/* A trend needs at least two uploads */}
+                {trendPoints.length > 1 && (
+                    <ParameterTrends points={trendPoints} param={trendParam} onParamChange={changeTrendParam} />
+                )}
+
                 {/* Recent Uploads - Collapsible Section at Bottom */}
                 <Card className="border-border bg-card/50 backdrop-blur-sm">
                     <CardHeader